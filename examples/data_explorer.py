@@ -15,7 +15,7 @@ from spacq.gui.display.table.generic import TabularDisplayFrame
 from spacq.gui.display.plot.plotmath.derivative import DerivativeMathSetupDialog
 from spacq.gui.display.plot.plotmath.function import FunctionMathSetupDialog, FunctionMathSetupDialog2arg
 
-from spacq.gui.tool.box import load_csv, MessageDialog
+from spacq.gui.tool.box import load_data, MessageDialog
 
 
 class DataExplorerApp(wx.App):
@@ -143,7 +143,7 @@ class DataExplorerApp(wx.App):
 
 	def OnMenuFileOpen(self, evt=None):
 		try:
-			result = load_csv(self.csv_frame)
+			result = load_data(self.csv_frame)
 		except IOError as e:
 			MessageDialog(self.csv_frame, str(e), 'Could not load data').Show()
 			return
@@ -153,9 +153,9 @@ class DataExplorerApp(wx.App):
 		else:
 			self.OnMenuFileClose()
 
-		has_header, values, filename = result
+		data, filename = result
 
-		self.csv_frame.display_panel.from_csv_data(has_header, values)
+		self.csv_frame.display_panel.from_column_data(data)
 		self.csv_frame.Title = '{0} - {1}'.format(filename, self.default_title)
 
 		self.update_plot_menus(len(self.csv_frame.display_panel) > 0)
@@ -0,0 +1,362 @@
+import logging
+log = logging.getLogger(__name__)
+
+import argparse
+from functools import wraps
+import gc
+import json
+import numpy
+import platform
+import resource
+import sys
+from time import time
+
+from spacq.devices.agilent.mock.mock_dm34410a import MockDM34410A
+from spacq.devices.rohde_schwarz.mock.mock_smf100a import MockSMF100A
+from spacq.devices.tektronix.mock.mock_awg5014b import MockAWG5014B
+from spacq.devices.tektronix.mock.mock_dpo7104 import MockDPO7104
+from spacq.interface.pulse.program import Program
+from spacq.interface.units import Quantity
+from spacq.iteration.sweep import PulseConfiguration, SweepController
+from spacq.iteration.variables import sort_condition_variables, sort_output_variables
+from spacq.iteration.variables import Condition, ConditionVariable, InputVariable, LinSpaceConfig, OutputVariable
+
+"""
+Benchmark for the sweep controller, run headless against mock devices.
+
+Each scenario reports the points per second, the latency percentiles of every stage of the sweep, and the memory
+growth over the run. The results can be saved as JSON and compared against an earlier run to catch regressions.
+
+Run with: python -m spacq.benchmark.sweep --output results.json [--compare baseline.json]
+"""
+
+
+# Stages of SweepController which are timed, in the order in which they run.
+stages = ['init', 'next', 'transition', 'write', 'dwell', 'pulse', 'read', 'condition', 'conditional_dwell',
+		'ramp_down']
+
+pulse_program = """
+int i = 1
+delay d = 1 ns
+pulse p = {shape: 'square', length: 1 ns, amplitude: 1 mV}
+
+output f1
+
+times i {
+	(123 ns):f1
+}
+
+acquire
+"""
+
+
+class Scenario(object):
+	"""
+	The shape of a benchmarked sweep.
+	"""
+
+	def __init__(self, name, orders=1, variables=1, steps=100, measurements=1, conditions=0, pulse=False):
+		"""
+		orders: Number of nested orders.
+		variables: Number of variables stepped together in each order.
+		steps: Number of values taken by each variable.
+		measurements: Number of measurement resources read at each point.
+		conditions: Number of condition variables checked when the outermost order changes.
+		pulse: Whether to run a pulse program at each point.
+		"""
+
+		self.name = name
+		self.orders = orders
+		self.variables = variables
+		self.steps = steps
+		self.measurements = measurements
+		self.conditions = conditions
+		self.pulse = pulse
+
+	@property
+	def num_points(self):
+		return self.steps ** self.orders
+
+	@property
+	def parameters(self):
+		return {
+			'orders': self.orders,
+			'variables': self.variables,
+			'steps': self.steps,
+			'measurements': self.measurements,
+			'conditions': self.conditions,
+			'pulse': self.pulse,
+		}
+
+	def build(self):
+		"""
+		Create a controller for the scenario, along with fresh mock devices.
+		"""
+
+		output_vars, output_resources = [], []
+		for order in xrange(self.orders):
+			for i in xrange(self.variables):
+				var = OutputVariable(name='Var {0}.{1}'.format(order, i), order=order + 1, enabled=True,
+						wait='0 s', const=1e9)
+				var.config = LinSpaceConfig(1e9, 2e9, self.steps)
+				var.type = 'quantity'
+				var.units = 'Hz'
+				# Ramps mostly sleep, so they are left out.
+				var.smooth_from, var.smooth_to, var.smooth_transition = False, False, False
+
+				output_vars.append(var)
+				output_resources.append((var.name, MockSMF100A().resources['frequency']))
+
+		vars, num_items = sort_output_variables(output_vars)
+		resources = dict(output_resources)
+		group_resources = [tuple((var.name, resources[var.name]) for var in group) for group in vars]
+
+		measurement_resources, measurement_vars = [], []
+		for i in xrange(self.measurements):
+			name = 'Meas {0}'.format(i)
+
+			measurement_resources.append((name, MockDM34410A().resources['reading']))
+			measurement_vars.append(InputVariable(name=name))
+
+		condition_resources, condition_vars = [], []
+		for i in xrange(self.conditions):
+			name = 'Cond {0}'.format(i)
+
+			condition_resources.append(((name, MockDM34410A().resources['reading']),))
+			# The mock readings are always negative, so the condition always holds.
+			condition = Condition('resource name', 'quantity', name, '<', Quantity(0, 'V'))
+			condition_vars.append(ConditionVariable(name=name, order=self.orders, enabled=True, wait='0 s',
+					resource_names=[name], conditions=[condition]))
+
+		pulse_config = None
+		if self.pulse:
+			program = Program.from_string(pulse_program)
+			program.frequency = Quantity(1, 'GHz')
+			program.set_value(('_acq_marker', 'marker_num'), 1)
+			program.set_value(('_acq_marker', 'output'), 'f1')
+
+			pulse_config = PulseConfiguration(program.with_resources, {'f1': 1}, MockAWG5014B(), MockDPO7104())
+
+		return SweepController(group_resources, vars, num_items, measurement_resources, measurement_vars,
+				condition_resources, sort_condition_variables(condition_vars), pulse_config)
+
+
+# Scenarios run by default, each varying one aspect of the baseline.
+scenarios = [
+	Scenario('baseline', steps=200),
+	Scenario('orders', orders=3, steps=6),
+	Scenario('variables', variables=8, steps=200),
+	Scenario('measurements', measurements=8, steps=200),
+	Scenario('conditions', orders=2, steps=15, conditions=4),
+	# The pulse stage waits 1 s for the oscilloscope at every point.
+	Scenario('pulse', steps=3, pulse=True),
+]
+
+
+def time_stages(ctrl, stage_names=stages):
+	"""
+	Record the duration of every call to the given stages of a controller.
+
+	Returns a dictionary of lists of durations in seconds, which fill up as the controller runs.
+	"""
+
+	durations = {}
+
+	for name in stage_names:
+		f = getattr(ctrl, name)
+		samples = durations[name] = []
+
+		# The trampoline follows the stages through the instance, so the wrappers are picked up.
+		@wraps(f)
+		def timed(f=f, samples=samples):
+			start_time = time()
+
+			try:
+				return f()
+			finally:
+				samples.append(time() - start_time)
+
+		setattr(ctrl, name, timed)
+
+	return durations
+
+
+def summarize(samples):
+	"""
+	Summary statistics (in seconds) for a list of durations.
+	"""
+
+	if not samples:
+		return None
+
+	p50, p99 = numpy.percentile(samples, [50, 99])
+
+	return {
+		'count': len(samples),
+		'total': sum(samples),
+		'p50': p50,
+		'p99': p99,
+		'max': max(samples),
+	}
+
+
+def max_rss():
+	"""
+	The peak resident set size of the process, in kB.
+	"""
+
+	result = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+	if sys.platform == 'darwin':
+		# Reported in bytes rather than kB.
+		result /= 1024
+
+	return result
+
+
+def run_scenario(scenario):
+	"""
+	Run a scenario to completion, returning its results.
+	"""
+
+	log.info('Running scenario: {0}'.format(scenario.name))
+
+	ctrl = scenario.build()
+	durations = time_stages(ctrl)
+
+	points = [0]
+	def data_callback(cur_time, values, measurement_values):
+		points[0] += 1
+	ctrl.data_callback = data_callback
+
+	exceptions = []
+	def exception_handler(name, e, write=None):
+		exceptions.append((name, e))
+	ctrl.general_exception_handler = ctrl.resource_exception_handler = exception_handler
+
+	gc.collect()
+	objects_before, rss_before = len(gc.get_objects()), max_rss()
+
+	start_time = time()
+	ctrl.run()
+	elapsed = time() - start_time
+
+	gc.collect()
+	objects_after, rss_after = len(gc.get_objects()), max_rss()
+
+	if exceptions:
+		raise ValueError('Scenario "{0}" failed: {1!r}'.format(scenario.name, exceptions[0]))
+
+	return {
+		'name': scenario.name,
+		'parameters': scenario.parameters,
+		'points': points[0],
+		'elapsed': elapsed,
+		'points_per_second': points[0] / elapsed,
+		'stages': dict((name, summarize(samples)) for name, samples in durations.items() if samples),
+		'executor': ctrl.executor.timings,
+		'memory': {
+			'objects': objects_after - objects_before,
+			'max_rss_kb': rss_after - rss_before,
+		},
+	}
+
+
+def run(selected=scenarios, label=None):
+	"""
+	Run the scenarios, returning a JSON-serializable report.
+	"""
+
+	from spacq import VERSION
+
+	return {
+		'label': label,
+		'version': VERSION,
+		'python': platform.python_version(),
+		'platform': platform.platform(),
+		'time': time(),
+		'results': [run_scenario(scenario) for scenario in selected],
+	}
+
+
+def compare(baseline, report, threshold=0.1):
+	"""
+	Compare the points per second of matching scenarios in two reports.
+
+	Returns a list of (name, baseline points/s, current points/s, regressed), where a scenario has regressed if it
+	is slower than the baseline by more than the threshold fraction.
+	"""
+
+	baseline_results = dict((result['name'], result) for result in baseline['results'])
+
+	comparison = []
+	for result in report['results']:
+		try:
+			old = baseline_results[result['name']]['points_per_second']
+		except KeyError:
+			continue
+
+		new = result['points_per_second']
+		comparison.append((result['name'], old, new, new < old * (1 - threshold)))
+
+	return comparison
+
+
+def format_report(report):
+	lines = ['{0:<16}{1:>8}{2:>12}  {3}'.format('scenario', 'points', 'points/s', 'stage p50/p99 (ms)')]
+
+	for result in report['results']:
+		stage_summaries = ['{0} {1:.2f}/{2:.2f}'.format(name, result['stages'][name]['p50'] * 1e3,
+				result['stages'][name]['p99'] * 1e3) for name in stages if name in result['stages']]
+
+		lines.append('{0:<16}{1:>8}{2:>12.1f}  {3}'.format(result['name'], result['points'],
+				result['points_per_second'], ', '.join(stage_summaries)))
+
+	return '\n'.join(lines)
+
+
+def main(args=None):
+	parser = argparse.ArgumentParser(description='Benchmark the sweep controller against mock devices.')
+	parser.add_argument('--scenario', action='append', choices=[s.name for s in scenarios],
+			help='scenario to run (default: all)')
+	parser.add_argument('--output', help='file in which to save the results as JSON')
+	parser.add_argument('--compare', metavar='BASELINE', help='results of an earlier run to compare against')
+	parser.add_argument('--threshold', type=float, default=0.1,
+			help='slowdown (as a fraction) beyond which a scenario counts as a regression')
+	parser.add_argument('--label', help='label to store with the results, eg. a commit')
+	args = parser.parse_args(args)
+
+	selected = scenarios
+	if args.scenario:
+		selected = [s for s in scenarios if s.name in args.scenario]
+
+	report = run(selected, args.label)
+
+	print format_report(report)
+
+	if args.output:
+		with open(args.output, 'w') as f:
+			json.dump(report, f, indent=2, sort_keys=True)
+
+	if args.compare:
+		with open(args.compare) as f:
+			baseline = json.load(f)
+
+		regressed = False
+
+		print
+		print '{0:<16}{1:>12}{2:>12}{3:>10}'.format('scenario', 'baseline', 'current', 'change')
+		for name, old, new, slower in compare(baseline, report, args.threshold):
+			print '{0:<16}{1:>12.1f}{2:>12.1f}{3:>9.1f}%{4}'.format(name, old, new, 100.0 * (new - old) / old,
+					'  REGRESSION' if slower else '')
+
+			regressed = regressed or slower
+
+		if regressed:
+			return 1
+
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
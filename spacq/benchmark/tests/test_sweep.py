@@ -0,0 +1,41 @@
+from nose.tools import eq_
+import json
+from unittest import main, TestCase
+
+from .. import sweep
+
+
+class SweepBenchmarkTest(TestCase):
+	def testRun(self):
+		"""
+		Run small scenarios and compare them.
+		"""
+
+		scenarios = [
+			sweep.Scenario('small', orders=2, variables=2, steps=3, measurements=2, conditions=1),
+		]
+
+		report = sweep.run(scenarios, label='test')
+		# Must be serializable.
+		report = json.loads(json.dumps(report))
+
+		eq_(report['label'], 'test')
+
+		result, = report['results']
+		eq_(result['name'], 'small')
+		eq_(result['points'], 9)
+		eq_(result['stages']['next']['count'], 9)
+		eq_(result['stages']['write']['count'], 9)
+		eq_(result['executor']['read']['calls'], 18)
+		assert result['stages']['read']['p50'] <= result['stages']['read']['p99']
+		assert 'pulse' not in result['stages']
+
+		baseline = json.loads(json.dumps(report))
+		baseline['results'][0]['points_per_second'] *= 2
+		eq_(sweep.compare(baseline, report), [('small', result['points_per_second'] * 2,
+				result['points_per_second'], True)])
+		eq_(sweep.compare(report, report)[0][3], False)
+
+
+if __name__ == '__main__':
+	main()
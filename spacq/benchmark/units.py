@@ -0,0 +1,85 @@
+import quantities as pq
+from timeit import Timer
+
+from spacq.interface.units import Quantity
+
+"""
+Micro-benchmark for quantity construction and arithmetic.
+
+The reference timings follow the path that every quantity used to take: parsing the units and simplifying a
+pq.Quantity on construction, and reparsing the string form on every copy.
+
+Run with: python -m spacq.benchmark.units
+"""
+
+
+def reference_quantity(value, units):
+	"""
+	Build a quantity the way it was done before units were cached.
+	"""
+
+	new_units, multiplier = Quantity.parse_units(units)
+
+	return pq.Quantity(value * (10 ** multiplier), new_units).simplified
+
+
+def reference_add(a, b, units):
+	"""
+	Add quantities the way it was done before units were cached.
+	"""
+
+	# The copy reparsed the string representation.
+	result = reference_quantity(float(str(a.magnitude)), units)
+	result += b
+
+	return result
+
+
+def benchmarks():
+	"""
+	Pairs of (name, reference statement, current statement).
+	"""
+
+	a, b = Quantity(1.5, 'mV'), Quantity(-2, 'uV')
+	ref_a, ref_b = reference_quantity(1.5, 'mV'), reference_quantity(-2, 'uV')
+
+	return [
+		('construct',
+			lambda: reference_quantity(1.5, 'kg.ms-2'),
+			lambda: Quantity(1.5, 'kg.ms-2')),
+		('construct from string',
+			lambda: reference_quantity(*Quantity.from_string('1.5 mV')),
+			lambda: Quantity('1.5 mV')),
+		('add',
+			lambda: reference_add(ref_a, ref_b, 'mV'),
+			lambda: a + b),
+		('compare',
+			lambda: (ref_a < ref_b, ref_a.dimensionality == ref_b.dimensionality),
+			lambda: a < b),
+	]
+
+
+def run(number=2000, repeat=3):
+	"""
+	Time each benchmark, returning (name, reference, current) in seconds per call.
+	"""
+
+	result = []
+
+	for name, reference, current in benchmarks():
+		times = [min(Timer(f).repeat(repeat, number)) / number for f in [reference, current]]
+		result.append((name,) + tuple(times))
+
+	return result
+
+
+def main():
+	print '{0:<24}{1:>14}{2:>14}{3:>10}'.format('', 'reference', 'current', 'speedup')
+
+	for name, reference, current in run():
+		print '{0:<24}{1:>12.2f}us{2:>12.2f}us{3:>9.1f}x'.format(name, reference * 1e6, current * 1e6,
+				reference / current)
+
+
+if __name__ == '__main__':
+	main()
@@ -1,22 +1,26 @@
 import logging
 log = logging.getLogger(__name__)
 
-from threading import RLock
+import socket
+from threading import Lock, RLock
 from time import time
 
+from spacq.tool.executor import DeviceExecutor, Future
 from spacq.tool.box import Enum, Synchronized
 
+from .raw_socket import RawSocketInstrument
+
 """
 Hardware device abstraction interface.
 """
 
 
-# PyVISA, Linux GPIB, PyVISA USB.
-drivers = Enum(['pyvisa', 'lgpib', 'pyvisa_usb'])
+# PyVISA, Linux GPIB, PyVISA USB, raw TCP socket.
+drivers = Enum(['pyvisa', 'lgpib', 'pyvisa_usb', 'socket'])
 
 
 # Try to import all available drivers.
-available_drivers = []
+available_drivers = [drivers.socket]
 
 try:
 	import Gpib
@@ -79,6 +83,199 @@ class IbstaBits(object):
 	ERR = 0x8000
 
 
+class DeviceFuture(Future):
+	"""
+	The eventual result of an asynchronous device operation.
+	"""
+
+	timeout_exception = DeviceTimeout
+	# A queued command would otherwise still be sent to the device after its caller has given up on it.
+	cancel_on_timeout = True
+
+
+class DeviceIOExecutor(DeviceExecutor):
+	future_cls = DeviceFuture
+
+
+# Shared by all devices, with a worker per device.
+_io_executor = None
+_io_executor_lock = Lock()
+
+
+def io_executor():
+	"""
+	The executor which runs asynchronous device operations.
+	"""
+
+	global _io_executor
+
+	with _io_executor_lock:
+		if _io_executor is None:
+			_io_executor = DeviceIOExecutor()
+
+		return _io_executor
+
+
+class QueryCache(object):
+	"""
+	Values of device settings which have already been queried.
+
+	Entries are keyed by the object (device or subdevice) and the name of the setting.
+	"""
+
+	def __init__(self):
+		# (obj, name) to (value, names of the settings on which the value depends).
+		self.values = {}
+
+		self.hits = 0
+		self.misses = 0
+
+	def __len__(self):
+		return len(self.values)
+
+	def get(self, obj, query):
+		key = (obj, query.name)
+
+		try:
+			value, _ = self.values[key]
+		except KeyError:
+			pass
+		else:
+			self.hits += 1
+			return value
+
+		self.misses += 1
+
+		value = query.fget(obj)
+		self.values[key] = (value, query.depends_on)
+
+		return value
+
+	def set(self, obj, query, value):
+		key = (obj, query.name)
+
+		if query.exact:
+			try:
+				old_value, _ = self.values[key]
+			except KeyError:
+				pass
+			else:
+				if old_value == value:
+					# The device already has this value.
+					self.hits += 1
+					return
+
+		self.invalidate(query.name, obj)
+		query.fset(obj, value)
+
+		if query.exact:
+			self.values[key] = (value, query.depends_on)
+
+	def invalidate(self, name, obj=None):
+		"""
+		Forget the value of a setting (on any object, if obj is None), along with anything that depends on it.
+		"""
+
+		for key, (_, depends_on) in self.values.items():
+			if key[1] == name and (obj is None or key[0] is obj) or name in depends_on:
+				del self.values[key]
+
+	def clear(self):
+		"""
+		Forget everything.
+		"""
+
+		self.values.clear()
+
+	@property
+	def stats(self):
+		return {'hits': self.hits, 'misses': self.misses, 'size': len(self)}
+
+
+class cached_query(object):
+	"""
+	A property for a device setting whose value is only queried when it is not already known.
+
+	For example:
+		@cached_query(depends_on=['time_scale'])
+		def record_length(self):
+			return int(self.ask('horizontal:mode:recordlength?'))
+
+	Using the setter (or resetting the device) forgets the value, along with the values of any settings that
+	depend on it. If exact is True, the device is trusted to report exactly the value that was set, so the set value
+	is kept, and setting the same value again does nothing.
+
+	This is only appropriate for settings which are not changed by the device itself.
+	"""
+
+	def __init__(self, depends_on=(), exact=False):
+		self.depends_on = frozenset(depends_on)
+		self.exact = exact
+
+		self.name = None
+		self.fget = None
+		self.fset = None
+
+	def __call__(self, fget):
+		self.name = fget.__name__
+		self.fget = fget
+		self.__doc__ = fget.__doc__
+
+		return self
+
+	def setter(self, fset):
+		self.fset = fset
+
+		return self
+
+	def __get__(self, obj, objtype=None):
+		if obj is None:
+			return self
+
+		return obj.query_cache.get(obj, self)
+
+	def __set__(self, obj, value):
+		if self.fset is None:
+			raise AttributeError('Cannot set "{0}"'.format(self.name))
+
+		obj.query_cache.set(obj, self, value)
+
+
+class Transaction(object):
+	"""
+	Context manager which coalesces the commands written to a device into a single message.
+	"""
+
+	def __init__(self, device):
+		self.device = device
+
+	def __enter__(self):
+		device = self.device
+
+		# Nobody else may write while commands are being collected.
+		device.lock.acquire()
+
+		if device.transaction_depth == 0 and device.supports_compound_messages:
+			device.transaction_commands = []
+		device.transaction_depth += 1
+
+	def __exit__(self, *args):
+		device = self.device
+
+		try:
+			device.transaction_depth -= 1
+
+			if device.transaction_depth == 0 and device.transaction_commands is not None:
+				try:
+					device.transaction_flush()
+				finally:
+					device.transaction_commands = None
+		finally:
+			device.lock.release()
+
+		return False
+
+
 class SuperDevice(object):
 	def _setup(self):
 		"""
@@ -121,22 +318,37 @@ class AbstractDevice(SuperDevice):
 
 	max_timeout = 15 # s
 
+	# Whether the device accepts several commands joined by ";" in a single message.
+	compound_messages = True
+
+	# Commands after which no cached query values can be trusted.
+	cache_clearing_commands = ['*rst', '*rcl', 'system:preset']
+
 	def _setup(self):
 		self.multi_command = None
 		self.responses_expected = 0
 
+		self.transaction_commands = None
+		self.transaction_depth = 0
+
 		SuperDevice._setup(self)
 
 		self.lock = RLock()
 
+		self.query_cache = QueryCache()
+
 		self.status = []
 
 	def __init__(self, ip_address=None, gpib_board=0, gpib_pad=None, gpib_sad=0,
-			usb_resource=None, autoconnect=True):
+			usb_resource=None, ip_port=None, autoconnect=True):
 		"""
 		Ethernet (tcpip::<ip_address>::instr):
 			ip_address: Address on which the device is listening on port 111.
 
+		Ethernet, raw socket (<ip_address>:<ip_port>):
+			ip_address: Address of the device.
+			ip_port: TCP port on which the device accepts SCPI commands (typically 5025).
+
 		GPIB (gpib[gpib_board]::<gpib_pad>[::<gpib_sad>]::instr):
 			gpib_board: GPIB board index. Defaults to 0.
 			gpib_pad: Primary address of the device.
@@ -152,7 +364,15 @@ class AbstractDevice(SuperDevice):
 
 		log.info('Creating device "{0}".'.format(self.name))
 
-		if ip_address is not None:
+		if ip_address is not None and ip_port is not None:
+			log.debug('Using raw socket with ip_address="{0}", ip_port="{1}".'.format(ip_address, ip_port))
+			self.driver = drivers.socket
+			self.connection_resource = {
+				'host': ip_address,
+				'port': ip_port,
+				'timeout': self.max_timeout,
+			}
+		elif ip_address is not None:
 			if drivers.pyvisa in available_drivers:
 				log.debug('Using PyVISA with ip_address="{0}".'.format(ip_address))
 				self.driver = drivers.pyvisa
@@ -234,12 +454,86 @@ class AbstractDevice(SuperDevice):
 				
 			except visa.VisaIOError as e:
 				raise DeviceNotFoundError('Could not open device at "{0}".'.format(self.connection_resource), e)
+		elif self.driver == drivers.socket:
+			try:
+				self.device = RawSocketInstrument(**self.connection_resource)
+			except socket.error as e:
+				raise DeviceNotFoundError('Could not open device at "{0}".'.format(self.connection_resource), e)
 
 		try:
 			self._connected()
 		except Exception as e:
 			raise DeviceNotFoundError('Could not finish connection to device at "{0}".'.format(self.connection_resource), e)
 
+	@staticmethod
+	def join_commands(commands):
+		"""
+		Combine commands into a single message.
+		"""
+
+		# Only commands not starting with "*" or ":" get a ":" prefix.
+		commands = [cmd if cmd[0] in '*:' else ':' + cmd for cmd in commands]
+
+		return ';'.join(commands)
+
+	def clears_query_cache(self, message):
+		"""
+		Whether the message invalidates everything in the query cache.
+		"""
+
+		for cmd in message.lower().split(';'):
+			cmd = cmd.strip().lstrip(':')
+
+			for clearing_cmd in self.cache_clearing_commands:
+				if cmd.startswith(clearing_cmd):
+					return True
+
+		return False
+
+	@property
+	def supports_compound_messages(self):
+		return self.compound_messages and getattr(self, 'driver', None) in [drivers.pyvisa, drivers.lgpib,
+				drivers.socket]
+
+	def transaction(self):
+		"""
+		Collect everything written to the device and send it as a single message.
+
+		For example:
+			with dev.transaction():
+				dev.write('a 1')
+				dev.write('b 2')
+		sends ":a 1;:b 2" once the block is done.
+
+		Anything which reads from the device (including ask) first sends the collected commands along with its own
+		query, so queries still get their responses. The device lock is held for the whole transaction.
+
+		If the device does not support compound messages, each command is sent as usual.
+		"""
+
+		return Transaction(self)
+
+	@Synchronized()
+	def transaction_flush(self):
+		"""
+		Send the commands collected so far in the current transaction.
+		"""
+
+		commands = self.transaction_commands
+		if not commands:
+			return
+
+		# This ensures that write will not buffer the real message.
+		self.transaction_commands = None
+
+		try:
+			if len(commands) == 1:
+				self.write(commands[0])
+			else:
+				self.write(self.join_commands(commands))
+		finally:
+			self.transaction_commands = []
+
 	def multi_command_start(self):
 		"""
 		Redirect further commands to a buffer.
@@ -247,7 +541,7 @@ class AbstractDevice(SuperDevice):
 
 		log.debug('Starting multi-command message for device "{0}"'.format(self.name))
 
-		if self.driver not in [drivers.pyvisa, drivers.lgpib]:
+		if self.driver not in [drivers.pyvisa, drivers.lgpib, drivers.socket]:
 			raise NotImplementedError('Unsupported driver: "{0}".'.format(self.driver))
 
 		self.multi_command = []
@@ -273,9 +567,7 @@ class AbstractDevice(SuperDevice):
 		# This ensures that write and ask will not buffer the real message.
 		self.multi_command = None
 
-		# Only commands not starting with "*" get a ":" prefix.
-		commands = [cmd if cmd[0] == '*' else ':' + cmd for cmd in commands]
-		message = ';'.join(commands)
+		message = self.join_commands(commands)
 
 		if self.responses_expected:
 			result = self.ask(message)
@@ -300,9 +592,17 @@ class AbstractDevice(SuperDevice):
 
 			self.multi_command.append(message)
 			return
+		elif self.transaction_commands is not None:
+			log.debug('Writing to transaction buffer for device "{0}": {1!r}'.format(self.name, message))
+
+			self.transaction_commands.append(message)
+			return
 
 		log.debug('Writing to device "{0}": {1!r}'.format(self.name, message))
 
+		if len(self.query_cache) > 0 and self.clears_query_cache(message):
+			self.query_cache.clear()
+
 		if self.driver == drivers.pyvisa:
 			try:
 				self.device.write(message)
@@ -319,6 +619,11 @@ class AbstractDevice(SuperDevice):
 					raise DeviceTimeout(e)
 				else:
 					raise
+		elif self.driver == drivers.socket:
+			try:
+				self.device.write(message)
+			except socket.timeout as e:
+				raise DeviceTimeout(e)
 		elif self.driver == drivers.pyvisa_usb:
 			# Send the message raw.
 			if not(legacyVisa):
@@ -332,6 +637,10 @@ class AbstractDevice(SuperDevice):
 		Read everything the device has to say and return it exactly.
 		"""
 
+		if self.transaction_commands:
+			# Whatever is to be read is in response to the buffered commands.
+			self.transaction_flush()
+
 		log.debug('Reading from device "{0}".'.format(self.name))
 
 		buf = ''
@@ -353,6 +662,11 @@ class AbstractDevice(SuperDevice):
 						raise
 
 				status = self.device.ibsta() & IbstaBits.END
+		elif self.driver == drivers.socket:
+			try:
+				buf = self.device.read_raw()
+			except socket.timeout as e:
+				raise DeviceTimeout(e)
 
 		log.debug('Read from device "{0}": {1!r}'.format(self.name, buf))
 
@@ -389,6 +703,50 @@ class AbstractDevice(SuperDevice):
 		else:
 			self.responses_expected += 1
 
+	def submit(self, f, *args, **kwargs):
+		"""
+		Run f(*args, **kwargs) without waiting for it, after all previously submitted operations on this device.
+
+		Returns a future, whose result may be waited for with a timeout in seconds (raising DeviceTimeout).
+
+		On a timeout, an operation which has not yet started is cancelled. One which has already started runs to
+		completion, and reads its own response, so that later operations do not see it.
+		"""
+
+		return io_executor().submit(self.lock, 'io', f, *args, **kwargs)
+
+	def awrite(self, message):
+		"""
+		Asynchronous write.
+		"""
+
+		return self.submit(self.write, message)
+
+	def aread_raw(self):
+		"""
+		Asynchronous read_raw.
+		"""
+
+		return self.submit(self.read_raw)
+
+	def aask(self, message):
+		"""
+		Asynchronous ask.
+
+		For example, to query several devices at once:
+			futures = [dev.aask('meas:volt?') for dev in devs]
+			values = [float(f.result(timeout=5)) for f in futures]
+		"""
+
+		return self.submit(self.ask, message)
+
+	def aask_raw(self, message):
+		"""
+		Asynchronous ask_raw.
+		"""
+
+		return self.submit(self.ask_raw, message)
+
 	def close(self):
 		"""
 		Close the connection, if possible.
@@ -396,7 +754,7 @@ class AbstractDevice(SuperDevice):
 
 		log.debug('Closing device: {0}'.format(self.name))
 
-		if self.driver in [drivers.pyvisa, drivers.pyvisa_usb]:
+		if self.driver in [drivers.pyvisa, drivers.pyvisa_usb, drivers.socket]:
 			self.device.close()
 
 	def find_resource(self, path):
@@ -436,7 +794,7 @@ class AbstractDevice(SuperDevice):
 		Ask the device for identification.
 		"""
 
-		if self.driver in [drivers.pyvisa, drivers.lgpib]:
+		if self.driver in [drivers.pyvisa, drivers.lgpib, drivers.socket]:
 			return self.ask('*idn?')
 
 	@property
@@ -448,7 +806,7 @@ class AbstractDevice(SuperDevice):
 		end_time = time() + self.max_timeout
 
 		while True:
-			if self.driver in [drivers.pyvisa, drivers.lgpib]:
+			if self.driver in [drivers.pyvisa, drivers.lgpib, drivers.socket]:
 				try:
 					self.ask('*opc?')
 				except DeviceTimeout:
@@ -468,6 +826,8 @@ class AbstractSubdevice(SuperDevice):
 
 		# Synchronized methods should use the device lock.
 		self.lock = self.device.lock if self.device else None
+		# Cached values are forgotten along with those of the device.
+		self.query_cache = self.device.query_cache if self.device else QueryCache()
 
 	def __init__(self, device):
 		self.device = device
@@ -20,6 +20,9 @@ class NWA8753ET(AbstractDevice):
 	Interface for Agilent 8753ET
 	"""
 
+	# Not SCPI, so commands cannot be combined.
+	compound_messages = False
+
 	def _setup(self):
 		AbstractDevice._setup(self)
 
@@ -79,6 +79,8 @@ class DeviceConfig(object):
 		# Connection configuration.
 		self.address_mode = None
 		self.ip_address = None
+		# Raw socket port; if None, VISA is used for Ethernet.
+		self.ip_port = None
 		self.gpib_board = 0
 		self.gpib_pad = 0
 		self.gpib_sad = 0
@@ -125,6 +127,9 @@ class DeviceConfig(object):
 		self._device = None
 		self.resources = {}
 
+		if 'ip_port' not in dict:
+			self.ip_port = None
+
 	@property
 	def device(self):
 		"""
@@ -187,6 +192,9 @@ class DeviceConfig(object):
 					raise ConnectionError('No IP address specified.')
 
 				address['ip_address'] = self.ip_address
+
+				if self.ip_port is not None:
+					address['ip_port'] = self.ip_port
 			elif self.address_mode == self.address_modes.gpib:
 				address['gpib_board'] = self.gpib_board
 				address['gpib_pad'] = self.gpib_pad
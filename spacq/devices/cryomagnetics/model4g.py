@@ -624,6 +624,10 @@ class Model4G(AbstractDevice):
     """
     Interface for Model 4G
     """
+
+    # Not SCPI, so commands cannot be combined.
+    compound_messages = False
+
     allowed_active_channel = set([1,2])
     allowed_both_heaters = set(['on','off'])
     allowed_both_units = set(['kG','A'])
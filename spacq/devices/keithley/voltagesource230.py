@@ -16,6 +16,9 @@ class voltageSource230(AbstractDevice):
 	Interface for the Keithly 230 Programmable Voltage Source
 	"""
 
+	# Not SCPI, so commands cannot be combined.
+	compound_messages = False
+
 	allowed_I_limit = set([2, 20, 100])
 
 	def _setup(self):
@@ -17,6 +17,9 @@ class model218(AbstractDevice):
 	"""
 	Interface for Lakeshore Model 218 Temperature Monitor
 	"""
+
+	# Not SCPI, so commands cannot be combined.
+	compound_messages = False
 	
 	def _setup(self):
 		AbstractDevice._setup(self)
@@ -17,6 +17,9 @@ class TC335(AbstractDevice):
 	"""
 	Interface for Lakeshore 335 Temperature Controller
 	"""
+
+	# Not SCPI, so commands cannot be combined.
+	compound_messages = False
 	
 	def _setup(self):
 		AbstractDevice._setup(self)
@@ -106,6 +106,7 @@ class MockAbstractDevice(AbstractDevice):
 				done = True
 			elif message in ['*rst', 'system:preset']:
 				self._reset()
+				self.query_cache.clear()
 				done = True
 			elif message == 'system:version?':
 				result = '42'
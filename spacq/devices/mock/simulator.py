@@ -0,0 +1,302 @@
+import logging
+log = logging.getLogger(__name__)
+
+import argparse
+import random
+import SocketServer
+from threading import Lock, Thread
+import time
+
+"""
+Serve mock devices over TCP, so that they can be reached like real Ethernet instruments.
+
+Each device listens on its own port and accepts the same newline-terminated (and ";"-joined) messages as a raw
+socket SCPI instrument. Latency, jitter, throughput and lost responses can be simulated.
+
+For example, to serve a mock DPO7104 on port 5025 with 2 ms of latency per command:
+	python -m spacq.devices.mock.simulator Tektronix/DPO7104:5025 --latency 0.002
+"""
+
+
+def parse_message(buf):
+	"""
+	Find the first complete message in the buffer.
+
+	Returns (commands, length of the message including its terminator), or None if the message is incomplete.
+
+	Quoted strings and definite-length block data may contain ";" and newlines.
+	"""
+
+	commands = []
+	start = 0
+	in_quotes = False
+	# Where the last block ended, since block data must not be stripped.
+	block_end = None
+
+	i = 0
+	while i < len(buf):
+		c = buf[i]
+
+		if c == '"':
+			in_quotes = not in_quotes
+		elif in_quotes:
+			pass
+		elif c == '#' and i + 1 < len(buf) and buf[i + 1] in '123456789':
+			num_digits = int(buf[i + 1])
+			length_end = i + 2 + num_digits
+
+			if length_end > len(buf):
+				return None
+
+			# Skip over the block.
+			i = block_end = length_end + int(buf[i + 2:length_end])
+			continue
+		elif c in ';\n':
+			cmd = buf[start:i].lstrip().lstrip(':')
+			if block_end != i:
+				cmd = cmd.rstrip()
+
+			if cmd:
+				commands.append(cmd)
+			start = i + 1
+
+			if c == '\n':
+				return commands, i + 1
+
+		i += 1
+
+	return None
+
+
+class LatencyModel(object):
+	"""
+	How long a simulated instrument takes to deal with each command.
+	"""
+
+	def __init__(self, latency=0.0, jitter=0.0, throughput=None, timeout_rate=0.0, command_latencies=None,
+			seed=None):
+		"""
+		latency: Time in s taken by every command.
+		jitter: Additional time in s, uniformly distributed on [0, jitter].
+		throughput: Transfer rate in bytes per second for commands and responses, or None for no limit.
+		timeout_rate: Probability that a message with queries gets no response at all.
+		command_latencies: Additional time in s for commands starting with the given strings, eg. {'curve?': 0.05}.
+		seed: Seed for the random numbers, for reproducible runs.
+		"""
+
+		self.latency = latency
+		self.jitter = jitter
+		self.throughput = throughput
+		self.timeout_rate = timeout_rate
+		self.command_latencies = command_latencies or {}
+
+		self.random = random.Random(seed)
+
+	def delay(self, command, num_bytes):
+		"""
+		The time in s to spend on a command, given the number of bytes sent and received.
+		"""
+
+		result = self.latency
+
+		if self.jitter:
+			result += self.random.uniform(0, self.jitter)
+
+		if self.throughput is not None:
+			result += float(num_bytes) / self.throughput
+
+		command = command.lower()
+		for prefix, latency in self.command_latencies.items():
+			if command.startswith(prefix):
+				result += latency
+
+		return result
+
+	def drop(self):
+		"""
+		Whether to lose a response.
+		"""
+
+		return self.timeout_rate > 0 and self.random.random() < self.timeout_rate
+
+
+class DeviceHandler(SocketServer.BaseRequestHandler):
+	"""
+	Pass each message on to the mock device, and send back the responses.
+	"""
+
+	chunk_size = 2 ** 16
+
+	def handle(self):
+		buf = ''
+
+		while True:
+			parsed = parse_message(buf)
+
+			if parsed is None:
+				data = self.request.recv(self.chunk_size)
+
+				if not data:
+					return
+
+				buf += data
+				continue
+
+			commands, length = parsed
+			buf = buf[length:]
+
+			response = self.server.process(commands)
+
+			if response is not None:
+				self.request.sendall(response)
+
+
+class DeviceServer(SocketServer.ThreadingTCPServer):
+	"""
+	A TCP server for a single mock device.
+	"""
+
+	allow_reuse_address = True
+	daemon_threads = True
+
+	def __init__(self, address, device, latency=None):
+		SocketServer.ThreadingTCPServer.__init__(self, address, DeviceHandler)
+
+		self.device = device
+		self.latency = latency if latency is not None else LatencyModel()
+
+		# Only one client at a time gets to talk to the device.
+		self.lock = Lock()
+
+		# Number of commands processed.
+		self.num_commands = 0
+
+	def process(self, commands):
+		"""
+		Run the commands on the device, returning the response message (if any).
+		"""
+
+		responses = []
+		delay = 0.0
+
+		with self.lock:
+			for cmd in commands:
+				self.num_commands += 1
+
+				try:
+					self.device.write(cmd)
+				except Exception as e:
+					log.error('Device "{0}" could not process {1!r}: {2!r}'.format(self.device.name, cmd[:100], e))
+
+					# Like a real instrument, only the error queue would know.
+					response = None
+				else:
+					response = self.device.output
+
+					# The output is only meaningful for queries.
+					self.device.output = None
+
+				if response is not None:
+					responses.append(response.rstrip('\n'))
+
+				delay += self.latency.delay(cmd, len(cmd) + (len(response) if response is not None else 0))
+
+			if delay > 0:
+				time.sleep(delay)
+
+		if not responses or self.latency.drop():
+			return None
+
+		return ';'.join(responses) + '\n'
+
+
+class Simulator(object):
+	"""
+	A collection of mock devices, each served on its own port.
+	"""
+
+	def __init__(self, host='127.0.0.1'):
+		self.host = host
+
+		self.servers = []
+
+	def add_device(self, device, port=0, latency=None):
+		"""
+		Start serving a mock device; a port of 0 picks any free port.
+
+		Returns the port.
+		"""
+
+		server = DeviceServer((self.host, port), device, latency)
+
+		thr = Thread(target=server.serve_forever)
+		thr.daemon = True
+		thr.start()
+
+		self.servers.append(server)
+
+		port = server.server_address[1]
+		log.info('Serving "{0}" on {1}:{2}'.format(device.name, self.host, port))
+
+		return port
+
+	def close(self):
+		for server in self.servers:
+			server.shutdown()
+			server.server_close()
+
+		self.servers = []
+
+
+def mock_implementation(spec):
+	"""
+	Find the mock implementation for a "Manufacturer/Model" string.
+	"""
+
+	from ..config import device_tree
+
+	manufacturer, model = spec.split('/', 1)
+
+	try:
+		return device_tree()[manufacturer][model]['mock']
+	except KeyError:
+		raise ValueError('No mock implementation for "{0}"'.format(spec))
+
+
+def main(args=None):
+	parser = argparse.ArgumentParser(description='Serve mock devices over TCP.')
+	parser.add_argument('devices', nargs='+', metavar='MANUFACTURER/MODEL[:PORT]',
+			help='devices to serve, eg. Tektronix/DPO7104:5025')
+	parser.add_argument('--host', default='127.0.0.1')
+	parser.add_argument('--latency', type=float, default=0.0, help='time per command (s)')
+	parser.add_argument('--jitter', type=float, default=0.0, help='maximum additional time per command (s)')
+	parser.add_argument('--throughput', type=float, default=None, help='transfer rate (bytes/s)')
+	parser.add_argument('--timeout-rate', type=float, default=0.0, help='probability of a lost response')
+	parser.add_argument('--seed', type=int, default=None)
+	args = parser.parse_args(args)
+
+	logging.basicConfig(level=logging.INFO)
+
+	simulator = Simulator(args.host)
+
+	for spec in args.devices:
+		if ':' in spec:
+			spec, port = spec.rsplit(':', 1)
+			port = int(port)
+		else:
+			port = 0
+
+		latency = LatencyModel(args.latency, args.jitter, args.throughput, args.timeout_rate, seed=args.seed)
+		simulator.add_device(mock_implementation(spec)(), port, latency)
+
+	try:
+		while True:
+			time.sleep(1)
+	except KeyboardInterrupt:
+		pass
+	finally:
+		simulator.close()
+
+
+if __name__ == '__main__':
+	main()
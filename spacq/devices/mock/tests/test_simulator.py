@@ -0,0 +1,99 @@
+from nose.tools import assert_raises, eq_
+from numpy.testing import assert_allclose
+from time import time
+from unittest import main, TestCase
+
+from spacq.interface.units import Quantity
+
+from ...abstract_device import AbstractDevice, DeviceTimeout
+from ...tektronix.awg5014b import AWG5014B
+from ...tektronix.dpo7104 import DPO7104
+from ...tektronix.mock.mock_awg5014b import MockAWG5014B
+from ...tektronix.mock.mock_dpo7104 import MockDPO7104
+from .. import simulator
+
+
+class ParseMessageTest(TestCase):
+	def testParse(self):
+		"""
+		Split messages into commands.
+		"""
+
+		eq_(simulator.parse_message('*idn?'), None)
+		eq_(simulator.parse_message('*idn?\n*opc?\n'), (['*idn?'], 6))
+		eq_(simulator.parse_message(' :a 1; :b "x;\n"\t;\n'), (['a 1', 'b "x;\n"'], 18))
+
+		# Block data.
+		eq_(simulator.parse_message('data #3'), None)
+		eq_(simulator.parse_message('data #3005ab\n'), None)
+		eq_(simulator.parse_message('data #15ab;\n ;c\n'), (['data #15ab;\n ', 'c'], 16))
+
+
+class SimulatorTest(TestCase):
+	def setUp(self):
+		self.simulator = simulator.Simulator()
+
+	def tearDown(self):
+		self.simulator.close()
+
+	def testDevices(self):
+		"""
+		Real implementations talk to mock devices over sockets.
+		"""
+
+		mock_awg = MockAWG5014B()
+
+		dpo_port = self.simulator.add_device(MockDPO7104())
+		awg_port = self.simulator.add_device(mock_awg)
+
+		dpo = DPO7104(ip_address='127.0.0.1', ip_port=dpo_port)
+		awg = AWG5014B(ip_address='127.0.0.1', ip_port=awg_port)
+
+		eq_(dpo.idn, 'MockDPO7104')
+
+		dpo.time_scale = Quantity(100, 'ns')
+		dpo.sample_rate = Quantity(40, 'GHz')
+		eq_(dpo.record_length, 4e3)
+		eq_(dpo.channels[1].waveform.shape, (4e3, 2))
+
+		# Block data with awkward contents.
+		awg.create_waveform('Test', [-1.0, 0.0, 0.5, 1.0], {1: [1, 0, 1, 0]})
+		assert 'Test' in awg.waveform_names
+
+		# Within the resolution of the packed samples.
+		min_value, max_value = awg.value_range
+		assert_allclose(awg.get_waveform('Test'), [-1.0, 0.0, 0.5, 1.0], rtol=0, atol=2.0 / (max_value - min_value))
+		eq_(mock_awg.find_wave('"Test"').marker1, [1, 0, 1, 0])
+		eq_(mock_awg.find_wave('"Test"').marker2, [0, 0, 0, 0])
+
+		dpo.close()
+		awg.close()
+
+	def testLatency(self):
+		"""
+		Commands take time, and responses may be lost.
+		"""
+
+		model = simulator.LatencyModel(latency=0.01, jitter=0.01, command_latencies={'*opc?': 0.1}, seed=0)
+		port = self.simulator.add_device(MockDPO7104(), latency=model)
+
+		dev = AbstractDevice(ip_address='127.0.0.1', ip_port=port)
+
+		start_time = time()
+		dev.ask('*idn?')
+		elapsed = time() - start_time
+		assert 0.01 <= elapsed < 0.1, elapsed
+
+		start_time = time()
+		dev.ask('*opc?')
+		assert time() - start_time >= 0.11
+
+		model.timeout_rate = 1.0
+		dev.device.timeout = 0.2
+		assert_raises(DeviceTimeout, dev.ask, '*idn?')
+
+		dev.close()
+
+
+if __name__ == '__main__':
+	main()
@@ -23,6 +23,9 @@ class IPS120_10(AbstractDevice):
 	Interface for the Oxford Instruments IPS120-10.
 	"""
 
+	# Not SCPI, so commands cannot be combined.
+	compound_messages = False
+
 	allowed_settings = ['default value', 'something else']
 
 	activities = ['hold', 'to_set', 'to_zero', 'clamped']
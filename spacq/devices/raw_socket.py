@@ -0,0 +1,122 @@
+import logging
+log = logging.getLogger(__name__)
+
+import socket
+
+"""
+SCPI over a plain TCP connection, as offered by many Ethernet instruments on port 5025.
+"""
+
+
+class RawSocketInstrument(object):
+	"""
+	A connection to an instrument which reads and writes newline-terminated messages over TCP.
+	"""
+
+	default_port = 5025
+
+	termination = '\n'
+	chunk_size = 2 ** 16
+
+	def __init__(self, host, port=None, timeout=10):
+		"""
+		host: The address of the instrument.
+		port: The TCP port on which the instrument is listening.
+		timeout: Timeout in seconds for every operation; socket.timeout is raised when it is exceeded.
+		"""
+
+		if port is None:
+			port = self.default_port
+
+		self.host = host
+		self.port = port
+
+		self.socket = socket.create_connection((host, port), timeout)
+		# Messages are small and latency matters more than throughput.
+		self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+		# Received, but not yet read.
+		self.buf = bytearray()
+
+	@property
+	def timeout(self):
+		return self.socket.gettimeout()
+
+	@timeout.setter
+	def timeout(self, value):
+		self.socket.settimeout(value)
+
+	def write(self, message):
+		if not message.endswith(self.termination):
+			message += self.termination
+
+		self.socket.sendall(message)
+
+	def _fill(self):
+		"""
+		Receive some more data.
+		"""
+
+		data = self.socket.recv(self.chunk_size)
+
+		if not data:
+			raise socket.error('Connection closed by {0}:{1}'.format(self.host, self.port))
+
+		self.buf.extend(data)
+
+	def _block_data_end(self):
+		"""
+		The position after the definite-length block data at the start of the buffer, or 0 if there is none.
+		"""
+
+		while not self.buf:
+			self._fill()
+
+		if self.buf[0] != ord('#'):
+			return 0
+
+		while len(self.buf) < 2:
+			self._fill()
+
+		num_digits = int(chr(self.buf[1]))
+		if num_digits == 0:
+			# Indefinite length, so it ends at the terminator.
+			return 0
+
+		while len(self.buf) < 2 + num_digits:
+			self._fill()
+
+		return 2 + num_digits + int(str(self.buf[2:2 + num_digits]))
+
+	def read_raw(self):
+		"""
+		Read a single response, including its terminator.
+
+		Block data may contain the terminator, so its declared length is respected.
+		"""
+
+		while not self.buf:
+			self._fill()
+
+		# The terminator follows the block data.
+		start = self._block_data_end()
+
+		while len(self.buf) < start:
+			self._fill()
+
+		while True:
+			pos = self.buf.find(self.termination, start)
+
+			if pos >= 0:
+				break
+
+			start = len(self.buf)
+			self._fill()
+
+		result = str(self.buf[:pos + 1])
+		del self.buf[:pos + 1]
+
+		return result
+
+	def close(self):
+		self.socket.close()
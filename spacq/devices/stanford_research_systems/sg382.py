@@ -19,6 +19,9 @@ class SG382(AbstractDevice):
 	Interface for Stanford Research Systems SG382
 	"""
 
+	# Not SCPI, so commands cannot be combined.
+	compound_messages = False
+
 	allowedEnable = set(['off','on'])
 	allowedModType = set(['0','1','2','3','4','5','6']) # AM, FM, Phase, Sweep, Pulse, Blank, IQ
 	allowedModType = set(['AM','FM','Phase','Sweep','Pulse','Blank','IQ'])
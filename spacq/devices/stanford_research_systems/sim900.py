@@ -95,6 +95,9 @@ class sim900(AbstractDevice):
 	"""
 	Interface for the SRS Sim900+Sim928 voltage source
 	"""
+
+	# Not SCPI, so commands cannot be combined.
+	compound_messages = False
 	
 	def _setup(self):
 		AbstractDevice._setup(self)
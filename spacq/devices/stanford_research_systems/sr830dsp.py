@@ -21,6 +21,9 @@ class SR830DSP(AbstractDevice):
 	NOTE: This implementation is currently very specific on its task, it could be made more flexible if desired
 	"""
 
+	# Not SCPI, so commands cannot be combined.
+	compound_messages = False
+
 	#allowed_nplc = set([0.02, 0.2, 1.0, 10.0, 100.0])
 	#allowed_auto_zero = set(['off', 'on', 'once'])
 
@@ -1,13 +1,14 @@
 import logging
 log = logging.getLogger(__name__)
 
-import struct
+from hashlib import sha1
+import numpy
 
 from spacq.interface.resources import Resource
 from spacq.interface.units import Quantity
 from spacq.tool.box import Synchronized
 
-from ..abstract_device import AbstractDevice, AbstractSubdevice
+from ..abstract_device import cached_query, AbstractDevice, AbstractSubdevice
 from ..tools import str_to_bool, quantity_wrapped, quantity_unwrapped, BlockData
 
 """
@@ -17,6 +18,71 @@ Control the AWG's settings and output waveforms.
 """
 
 
+def pack_waveform(data, markers, value_range):
+	"""
+	Pack waveform data on [-1, 1] and its markers into little-endian, unsigned 16-bit samples.
+
+	The data is quantized onto value_range, and each marker (1 or 2) sets one of the top 2 bits.
+	"""
+
+	min_value, max_value = value_range
+	range_diff = max_value - min_value
+
+	# Same operations as min_value + int(range_diff * (x + 1.0) / 2.0) for each sample.
+	scaled = numpy.array(data, dtype=float)
+	scaled += 1.0
+	scaled *= range_diff
+	scaled /= 2.0
+	samples = scaled.astype(numpy.int64)
+	samples += min_value
+
+	if markers:
+		# The markers are in the top 2 bits.
+		for marker_num, marker_bit in zip([1, 2], [1 << 14, 1 << 15]):
+			try:
+				marker_data = numpy.asarray(markers[marker_num]).astype(bool)
+			except KeyError:
+				continue
+
+			if len(marker_data) > len(samples):
+				raise ValueError('Marker {0} is longer than the waveform: {1} > {2}'.format(marker_num,
+						len(marker_data), len(samples)))
+
+			samples[:len(marker_data)] += marker_data * marker_bit
+
+			if log.isEnabledFor(logging.DEBUG):
+				log.debug('Added marker {0} to waveform: {1!r}'.format(marker_num, markers[marker_num]))
+
+		extra_markers = set(markers) - set([1, 2])
+		for extra in extra_markers:
+			log.warning('Marker {0} ignored: {1!r}'.format(extra, markers[extra]))
+
+	if len(samples) > 0 and (samples.min() < 0 or samples.max() > 0xffff):
+		raise ValueError('Waveform data out of range')
+
+	# Always 16-bit, unsigned, little-endian.
+	return samples.astype('<u2').tostring()
+
+def unpack_waveform(packed_data, value_range):
+	"""
+	Unpack little-endian, unsigned 16-bit samples into waveform data on [-1, 1], discarding the markers.
+	"""
+
+	samples = numpy.frombuffer(packed_data, dtype='<u2', count=len(packed_data) // 2)
+	# Filter out marker data.
+	samples = samples & (2 ** 14 - 1)
+
+	min_value, max_value = value_range
+	range_diff = max_value - min_value
+
+	# Same operations as 2.0 * (x - min_value) / range_diff - 1.0 for each sample.
+	data = (samples.astype(numpy.int64) - min_value) * 2.0
+	data /= range_diff
+	data -= 1.0
+
+	return data
+
+
 class Marker(AbstractSubdevice):
 	"""
 	Marker channel of an output channel.
@@ -109,11 +175,21 @@ class Channel(AbstractSubdevice):
 		self.resources['enabled'].converter = str_to_bool
 		self.resources['amplitude'].units = 'V'
 
+		self.forget_state()
+
 	def __init__(self, device, channel, *args, **kwargs):
 		self.channel = channel
 
 		AbstractSubdevice.__init__(self, device, *args, **kwargs)
 
+	def forget_state(self):
+		"""
+		Forget the last waveform name and amplitude sent, so that they are sent again.
+		"""
+
+		self._waveform_name = None
+		self._amplitude = None
+
 	@property
 	def waveform_name(self):
 		"""
@@ -127,6 +203,7 @@ class Channel(AbstractSubdevice):
 	@waveform_name.setter
 	def waveform_name(self, v):
 		self.device.write('source{0}:waveform "{1}"'.format(self.channel, v))
+		self._waveform_name = v
 
 	@waveform_name.deleter
 	def waveform_name(self):
@@ -161,36 +238,43 @@ class Channel(AbstractSubdevice):
 	def amplitude(self, v):
 		# Convert zero-to-peak to peak-to-peak.
 		self.device.write('source{0}:voltage {1:E}'.format(self.channel, 2 * v))
+		self._amplitude = v
 
 	def set_waveform(self, waveform, markers=None, name=None):
 		"""
 		Set the waveform on this channel.
 
 		The waveform data should be in V.
+
+		Nothing is sent if the waveform, amplitude and waveform name are the same as those last sent.
 		"""
 
 		if name is None:
 			name = 'Channel {0}'.format(self.channel)
 
-		# Clear existing.
-		if name in self.device.waveform_names:
-			self.device.delete_waveform(name)
+		if not self.device.waveforms_synced:
+			self.device.sync_waveforms()
 
 		# Normalize waveform.
-		max_amp = max(abs(x) for x in waveform)
+		waveform = numpy.asarray(waveform, dtype=float)
+		max_amp = numpy.abs(waveform).max()
 		if max_amp > self.max_amplitude:
 			raise ValueError('Amplitude {0} V exceeds maximum of {1} V'.format(max_amp, self.max_amplitude))
 		elif max_amp > 0:
 			if max_amp < self.min_amplitude:
 				max_amp = self.min_amplitude
 
-			waveform = [x / max_amp for x in waveform]
+			waveform = waveform / max_amp
 
-			self.amplitude = Quantity(max_amp, 'V')
+			amplitude = Quantity(max_amp, 'V')
+			if amplitude.value != self._amplitude:
+				self.amplitude = amplitude
 
-		# Create new.
+		# Create new, unless it is already there.
 		self.device.create_waveform(name, waveform, markers)
-		self.waveform_name = name
+
+		if self._waveform_name != name:
+			self.waveform_name = name
 
 
 class AWG5014B(AbstractDevice):
@@ -218,6 +302,8 @@ class AWG5014B(AbstractDevice):
 		self.resources['run_mode'].allowed_values = self.allowed_run_modes
 		self.resources['enabled'].converter = str_to_bool
 
+		self.forget_waveforms()
+
 	@Synchronized()
 	def reset(self):
 		"""
@@ -227,6 +313,39 @@ class AWG5014B(AbstractDevice):
 		log.info('Resetting "{0}".'.format(self.name))
 		self.write('*rst')
 
+		self.forget_waveforms()
+
+	def forget_waveforms(self):
+		"""
+		Forget everything known about the waveforms on the device.
+		"""
+
+		# Content hashes of the waveforms in the waveform list, by name. A hash of None means that the waveform
+		# exists, but its content is unknown.
+		self.waveform_hashes = {}
+		self.waveforms_synced = False
+
+		for channel in self.channels[1:]:
+			channel.forget_state()
+
+	@Synchronized()
+	def sync_waveforms(self):
+		"""
+		Reconcile the known waveforms with the waveform list on the device.
+
+		This should be done at least once before relying on the cache (such as at the start of a sweep), since the
+		device may have been changed from elsewhere.
+		"""
+
+		self.query_cache.invalidate('waveform_names')
+		names = self.waveform_names
+
+		self.waveform_hashes = dict((name, self.waveform_hashes.get(name)) for name in names)
+		self.waveforms_synced = True
+
+		for channel in self.channels[1:]:
+			channel.forget_state()
+
 	@property
 	def data_bits(self):
 		"""
@@ -287,7 +406,7 @@ class AWG5014B(AbstractDevice):
 
 		self.write('awgcontrol:rmode {0}'.format(value))
 
-	@property
+	@cached_query()
 	@Synchronized()
 	def waveform_names(self):
 		"""
@@ -313,16 +432,11 @@ class AWG5014B(AbstractDevice):
 			log.debug('Getting waveform "{0}" from device "{1}".'.format(name, self.name))
 
 			block_data = self.ask_raw('wlist:waveform:data? "{0}"'.format(name))
-			packed_data = BlockData.from_block_data(block_data)
-			waveform_length = len(packed_data) / 2
-			data = struct.unpack('<{0}H'.format(waveform_length), packed_data)
-			data = [x & 2 ** 14 - 1 for x in data] # Filter out marker data.
-
-			min_value, max_value = self.value_range
-			range_diff = max_value - min_value
-			data = [2.0 * (x - min_value) / range_diff - 1.0 for x in data]
+			data_start, data_end = BlockData.block_data_bounds(block_data)
+			data = unpack_waveform(buffer(block_data, data_start, data_end - data_start), self.value_range)
 
-			log.debug('Got waveform "{0}" from device "{1}": {2!r}'.format(name, self.name, data))
+			if log.isEnabledFor(logging.DEBUG):
+				log.debug('Got waveform "{0}" from device "{1}": {2!r}'.format(name, self.name, data))
 
 			return data
 		finally:
@@ -331,47 +445,45 @@ class AWG5014B(AbstractDevice):
 	@Synchronized()
 	def create_waveform(self, name, data, markers=None):
 		"""
-		Create a new waveform on the AWG.
+		Create a new waveform on the AWG, replacing any existing waveform with the same name.
 
 		The waveform data should be on [-1, 1].
+
+		If the existing waveform is known to have the same content, nothing is sent and False is returned.
 		"""
 
+		if not self.waveforms_synced:
+			self.sync_waveforms()
+
 		self.status.append('Creating waveform "{0}"'.format(name))
 
 		try:
-			log.debug('Creating waveform "{0}" on device "{1}" with data: {2!r}'.format(name, self.name, data))
+			if log.isEnabledFor(logging.DEBUG):
+				log.debug('Creating waveform "{0}" on device "{1}" with data: {2!r}'.format(name, self.name, data))
 
-			min_value, max_value = self.value_range
-			range_diff = max_value - min_value
-			data = [min_value + int(range_diff * (x + 1.0) / 2.0) for x in data]
+			packed_data = pack_waveform(data, markers, self.value_range)
+			content_hash = sha1(packed_data).hexdigest()
 
-			waveform_length = len(data)
+			if name in self.waveform_hashes:
+				if self.waveform_hashes[name] == content_hash:
+					log.debug('Waveform "{0}" on device "{1}" is unchanged.'.format(name, self.name))
+
+					return False
+
+				self.write('wlist:waveform:delete "{0}"'.format(name))
+				del self.waveform_hashes[name]
+				self._waveform_deleted(name)
+
+			waveform_length = len(packed_data) // 2
 			self.write('wlist:waveform:new "{0}", {1}, integer'.format(name, waveform_length))
+			self.query_cache.invalidate('waveform_names')
 
-			if markers:
-				# The markers are in the top 2 bits.
-				for marker_num, marker_bit in zip([1, 2], [1 << 14, 1 << 15]):
-					try:
-						for i, marker_datum in enumerate(markers[marker_num]):
-							if marker_datum:
-								data[i] += marker_bit
-						log.debug('Added marker {0} to waveform "{1}" device "{1}": {2!r}'.format(marker_num,
-								name, self.name, markers[marker_num]))
-					except KeyError:
-						pass
-
-				extra_markers = set(markers) - set([1, 2])
-				for extra in extra_markers:
-					log.warning('Marker {0} ignored: {1!r}'.format(extra, markers[extra]))
-
-			# Always 16-bit, unsigned, little-endian.
-			packed_data = struct.pack('<{0}H'.format(waveform_length), *data)
 			block_data = BlockData.to_block_data(packed_data)
 
-			log.debug('Sending packed block waveform data for "{0}" on device "{1!r}": {2}'.format(name,
-					self.name, block_data))
-
 			self.write('wlist:waveform:data "{0}", {1}'.format(name, block_data))
+			self.waveform_hashes[name] = content_hash
+
+			return True
 		finally:
 			self.status.pop()
 
@@ -384,6 +496,18 @@ class AWG5014B(AbstractDevice):
 			raise ValueError('No such waveform "{0}"'.format(name))
 
 		self.write('wlist:waveform:delete "{0}"'.format(name))
+		self.waveform_hashes.pop(name, None)
+		self._waveform_deleted(name)
+		self.query_cache.invalidate('waveform_names')
+
+	def _waveform_deleted(self, name):
+		"""
+		Deleting a waveform also unloads it from any channel using it, so it must be loaded again.
+		"""
+
+		for channel in self.channels[1:]:
+			if channel._waveform_name == name:
+				channel._waveform_name = None
 
 	@property
 	def enabled(self):
@@ -2,13 +2,12 @@ import logging
 log = logging.getLogger(__name__)
 
 from math import ceil
-from numpy import linspace
-import struct
+from numpy import empty, linspace
 
 from spacq.interface.resources import Resource
 from spacq.tool.box import Synchronized
 
-from ..abstract_device import AbstractDevice, AbstractSubdevice
+from ..abstract_device import cached_query, AbstractDevice, AbstractSubdevice
 from ..tools import str_to_bool, quantity_wrapped, quantity_unwrapped, BlockData
 
 """
@@ -61,6 +60,8 @@ class Channel(AbstractSubdevice):
 	def transform_waveform(self, waveform):
 		"""
 		Transform some curve data onto the true amplitude interval in V, and intermix time values in s.
+
+		The result is an array of (time, value) rows.
 		"""
 
 		value_min, value_max = self.device.value_range
@@ -69,11 +70,20 @@ class Channel(AbstractSubdevice):
 		real_min, real_max = self.acquisition_window
 		real_diff = real_max - real_min
 
-		times = linspace(0, self.device.time_scale.value, len(waveform))
+		result = empty((len(waveform), 2))
+		result[:,0] = linspace(0, self.device.time_scale.value, len(waveform))
 
-		return [(time, real_diff * float(x - value_min) / value_diff + real_min) for time, x in zip(times, waveform)]
+		# Convert before subtracting, so that the raw values do not overflow.
+		values = result[:,1]
+		values[:] = waveform
+		values -= value_min
+		values *= real_diff
+		values /= value_diff
+		values += real_min
 
-	@property
+		return result
+
+	@cached_query(exact=True)
 	def enabled(self):
 		"""
 		The input state (on/off) of the channel.
@@ -92,7 +102,7 @@ class Channel(AbstractSubdevice):
 		"""
 		A waveform acquired by the scope.
 
-		Values are returned in the format [(time1, value1), (time2, value2), ...].
+		Values are returned as an array of the form [(time1, value1), (time2, value2), ...].
 		"""
 
 		self.device.status.append('Getting waveform for channel {0}'.format(self.channel))
@@ -113,24 +123,30 @@ class Channel(AbstractSubdevice):
 			num_data_points = self.device.record_length
 			num_transmissions = int(ceil(num_data_points / self.device.max_receive_samples))
 
-			curve = []
+			# Data points are signed and big-endian.
+			dtype = '>' + self.device.byte_format_letters[self.device.waveform_bytes]
+
+			# Each chunk is decoded straight into place.
+			curve = empty(num_data_points, dtype=dtype)
+			received = 0
 			for i in xrange(num_transmissions):
 				self.device.data_start = int(i * self.device.max_receive_samples) + 1
 				self.device.data_stop = int((i + 1) * self.device.max_receive_samples)
 
 				curve_raw = self.device.ask_raw('curve?')
-				curve.append(BlockData.from_block_data(curve_raw))
+				chunk = BlockData.array_from_block_data(curve_raw, dtype)[:num_data_points - received]
 
-			curve = ''.join(curve)
+				curve[received:received + len(chunk)] = chunk
+				received += len(chunk)
 
-			format_code = self.device.byte_format_letters[self.device.waveform_bytes]
-			curve_data = struct.unpack('!{0}{1}'.format(num_data_points, format_code), curve)
+			if received != num_data_points:
+				raise ValueError('Expected {0} data points, got {1}'.format(num_data_points, received))
 
-			return self.transform_waveform(curve_data)
+			return self.transform_waveform(curve)
 		finally:
 			self.device.status.pop()
 
-	@property
+	@cached_query()
 	@quantity_wrapped('V')
 	def scale(self):
 		"""
@@ -146,7 +162,7 @@ class Channel(AbstractSubdevice):
 	def scale(self, value):
 		self.device.write('ch{0}:scale {1}'.format(self.channel, value))
 
-	@property
+	@cached_query()
 	@quantity_wrapped('V')
 	def offset(self):
 		"""
@@ -175,6 +191,8 @@ class DPO7104(AbstractDevice):
 	allowed_waveform_bytes = [1, 2] # Channel data only.
 	allowed_fastframe_sums = set(['none', 'average', 'envelope'])
 
+	cache_clearing_commands = AbstractDevice.cache_clearing_commands + ['autoset', 'factory']
+
 	def _setup(self):
 		AbstractDevice._setup(self)
 
@@ -208,7 +226,7 @@ class DPO7104(AbstractDevice):
 
 		self.write('autoset execute')
 
-	@property
+	@cached_query()
 	def stopafter(self):
 		"""
 		The acqusition mode.
@@ -228,7 +246,7 @@ class DPO7104(AbstractDevice):
 
 		self.write('acquire:stopafter {0}'.format(value))
 
-	@property
+	@cached_query(exact=True)
 	def waveform_bytes(self):
 		"""
 		Number of bytes per data point in the acquired waveforms.
@@ -265,7 +283,7 @@ class DPO7104(AbstractDevice):
 	def acquiring(self, value):
 		self.write('acquire:state {0}'.format(str(int(value))))
 
-	@property
+	@cached_query(depends_on=['time_scale'])
 	@quantity_wrapped('Hz')
 	def sample_rate(self):
 		"""
@@ -279,21 +297,29 @@ class DPO7104(AbstractDevice):
 	def sample_rate(self, value):
 		self.write('horizontal:mode:samplerate {0}'.format(value))
 
-	@property
+	@cached_query()
+	def horizontal_divisions(self):
+		"""
+		The number of horizontal divisions.
+		"""
+
+		return float(self.ask('horizontal:divisions?'))
+
+	@cached_query(depends_on=['sample_rate'])
 	@quantity_wrapped('s')
 	def time_scale(self):
 		"""
 		The length for a waveform.
 		"""
 
-		return float(self.ask('horizontal:divisions?')) * float(self.ask('horizontal:mode:scale?'))
+		return self.horizontal_divisions * float(self.ask('horizontal:mode:scale?'))
 
 	@time_scale.setter
 	@quantity_unwrapped('s')
 	def time_scale(self, value):
-		self.write('horizontal:mode:scale {0}'.format(value / float(self.ask('horizontal:divisions?'))))
+		self.write('horizontal:mode:scale {0}'.format(value / self.horizontal_divisions))
 
-	@property
+	@cached_query(exact=True)
 	def data_source(self):
 		"""
 		The source from which to transfer data.
@@ -308,7 +334,7 @@ class DPO7104(AbstractDevice):
 	def data_source(self, value):
 		self.write('data:source ch{0}'.format(value))
 
-	@property
+	@cached_query(exact=True)
 	def data_start(self):
 		"""
 		The first data point to transfer.
@@ -320,7 +346,8 @@ class DPO7104(AbstractDevice):
 	def data_start(self, value):
 		self.write('data:start {0}'.format(value))
 
-	@property
+	# The device limits the value to the record length.
+	@cached_query(depends_on=['sample_rate', 'time_scale'], exact=True)
 	def data_stop(self):
 		"""
 		The last data point to transfer.
@@ -332,7 +359,7 @@ class DPO7104(AbstractDevice):
 	def data_stop(self, value):
 		self.write('data:stop {0}'.format(value))
 
-	@property
+	@cached_query(depends_on=['sample_rate', 'time_scale'])
 	def record_length(self):
 		"""
 		The number of data points in a waveform.
@@ -348,7 +375,7 @@ class DPO7104(AbstractDevice):
 
 		self.acquiring = True
 
-	@property
+	@cached_query(exact=True)
 	def fastframe(self):
 		"""
 		Whether fastframe is enabled.
@@ -360,7 +387,7 @@ class DPO7104(AbstractDevice):
 	def fastframe(self, value):
 		return self.write('horizontal:fastframe:state {0}'.format(int(value)))
 
-	@property
+	@cached_query(exact=True)
 	def fastframe_sum(self):
 		"""
 		The fastframe summary frame.
@@ -384,10 +411,12 @@ class DPO7104(AbstractDevice):
 
 		return self.write('horizontal:fastframe:sumframe {0}'.format(value))
 
-	@property
+	@cached_query()
 	def fastframe_count(self):
 		"""
 		The number of waveforms to acquire in fastframe mode.
+
+		Note: The device limits the count, so it is always read back after being set.
 		"""
 
 		return int(self.ask('horizontal:fastframe:count?'))
@@ -399,7 +428,8 @@ class DPO7104(AbstractDevice):
 
 		self.write('horizontal:fastframe:count {0:d}'.format(value))
 
-	@property
+	# The device limits the value to the frame count.
+	@cached_query(depends_on=['fastframe_count'], exact=True)
 	def fastframe_start(self):
 		"""
 		The first frame to transfer.
@@ -411,7 +441,7 @@ class DPO7104(AbstractDevice):
 	def fastframe_start(self, value):
 		self.write('data:framestart {0}'.format(value))
 
-	@property
+	@cached_query(depends_on=['fastframe_count'], exact=True)
 	def fastframe_stop(self):
 		"""
 		The last frame to transfer.
@@ -173,6 +173,11 @@ class MockAWG5014B(MockAbstractDevice, AWG5014B):
 					done = True
 				elif cmd[1] == 'waveform' and cmd[2] == 'delete':
 					self.mock_state['wlist'].remove(self.find_wave(args))
+
+					# Unloaded from any channel using it.
+					for channel in self.mock_state['channels'][1:]:
+						if channel.waveform_name == args:
+							channel.waveform_name = '""'
 					done = True
 			elif cmd[0].startswith('source'):
 				source = int(cmd[0][6])
@@ -29,6 +29,9 @@ class MockDPO7104(MockAbstractDevice, DPO7104):
 	Mock interface for Tektronix DPO7104 DPO.
 	"""
 
+	# The most frames which can be acquired in fastframe mode.
+	max_fastframe_count = 1000
+
 	def __init__(self, *args, **kwargs):
 		self.mocking = DPO7104
 
@@ -118,6 +121,18 @@ class MockDPO7104(MockAbstractDevice, DPO7104):
 						else:
 							self.mock_state['fastframe'] = bool(int(args))
 						done = True
+					elif cmd[2] == 'sumframe':
+						if query:
+							result = self.mock_state['fastframe_sum']
+						else:
+							self.mock_state['fastframe_sum'] = args
+						done = True
+					elif cmd[2] == 'count':
+						if query:
+							result = self.mock_state['fastframe_count']
+						else:
+							self.mock_state['fastframe_count'] = min(int(args), self.max_fastframe_count)
+						done = True
 			elif cmd[0] == 'data':
 				if cmd[1] == 'start':
 					if query:
@@ -1,4 +1,6 @@
-from unittest import main
+from nose.tools import eq_
+from numpy import linspace
+from unittest import main, TestCase
 
 from ... import awg5014b
 from .. import mock_awg5014b
@@ -22,5 +24,99 @@ def teardown():
 	AWG5014BTest.mock = is_mock
 
 
+class MockAWG5014BCommandTest(TestCase):
+	def record(self, awg):
+		"""
+		Keep every message sent to the device from now on.
+		"""
+
+		sent = []
+		write = awg.write
+
+		def recording_write(message, *args, **kwargs):
+			sent.append(message.split()[0])
+			write(message, *args, **kwargs)
+
+		awg.write = recording_write
+
+		return sent
+
+	def testUploadSkipping(self):
+		"""
+		Only what has changed is sent.
+		"""
+
+		awg = mock_awg5014b.MockAWG5014B()
+		channel = awg.channels[1]
+
+		data = linspace(-0.5, 0.5, 21)
+		markers = {1: [1, 0] * 10 + [1]}
+
+		sent = self.record(awg)
+
+		channel.set_waveform(data, markers, name='Test')
+		# The waveform list holds one predefined waveform.
+		eq_(sent, ['wlist:size?', 'wlist:name?', 'source1:voltage', 'wlist:waveform:new', 'wlist:waveform:data',
+				'source1:waveform'])
+
+		# Nothing at all.
+		del sent[:]
+		channel.set_waveform(data, markers, name='Test')
+		eq_(sent, [])
+
+		# Only the amplitude.
+		channel.set_waveform(data * 2, markers, name='Test')
+		eq_(sent, ['source1:voltage'])
+
+		# Only the content; replacing the waveform unloads it, so it is loaded again.
+		del sent[:]
+		channel.set_waveform(data * 2, {1: [0, 1] * 10 + [0]}, name='Test')
+		eq_(sent, ['wlist:waveform:delete', 'wlist:waveform:new', 'wlist:waveform:data', 'source1:waveform'])
+		eq_(channel.waveform_name, 'Test')
+
+		# The same content under a new name on another channel.
+		del sent[:]
+		awg.channels[2].set_waveform(data * 2, {1: [0, 1] * 10 + [0]}, name='Other')
+		eq_(sent, ['source2:voltage', 'wlist:waveform:new', 'wlist:waveform:data', 'source2:waveform'])
+
+		# Everything is sent again after a reset.
+		del sent[:]
+		awg.reset()
+		channel.set_waveform(data * 2, markers, name='Test')
+		eq_(sent, ['*rst', 'wlist:size?', 'wlist:name?', 'source1:voltage', 'wlist:waveform:new',
+				'wlist:waveform:data', 'source1:waveform'])
+
+	def testSync(self):
+		"""
+		Waveforms changed from elsewhere are noticed when syncing.
+		"""
+
+		awg = mock_awg5014b.MockAWG5014B()
+		channel = awg.channels[1]
+
+		data = linspace(-1, 1, 11)
+
+		channel.set_waveform(data, name='Test')
+		assert 'Test' in awg.waveform_hashes
+
+		# Created and removed behind the driver's back.
+		awg.write('wlist:waveform:new "Other", 11, integer')
+		awg.write('wlist:waveform:delete "Test"')
+
+		awg.sync_waveforms()
+		eq_(awg.waveform_hashes, {'predefined waveform': None, 'Other': None})
+
+		sent = self.record(awg)
+
+		# Unknown content is always replaced.
+		awg.create_waveform('Other', data)
+		eq_(sent, ['wlist:waveform:delete', 'wlist:waveform:new', 'wlist:waveform:data'])
+
+		# The channel state is sent again after syncing.
+		del sent[:]
+		channel.set_waveform(data, name='Test')
+		eq_(sent, ['source1:voltage', 'wlist:waveform:new', 'wlist:waveform:data', 'source1:waveform'])
+
+
 if __name__ == '__main__':
 	main()
@@ -1,4 +1,7 @@
-from unittest import main
+from nose.tools import eq_
+from unittest import main, TestCase
+
+from spacq.interface.units import Quantity
 
 from ... import dpo7104
 from .. import mock_dpo7104
@@ -22,5 +25,81 @@ def teardown():
 	DPO7104Test.mock = is_mock
 
 
+class MockDPO7104CommandTest(TestCase):
+	def record(self, dpo):
+		"""
+		Keep every message sent to the device from now on.
+		"""
+
+		sent = []
+		write = dpo.write
+
+		def recording_write(message, *args, **kwargs):
+			sent.append(message)
+			write(message, *args, **kwargs)
+
+		dpo.write = recording_write
+
+		return sent
+
+	def testWaveformQueries(self):
+		"""
+		Settings are only sent and queried when they may have changed.
+		"""
+
+		dpo = mock_dpo7104.MockDPO7104()
+		dpo.time_scale = Quantity(100, 'ns')
+		dpo.sample_rate = Quantity(40, 'GHz')
+
+		sent = self.record(dpo)
+
+		eq_(dpo.channels[1].waveform.shape, (4000, 2))
+		assert 'curve?' in sent
+
+		# Nothing but the data.
+		del sent[:]
+		dpo.channels[1].waveform
+		eq_(sent, ['curve?'])
+
+		# A new record length is queried, and the data range is sent again.
+		del sent[:]
+		dpo.sample_rate = Quantity(20, 'GHz')
+		eq_(dpo.channels[1].waveform.shape, (2000, 2))
+		assert 'horizontal:mode:recordlength?' in sent
+		assert 'data:stop 10000000' in sent
+
+		# The frame count is read back, and the frame range follows it.
+		dpo.fastframe = True
+		dpo.fastframe_count = 10 ** 6
+
+		del sent[:]
+		dpo.channels[1].waveform
+		eq_(sent, ['horizontal:fastframe:count?', 'data:framestart 1000', 'data:framestop 1000', 'curve?'])
+
+		del sent[:]
+		dpo.channels[1].waveform
+		eq_(sent, ['curve?'])
+
+	def testReadBack(self):
+		"""
+		Settings which the device may change are not trusted after being set.
+		"""
+
+		dpo = mock_dpo7104.MockDPO7104()
+		sent = self.record(dpo)
+
+		dpo.stopafter = 'sequence'
+		eq_(dpo.stopafter, 'sequence')
+		dpo.stopafter = 'sequence'
+		eq_(sent, ['acquire:stopafter sequence', 'acquire:stopafter?', 'acquire:stopafter sequence'])
+
+		# Exact settings are neither sent again nor queried.
+		del sent[:]
+		dpo.waveform_bytes = 1
+		dpo.waveform_bytes = 1
+		eq_(dpo.waveform_bytes, 1)
+		eq_(sent, ['wfmoutpre:byt_nr 1'])
+
+
 if __name__ == '__main__':
 	main()
@@ -127,6 +127,56 @@ class AWG5014BTest(DeviceServerTestCase):
 		assert not awg.waiting_for_trigger
 		assert awg.enabled
 
+	def testUploadSkipping(self):
+		"""
+		Unchanged waveforms are not sent again.
+		"""
+
+		awg = self.obtain_device()
+		awg.reset()
+
+		data = linspace(-0.5, 0.5, 21)
+		markers = {1: [1, 0] * 10 + [1]}
+
+		awg.channels[1].set_waveform(data, markers, name='Test')
+
+		# Record everything sent to the device from now on.
+		sent = []
+		real_write = awg.write
+
+		def write(message):
+			sent.append(message)
+			real_write(message)
+
+		awg.write = write
+
+		try:
+			awg.channels[1].set_waveform(data, markers, name='Test')
+			eq_(sent, [])
+
+			# Only the amplitude differs.
+			awg.channels[1].set_waveform(data * 2, markers, name='Test')
+			eq_(len(sent), 1)
+
+			# Different markers.
+			del sent[:]
+			awg.channels[1].set_waveform(data * 2, {1: [0, 1] * 10 + [0]}, name='Test')
+			eq_([message.split()[0] for message in sent], ['wlist:waveform:delete', 'wlist:waveform:new',
+					'wlist:waveform:data', 'source1:waveform'])
+		finally:
+			del awg.write
+
+		# Still loaded after being replaced.
+		eq_(awg.channels[1].waveform_name, 'Test')
+
+		# Removed from elsewhere.
+		awg.delete_waveform('Test')
+		awg.sync_waveforms()
+		awg.channels[1].set_waveform(data * 2, {1: [0, 1] * 10 + [0]}, name='Test')
+
+		eq_(awg.channels[1].waveform_name, 'Test')
+		assert_array_almost_equal(awg.get_waveform('Test'), data / 0.5, 4)
+
 
 if __name__ == '__main__':
 	main()
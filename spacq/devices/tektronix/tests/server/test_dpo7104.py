@@ -49,8 +49,8 @@ class DPO7104Test(DeviceServerTestCase):
 		eq_(dpo.time_scale.value, 1e-7)
 		eq_(dpo.sample_rate.value, 4e10)
 
-		eq_(len(ws[0]), 4e3)
-		eq_(len(ws[1]), 4e3)
+		eq_(ws[0].shape, (4e3, 2))
+		eq_(ws[1].shape, (4e3, 2))
 
 		# Long sample.
 		dpo.acquisition_mode = 'sample'
@@ -76,6 +76,72 @@ class DPO7104Test(DeviceServerTestCase):
 		# Check the data.
 		assert all(x >= -1.5 and x <= 3.5 for w in ws for _, x in w)
 
+	def testWaveformQueries(self):
+		"""
+		Settings are not queried again for each waveform.
+		"""
+
+		dpo = self.obtain_device()
+		dpo.reset()
+
+		dpo.time_scale = Quantity(100, 'ns')
+		dpo.sample_rate = Quantity(40, 'GHz')
+
+		dpo.acquire()
+		dpo.channels[1].waveform
+
+		messages = []
+		write = dpo.write
+
+		def recording_write(message, *args, **kwargs):
+			messages.append(message)
+			write(message, *args, **kwargs)
+
+		dpo.write = recording_write
+
+		try:
+			w = dpo.channels[1].waveform
+		finally:
+			del dpo.write
+
+		eq_(messages, ['curve?'])
+		eq_(w.shape, (4e3, 2))
+		assert dpo.query_cache.hits > 0
+
+		# Changing a setting forgets what depends on it.
+		dpo.sample_rate = Quantity(20, 'GHz')
+		eq_(dpo.record_length, 2e3)
+
+	def testFastframe(self):
+		"""
+		The frame count is read back from the device after being set.
+		"""
+
+		dpo = self.obtain_device()
+		dpo.reset()
+
+		dpo.fastframe = True
+		dpo.fastframe_sum = 'average'
+		eq_(dpo.fastframe_sum, 'average')
+
+		dpo.fastframe_count = 5
+		eq_(dpo.fastframe_count, 5)
+
+		# Far too many for the device.
+		dpo.fastframe_count = 10 ** 9
+		assert dpo.fastframe_count < 10 ** 9
+
+		dpo.fastframe_count = 5
+		eq_(dpo.fastframe_count, 5)
+
+		dpo.acquire()
+		dpo.channels[1].waveform
+
+		eq_(dpo.fastframe_start, 5)
+		eq_(dpo.fastframe_stop, 5)
+
+		dpo.fastframe = False
+
 
 if __name__ == '__main__':
 	main()
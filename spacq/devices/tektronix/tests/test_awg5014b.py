@@ -0,0 +1,82 @@
+from nose.tools import assert_raises, eq_
+from numpy import linspace
+from numpy.testing import assert_array_equal
+import random
+import struct
+from unittest import main, TestCase
+
+from .. import awg5014b
+
+
+class WaveformPackingTest(TestCase):
+	value_range = (0, 2 ** 14 - 1)
+
+	def pack(self, data, markers):
+		"""
+		Sample-by-sample reference packing.
+		"""
+
+		min_value, max_value = self.value_range
+		range_diff = max_value - min_value
+		data = [min_value + int(range_diff * (x + 1.0) / 2.0) for x in data]
+
+		for marker_num, marker_bit in zip([1, 2], [1 << 14, 1 << 15]):
+			for i, marker_datum in enumerate(markers.get(marker_num, [])):
+				if marker_datum:
+					data[i] += marker_bit
+
+		return struct.pack('<{0}H'.format(len(data)), *data)
+
+	def unpack(self, packed_data):
+		"""
+		Sample-by-sample reference unpacking.
+		"""
+
+		data = struct.unpack('<{0}H'.format(len(packed_data) / 2), packed_data)
+		data = [x & 2 ** 14 - 1 for x in data]
+
+		min_value, max_value = self.value_range
+		range_diff = max_value - min_value
+
+		return [2.0 * (x - min_value) / range_diff - 1.0 for x in data]
+
+	def testBitIdentical(self):
+		"""
+		Match the reference packing exactly.
+		"""
+
+		rand = random.Random(0)
+
+		data = [rand.uniform(-1.0, 1.0) for _ in xrange(10000)] + list(linspace(-1.0, 1.0, 1001))
+		markers = {
+			1: [rand.randint(0, 1) for _ in data],
+			2: [rand.choice([True, False]) for _ in data[:5000]],
+		}
+
+		for m in [{}, markers]:
+			packed = awg5014b.pack_waveform(data, m, self.value_range)
+
+			eq_(packed, self.pack(data, m))
+			eq_(list(awg5014b.unpack_waveform(packed, self.value_range)), self.unpack(packed))
+
+	def testEmpty(self):
+		"""
+		No data.
+		"""
+
+		eq_(awg5014b.pack_waveform([], None, self.value_range), '')
+		eq_(len(awg5014b.unpack_waveform('', self.value_range)), 0)
+
+	def testInvalid(self):
+		"""
+		Out of range.
+		"""
+
+		assert_raises(ValueError, awg5014b.pack_waveform, [-1.5], None, self.value_range)
+		assert_raises(ValueError, awg5014b.pack_waveform, [0.0], {1: [1, 1]}, self.value_range)
+
+		assert_array_equal(awg5014b.unpack_waveform(struct.pack('<2H', 0, 0xffff), self.value_range), [-1.0, 1.0])
+
+
+if __name__ == '__main__':
+	main()
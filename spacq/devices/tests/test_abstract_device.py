@@ -132,5 +132,157 @@ class AbstractDeviceTest(TestCase):
 			assert False, 'Expected ValueError.'
 
 
+class TransactionTest(TestCase):
+	class Instrument(object):
+		"""
+		Record messages and answer queries in order.
+		"""
+
+		def __init__(self, responses=None):
+			self.messages = []
+			self.responses = list(responses or [])
+
+		def write(self, message):
+			self.messages.append(message)
+
+		def read_raw(self):
+			return self.responses.pop(0)
+
+	def make_device(self, responses=None):
+		dev = abstract_device.AbstractDevice.__new__(abstract_device.AbstractDevice)
+		dev._setup()
+		dev.driver = abstract_device.drivers.pyvisa
+		dev.device = self.Instrument(responses)
+
+		return dev
+
+	def testWrites(self):
+		"""
+		Writes are sent as a single message at the end.
+		"""
+
+		dev = self.make_device()
+
+		with dev.transaction():
+			dev.write('volt 1')
+			dev.write('*wai')
+
+			with dev.transaction():
+				dev.write(':curr 2')
+
+			eq_(dev.device.messages, [])
+
+		eq_(dev.device.messages, [':volt 1;*wai;:curr 2'])
+
+		# Single commands are left alone.
+		with dev.transaction():
+			dev.write('volt 1')
+
+		# Nothing to send.
+		with dev.transaction():
+			pass
+
+		eq_(dev.device.messages, [':volt 1;*wai;:curr 2', 'volt 1'])
+
+	def testQueries(self):
+		"""
+		Reading sends everything collected so far along with the query.
+		"""
+
+		dev = self.make_device(['1.5\n', '1;2;3\n'])
+
+		with dev.transaction():
+			dev.write('volt 1')
+			eq_(dev.ask('volt?'), '1.5')
+
+			dev.write('volt 2')
+
+			dev.multi_command_start()
+			dev.ask('a?')
+			dev.write('b 0')
+			dev.ask('c?')
+			dev.ask('d?')
+			eq_(dev.multi_command_stop(), ['1', '2', '3'])
+
+			dev.write('volt 3')
+
+		eq_(dev.device.messages, [':volt 1;:volt?', ':volt 2;:a?;:b 0;:c?;:d?', 'volt 3'])
+
+	def testUnsupported(self):
+		"""
+		Devices which can't handle compound messages get each command as it comes.
+		"""
+
+		dev = self.make_device()
+		dev.compound_messages = False
+
+		with dev.transaction():
+			dev.write('a 1')
+			dev.write('b 2')
+
+			eq_(dev.device.messages, ['a 1', 'b 2'])
+
+
+class QueryCacheTest(TestCase):
+	class Device(abstract_device.AbstractDevice):
+		def __init__(self):
+			self._setup()
+
+			self.driver = abstract_device.drivers.pyvisa
+			self.device = TransactionTest.Instrument()
+
+			self.queries = []
+			self.values = {'a': 1, 'b': 2}
+
+		@abstract_device.cached_query(exact=True)
+		def a(self):
+			self.queries.append('a')
+			return self.values['a']
+
+		@a.setter
+		def a(self, value):
+			self.values['a'] = value
+			self.values['b'] = 2 * value
+
+		@abstract_device.cached_query(depends_on=['a'])
+		def b(self):
+			self.queries.append('b')
+			return self.values['b']
+
+	def testCache(self):
+		"""
+		Values are only queried when they are not known.
+		"""
+
+		dev = self.Device()
+		subdev = abstract_device.AbstractSubdevice(dev)
+
+		eq_((dev.a, dev.b, dev.a, dev.b), (1, 2, 1, 2))
+		eq_(dev.queries, ['a', 'b'])
+		eq_(dev.query_cache.stats, {'hits': 2, 'misses': 2, 'size': 2})
+
+		# Shared with subdevices.
+		assert subdev.query_cache is dev.query_cache
+
+		# Setting forgets the dependents, but keeps exact values.
+		dev.a = 5
+		eq_((dev.a, dev.b), (5, 10))
+		eq_(dev.queries, ['a', 'b', 'b'])
+
+		# Nothing to do.
+		dev.values['a'] = 0
+		dev.a = 5
+		eq_(dev.values['a'], 0)
+
+		# Resetting forgets everything.
+		dev.write('*RST')
+		eq_((dev.a, dev.b), (0, 10))
+		eq_(dev.queries, ['a', 'b', 'b', 'a', 'b'])
+
+		dev.query_cache.clear()
+		dev.write('*cls;:foo:bar 1')
+		eq_(len(dev.query_cache), 0)
+
+
 if __name__ == '__main__':
 	main()
@@ -0,0 +1,125 @@
+from nose.tools import assert_raises, eq_
+import SocketServer
+from threading import Thread
+from time import sleep
+from unittest import main, TestCase
+
+from .. import abstract_device, raw_socket
+
+
+class Handler(SocketServer.StreamRequestHandler):
+	"""
+	Answer a few SCPI commands, one line at a time.
+	"""
+
+	def handle(self):
+		volt = '0'
+
+		for line in iter(self.rfile.readline, ''):
+			responses = []
+
+			for cmd in line.strip().split(';'):
+				cmd = cmd.lstrip(':').lower()
+
+				if cmd == '*idn?':
+					responses.append('Test device')
+				elif cmd == 'empty?':
+					responses.append('')
+				elif cmd == 'curve?':
+					responses.append('#15ab\ncd')
+				elif cmd == 'slow?':
+					sleep(0.5)
+					responses.append('1')
+				elif cmd.startswith('volt '):
+					volt = cmd[5:]
+				elif cmd == 'volt?':
+					responses.append(volt)
+
+			if responses:
+				self.wfile.write(';'.join(responses) + '\n')
+
+
+class RawSocketTest(TestCase):
+	def setUp(self):
+		self.server = SocketServer.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+		self.server.daemon_threads = True
+
+		thr = Thread(target=self.server.serve_forever)
+		thr.daemon = True
+		thr.start()
+
+		self.host, self.port = self.server.server_address
+
+	def tearDown(self):
+		self.server.shutdown()
+		self.server.server_close()
+
+	def testInstrument(self):
+		"""
+		Messages, and block data containing the terminator.
+		"""
+
+		inst = raw_socket.RawSocketInstrument(self.host, self.port)
+
+		inst.write('*idn?')
+		inst.write('curve?')
+		inst.write('volt 5;volt?\n')
+
+		eq_(inst.read_raw(), 'Test device\n')
+		eq_(inst.read_raw(), '#15ab\ncd\n')
+		eq_(inst.read_raw(), '5\n')
+
+		# A lone terminator is a whole response.
+		inst.timeout = 1
+		inst.write('empty?')
+		eq_(inst.read_raw(), '\n')
+
+		inst.close()
+
+	def testDevice(self):
+		"""
+		Connect a device through a raw socket.
+		"""
+
+		dev = abstract_device.AbstractDevice(ip_address=self.host, ip_port=self.port)
+
+		eq_(dev.driver, abstract_device.drivers.socket)
+		eq_(dev.idn, 'Test device')
+		eq_(dev.ask_raw('curve?'), '#15ab\ncd\n')
+
+		with dev.transaction():
+			dev.write('volt 2')
+			eq_(dev.ask('volt?'), '2')
+
+		dev.device.timeout = 0.1
+		assert_raises(abstract_device.DeviceTimeout, dev.ask, 'slow?')
+
+		dev.close()
+
+		assert_raises(abstract_device.DeviceNotFoundError, abstract_device.AbstractDevice,
+				ip_address=self.host, ip_port=1)
+
+	def testAsync(self):
+		"""
+		Operations on a device happen in order, without waiting.
+		"""
+
+		devs = [abstract_device.AbstractDevice(ip_address=self.host, ip_port=self.port) for _ in xrange(3)]
+
+		futures = []
+		for i, dev in enumerate(devs):
+			futures.append(dev.aask('slow?'))
+			dev.awrite('volt {0}'.format(i))
+			futures.append(dev.aask('volt?'))
+
+		# The devices proceed in parallel.
+		eq_([f.result(timeout=0.9) for f in futures], ['1', '0', '1', '1', '1', '2'])
+
+		assert_raises(abstract_device.DeviceTimeout, devs[0].aask('slow?').result, timeout=0.1)
+
+		for dev in devs:
+			dev.close()
+
+
+if __name__ == '__main__':
+	main()
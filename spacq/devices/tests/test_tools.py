@@ -1,4 +1,5 @@
 from nose.tools import eq_
+from struct import pack
 from unittest import main, TestCase
 
 from spacq.tests.tool.box import AssertHandler
@@ -58,6 +59,21 @@ class BlockDataTest(TestCase):
 		for d, b in data:
 			eq_(tools.BlockData.from_block_data(b), d)
 
+	def testArrayFromBlockData(self):
+		"""
+		Decode directly into an array.
+		"""
+
+		values = [0, 1, -1, 32767, -32768]
+		packed = pack('>5h', *values)
+
+		for b in [tools.BlockData.to_block_data(packed), '#0' + packed + '\n']:
+			result = tools.BlockData.array_from_block_data(b, '>i2')
+			eq_(list(result), values)
+
+		# A trailing partial value is dropped.
+		eq_(list(tools.BlockData.array_from_block_data('#13\x00\x01\x02', '>i2')), [1])
+
 	def testFromSlightlyBadData(self):
 		"""
 		Not valid, but parsable inputs.
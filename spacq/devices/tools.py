@@ -2,6 +2,7 @@ import logging
 log = logging.getLogger(__name__)
 
 from functools import wraps
+import numpy
 import string
 
 from spacq.interface.units import Quantity
@@ -153,14 +154,16 @@ class BlockData(object):
 		return '#{0}{1}{2}'.format(length_length, length, data)
 
 	@staticmethod
-	def from_block_data(block_data):
+	def block_data_bounds(block_data):
 		"""
-		Extracts binary data from 488.2 block data.
+		Find the start and end offsets of the binary data within 488.2 block data.
 
 		As per section 7.7.6 of IEEE Std 488.2-1992.
 		"""
 
-		log.debug('Converting from block data: {0!r}'.format(block_data))
+		# The data may be very large, so avoid formatting it unless it will be logged.
+		if log.isEnabledFor(logging.DEBUG):
+			log.debug('Converting from block data: {0!r}'.format(block_data))
 
 		# Must have at least "#0\n" or "#XX".
 		if len(block_data) < 3:
@@ -175,7 +178,7 @@ class BlockData(object):
 			if block_data[-1] != '\n':
 				raise BlockDataError('Final character is "{0}", not NL.'.format(block_data[-1]))
 
-			return block_data[2:-1]
+			return 2, len(block_data) - 1
 		else:
 			log.debug('Definite format.')
 
@@ -202,7 +205,33 @@ class BlockData(object):
 				if block_data[data_end:] != '\n':
 					log.warning('Extra data ignored: {0!r}'.format(block_data[data_end:]))
 
-			return block_data[data_start:data_end]
+			return data_start, data_end
+
+	@staticmethod
+	def from_block_data(block_data):
+		"""
+		Extracts binary data from 488.2 block data.
+		"""
+
+		data_start, data_end = BlockData.block_data_bounds(block_data)
+
+		return block_data[data_start:data_end]
+
+	@staticmethod
+	def array_from_block_data(block_data, dtype):
+		"""
+		Extracts binary data from 488.2 block data as a NumPy array of the given dtype.
+
+		The array is a read-only view of the original string, so no data is copied. Any trailing partial value is
+		ignored.
+		"""
+
+		data_start, data_end = BlockData.block_data_bounds(block_data)
+
+		dtype = numpy.dtype(dtype)
+		count = (data_end - data_start) // dtype.itemsize
+
+		return numpy.frombuffer(block_data, dtype=dtype, count=count, offset=data_start)
 
 
 class BinaryEncoder(object):
@@ -1,18 +1,16 @@
-import csv
 from datetime import timedelta
 from functools import partial
-import os
 from pubsub import pub
-from threading import Lock, Thread
-from time import localtime, sleep, time
+from threading import Thread
+from time import sleep, time
 import wx
 from wx.lib.filebrowsebutton import DirBrowseButton
 
 from spacq.interface.pulse.parser import PulseError
-from spacq.interface.units import IncompatibleDimensions
-from spacq.iteration.sweep import PulseConfiguration, SweepController
-from spacq.iteration.variables import sort_output_variables, sort_condition_variables, InputVariable, OutputVariable, ConditionVariable
-from spacq.tool.box import flatten, sift
+from spacq.iteration.capture import prepare, CaptureError
+from spacq.iteration.export import exporters
+from spacq.iteration.live import LiveDataChannel
+from spacq.iteration.sweep import SweepController
 
 
 from ..tool.box import Dialog, MessageDialog, YesNoQuestionDialog
@@ -27,6 +25,9 @@ class DataCaptureDialog(Dialog, SweepController):
 
 	timer_delay = 50 # ms
 	stall_time = 2 # s
+	breakdown_delay = 1 # s
+	# Number of stages shown in the breakdown.
+	breakdown_len = 4
 
 	status_messages = {
 		None: 'Starting up',
@@ -45,12 +46,13 @@ class DataCaptureDialog(Dialog, SweepController):
 
 	def __init__(self, parent, resources, variables, num_items, measurement_resources,
 			measurement_variables, condition_resources, condition_variables, pulse_config, continuous=False,
-			*args, **kwargs):
+			settle_resources=None, *args, **kwargs):
 		kwargs['style'] = kwargs.get('style', wx.DEFAULT_DIALOG_STYLE) | wx.RESIZE_BORDER
 
 		Dialog.__init__(self, parent, title='Sweeping...', *args, **kwargs)
 		SweepController.__init__(self, resources, variables, num_items, measurement_resources,
-				measurement_variables, condition_resources, condition_variables, pulse_config, continuous=continuous)
+				measurement_variables, condition_resources, condition_variables, pulse_config, continuous=continuous,
+				settle_resources=settle_resources)
 
 		self.parent = parent
 
@@ -59,19 +61,27 @@ class DataCaptureDialog(Dialog, SweepController):
 
 		self.last_checked_time = -1
 		self.elapsed_time = 0 # us
+		self.last_breakdown_time = -1
 
 		self.timer = wx.Timer(self)
 		self.Bind(wx.EVT_TIMER, self.OnTimer, self.timer)
 
 		self.cancelling = False
 
+		# Only the latest values are shown, once per timer tick.
+		self.latest_outputs, self.latest_inputs = {}, {}
+		self.shown_values = {}
+
 		def write_callback(pos, i, value):
-			self.value_outputs[pos][i].Value = str(value)[:self.max_value_len]
-		self.write_callback = partial(wx.CallAfter, write_callback)
+			self.latest_outputs[pos, i] = value
+		self.write_callback = write_callback
 
 		def read_callback(i, value):
-			self.value_inputs[i].Value = str(value)[:self.max_value_len]
-		self.read_callback = partial(wx.CallAfter, read_callback)
+			self.latest_inputs[i] = value
+		self.read_callback = read_callback
+
+		# Measurements for the live plots, published in batches by the timer.
+		self.live_data = LiveDataChannel()
 
 		self.general_exception_handler = partial(wx.CallAfter, self._general_exception_handler)
 		self.resource_exception_handler = partial(wx.CallAfter, self._resource_exception_handler)
@@ -150,6 +160,10 @@ class DataCaptureDialog(Dialog, SweepController):
 			self.remaining_time_output = wx.StaticText(self, label='---:--:--')
 			times_box.Add(self.remaining_time_output)
 
+		### Breakdown.
+		self.breakdown_output = wx.StaticText(self, label='')
+		dialog_box.Add(self.breakdown_output, flag=wx.CENTER|wx.BOTTOM, border=10)
+
 		## Last continuous.
 		if self.continuous:
 			self.last_continuous_input = wx.CheckBox(self, label='Last loop of continuous sweep')
@@ -222,16 +236,44 @@ class DataCaptureDialog(Dialog, SweepController):
 		self.cancel_button.Disable()
 		self.cancelling = True
 
+	def publish_live_data(self):
+		"""
+		Send out everything which the sweep has measured since the last time.
+		"""
+
+		for name, block in self.live_data.drain().items():
+			pub.sendMessage('data_capture.data', name=name, block=block)
+
+	def show_values(self):
+		"""
+		Update the text fields which have new values.
+		"""
+
+		# items() makes a copy, so the sweep thread is free to keep writing.
+		for key, ctrl, value in ([(('out', pos, i), self.value_outputs[pos][i], value)
+				for (pos, i), value in self.latest_outputs.items()] +
+				[(('in', i), self.value_inputs[i], value) for i, value in self.latest_inputs.items()]):
+			text = str(value)[:self.max_value_len]
+
+			if self.shown_values.get(key) != text:
+				ctrl.Value = self.shown_values[key] = text
+
 	def OnTimer(self, evt=None):
 		self.status_message_output.Value = self.status_messages[self.current_f]
+		self.show_values()
+		self.publish_live_data()
 		if self.continuous:
 			self.last_continuous = self.last_continuous_input.Value
 
 		# Update progress.
-		if self.num_items > 0 and self.item >= 0:
-			amount_done = float(self.item) / self.num_items
-
-			self.progress_bar.Value = self.item
+		items_done, total_items = self.items_done, self.total_items
+		if total_items > 0 and self.item >= 0:
+			amount_done = float(items_done) / total_items
+
+			# Adaptive refinement changes the total as it goes.
+			if self.progress_bar.Range != total_items:
+				self.progress_bar.Range = total_items
+			self.progress_bar.Value = items_done
 			self.progress_percent.Label = '{0}%'.format(int(100 * amount_done))
 
 			if self.last_checked_time > 0:
@@ -240,10 +282,19 @@ class DataCaptureDialog(Dialog, SweepController):
 
 			self.last_checked_time = time()
 
-			if self.show_remaining_time and amount_done > 0:
-				total_time = self.elapsed_time / amount_done
-				remaining_time = int(total_time - self.elapsed_time)
-				self.remaining_time_output.Label = str(timedelta(seconds=remaining_time//1e6))
+			if self.show_remaining_time:
+				remaining_time = self.remaining_time(self.elapsed_time / 1e6)
+				if remaining_time is not None:
+					self.remaining_time_output.Label = str(timedelta(seconds=int(remaining_time)))
+
+		# Show where the time goes.
+		if time() - self.last_breakdown_time >= self.breakdown_delay:
+			self.last_breakdown_time = time()
+
+			breakdown = self.timings.breakdown()[:self.breakdown_len]
+			if breakdown:
+				self.breakdown_output.Label = 'Time spent: ' + ', '.join('{0} {1:.0%}'.format(name, fraction)
+						for name, fraction in breakdown)
 
 		# Prompt to abort.
 		if self.cancelling:
@@ -321,6 +372,16 @@ class DataCapturePanel(wx.Panel):
 		self.directory_browse_button = DirBrowseButton(self, labelText='Directory:')
 		export_path_box.Add(self.directory_browse_button, flag=wx.EXPAND)
 
+		#### Format.
+		format_box = wx.BoxSizer(wx.HORIZONTAL)
+		export_path_box.Add(format_box, flag=wx.EXPAND)
+
+		format_box.Add(wx.StaticText(self, label='Format: '),
+				flag=wx.ALIGN_CENTER_VERTICAL|wx.ALIGN_RIGHT)
+		self.export_format = wx.Choice(self, choices=sorted(exporters))
+		self.export_format.StringSelection = 'CSV'
+		format_box.Add(self.export_format)
+
 		#### Last file.
 		last_file_box = wx.BoxSizer(wx.HORIZONTAL)
 		export_path_box.Add(last_file_box, flag=wx.EXPAND)
@@ -343,292 +404,58 @@ class DataCapturePanel(wx.Panel):
 		thr.daemon = True
 		thr.start()
 
-		all_variables = [var for var in self.global_store.variables.values() if var.enabled]
-		output_variables = sift(all_variables, OutputVariable)
-		input_variables = [var for var in sift(all_variables, InputVariable) if var.resource_name != '']
-		condition_variables =  sift(all_variables, ConditionVariable)
-
-		if not output_variables:
-			output_variables.append(OutputVariable(order=0, name='<Dummy>', enabled=True))
-
-		output_variables, num_items = sort_output_variables(output_variables)
-		condition_variables = sort_condition_variables(condition_variables)
-
-		resource_names = [tuple(var.resource_name for var in group) for group in output_variables]
-		measurement_resource_names = [var.resource_name for var in input_variables]
-		condition_resource_names = [tuple(set(flatten([var.resource_names for var in group]))) for group in condition_variables]
-
-
-		continuous = self.continuous_checkbox.Value
-
-		missing_resources = set()
-		unreadable_resources = set()
-		unwritable_resources = set()
-		missing_devices = set()
-
 		pulse_program = self.global_store.pulse_program
-
 		if pulse_program is not None:
 			pulse_program = pulse_program.with_resources
 
-			try:
-				pulse_program.generate_waveforms(dry_run=True)
-			except PulseError as e:
-				MessageDialog(self, '\n'.join(e[0]), 'Pulse program error', monospace=True).Show()
-				return
-			except Exception as e:
-				MessageDialog(self, str(e), 'Pulse program error').Show()
-				return
-
-			pulse_awg, pulse_oscilloscope = None, None
-			pulse_channels = {}
-
-			try:
-				pulse_awg = self.global_store.devices[pulse_program.awg].device
-				if pulse_awg is None:
-					raise KeyError
-			except KeyError:
-				missing_devices.add(pulse_program.awg)
-			else:
-				# Gather used channel numbers.
-				pulse_channels = dict((k, v) for k, v in pulse_program.output_channels.items() if v is not None)
-
-				actual_channels = range(1, len(pulse_awg.channels))
-				invalid_channels = [k for k, v in pulse_channels.items() if v not in actual_channels]
-
-				if invalid_channels:
-					MessageDialog(self, 'Invalid channels for: {0}'.format(', '.join(invalid_channels)), 'Invalid channels').Show()
-					return
-
-			try:
-				pulse_oscilloscope = self.global_store.devices[pulse_program.oscilloscope].device
-				if pulse_oscilloscope is None:
-					raise KeyError
-			except KeyError:
-				missing_devices.add(pulse_program.oscilloscope)
-
-			try:
-				pulse_config = PulseConfiguration(pulse_program, pulse_channels, pulse_awg, pulse_oscilloscope)
-			except TypeError as e:
-				MessageDialog(self, str(e), 'Device configuration error').Show()
-				return
-		else:
-			pulse_config = None
-
-		resources = []
-		for group in resource_names:
-			group_resources = []
-
-			for name in group:
-				if name == '':
-					group_resources.append((str(len(resources)), None))
-				elif name not in self.global_store.resources:
-					missing_resources.add(name)
-				else:
-					resource = self.global_store.resources[name]
-
-					if resource.writable:
-						group_resources.append((name, resource))
-					else:
-						unwritable_resources.add(name)
-
-			resources.append(tuple(group_resources))
-			
-		measurement_resources = []
-		measurement_units = []
-		for name in measurement_resource_names:
-			if name not in self.global_store.resources:
-				missing_resources.add(name)
-			else:
-				resource = self.global_store.resources[name]
-
-				if resource.readable:
-					measurement_resources.append((name, resource))
-					measurement_units.append(resource.display_units)
-				else:
-					unreadable_resources.add(name)
-				
-		condition_resources = []
-		for group in condition_resource_names:
-			group_resources = []
-			
-			for name in group:
-				if name not in self.global_store.resources:
-					missing_resources.add(name)
-				else:
-					resource = self.global_store.resources[name]
-
-					if resource.readable:
-						group_resources.append((name, resource))
-					else:
-						#the name may already have been put here by the loop assigning
-						#to measurement_resources
-						if name not in unreadable_resources:
-							unreadable_resources.add(name)
-
-			condition_resources.append(tuple(group_resources))
-
-		mismatched_resources = []
-		for (res_name, resource), var in zip(flatten(resources), flatten(output_variables)):
-			if resource is None:
-				continue
-
-			if resource.units is not None:
-				if not (var.type == 'quantity' and
-						resource.verify_dimensions(var.units, exception=False, from_string=True)):
-					mismatched_resources.append((res_name, var.name))
-			else:
-				if var.type not in ['float', 'integer']:
-					mismatched_resources.append((res_name, var.name))
-
-		for items, msg in [
-			(missing_resources, 'Missing resources'),
-			(unreadable_resources, 'Unreadable resources'),
-			(unwritable_resources, 'Unwritable resources'),
-			(missing_devices, 'Missing devices')]:
-
-			if items:
-				MessageDialog(self, ', '.join('"{0}"'.format(x) for x in sorted(items)), msg).Show()
-
-		if mismatched_resources:
-			MessageDialog(self, ', '.join('Mismatched resource type for resource name {0} with variable name {1}'.format(x[0], x[1]) for x in mismatched_resources),
-					'Mismatched resources').Show()
-
-		if (missing_resources or unreadable_resources or unwritable_resources or
-				missing_devices or mismatched_resources):
+		try:
+			capture = prepare(self.global_store.variables.values(), self.global_store.resources,
+					self.global_store.devices, pulse_program, continuous=self.continuous_checkbox.Value)
+		except PulseError as e:
+			MessageDialog(self, '\n'.join(e[0]), 'Pulse program error', monospace=True).Show()
+			return
+		except CaptureError as e:
+			for title, msg in e.problems:
+				MessageDialog(self, msg, title).Show()
 			return
-		
-		# Check that all the condition arguments are compatible with one another.
-		
-		for cvar in flatten(condition_variables):
-			
-			# Get a condition.
-			for cond in cvar.conditions:
-								
-				value1 = cond.arg1
-				value2 = cond.arg2
-				resource1 = None
-				resource2 = None
-				
-				# If working with resources, use their values as the values, and make the resource available
-				
-				if cond.type1 == 'resource name':
-					resource1 = [resource for (name, resource) in flatten(condition_resources) if name == cond.arg1][0]
-					value1 = resource1.value
-				if cond.type2 == 'resource name':
-					resource2 = [resource for (name, resource) in flatten(condition_resources) if name == cond.arg2][0]
-					value2 = resource2.value
-				
-				# Check if the other argument is in the allowed values
-				
-				if hasattr(resource1,'allowed_values') and resource1.allowed_values is not None:
-					if value2 not in resource1.allowed_values:
-						MessageDialog(self, 'In the condition {0}, {1} is not in allowed_values of {2}.'.format(cond, value2, cond.arg1),'Condition error').Show()
-						return
-				if hasattr(resource2,'allowed_values') and resource2.allowed_values is not None:
-					if value1 not in resource2.allowed_values:
-						MessageDialog(self, 'In the condition {0}, {1} is not in allowed_values of {2}.'.format(cond, value1, cond.arg2),'Condition error').Show()
-						return
-
-				# Check if units agree.
-				
-				if resource1 is not None and resource1.units is not None:
-					try:
-						value1.assert_dimensions(value2)
-					except ValueError:
-						MessageDialog(self, 'In the condition {0}, {1} does not have a dimension.'.format(cond, value2),'Condition error').Show()
-						return
-					except IncompatibleDimensions:
-						MessageDialog(self, 'In the condition {0}, {1} and {2} do not have matching dimensions.'.format(cond, value1, value2),'Condition error').Show()
-						return
-				if resource2 is not None and resource2.units is not None:
-					try:
-						value2.assert_dimensions(value1)
-					except ValueError:
-						MessageDialog(self, 'In the condition {0}, {1} does not have a dimension.'.format(cond, value1),'Condition error').Show()
-						return
-					except IncompatibleDimensions:
-						MessageDialog(self, 'In the condition {0}, {1} and {2} do not have matching dimensions.'.format(cond, value1, value2),'Condition error').Show()
-						return
-
-
-		exporting = False
-		if self.export_enabled.Value:
-			dir = self.directory_browse_button.GetValue()
-			# YYYY-MM-DD_HH-MM-SS.csv
-			name = '{0:04}-{1:02}-{2:02}_{3:02}-{4:02}-{5:02}.csv'.format(*localtime())
-
-			if not dir:
-				MessageDialog(self, 'No directory selected.', 'Export path').Show()
-				return
-
-			if not os.path.isdir(dir):
-				MessageDialog(self, 'Invalid directory selected', 'Export path').Show()
-				return
 
-			file_path = os.path.join(dir, name)
-			if os.path.exists(file_path):
-				MessageDialog(self, file_path, 'File exists').Show()
+		exporter = None
+		if self.export_enabled.Value:
+			try:
+				exporter = capture.open_exporter(self.directory_browse_button.GetValue(),
+						self.export_format.StringSelection)
+			except CaptureError as e:
+				for title, msg in e.problems:
+					MessageDialog(self, msg, title).Show()
 				return
 
-			# Everything looks alright, so open the file.
-			export_file = open(file_path, 'w')
-			export_csv = csv.writer(export_file)
-			exporting = True
-
 			# Show the path in the GUI.
-			self.last_file_name.Value = file_path
-
-			# Write the header.
-			export_csv.writerow(['Time (s)'] +
-					['{0.name} ({0.units})'.format(var) if var.units is not None else var.name
-							for var in flatten(output_variables)] +
-					['{0.name} ({1})'.format(var, units) if units is not None else var.name
-						for var, units in zip(input_variables, measurement_units)])
+			self.last_file_name.Value = exporter.path
 
 		self.capture_dialogs += 1
 
-		dlg = DataCaptureDialog(self, resources, output_variables, num_items, measurement_resources,
-				input_variables, condition_resources, condition_variables, pulse_config, continuous=continuous)
+		dlg = DataCaptureDialog(self, *capture.controller_args, **capture.controller_kwargs)
 		dlg.SetMinSize((500, -1))
 
+		measurement_resource_names = capture.measurement_resource_names
+
 		for name in measurement_resource_names:
 			wx.CallAfter(pub.sendMessage, 'data_capture.start', name=name)
 
-		# Export buffer.
-		max_buf_size = 10
-		buf = []
-		buf_lock = Lock()
-
-		def flush():
-			export_csv.writerows(buf)
-			export_file.flush()
-
-			while buf:
-				buf.pop()
-
 		def data_callback(cur_time, values, measurement_values):
-			for name, value in zip(measurement_resource_names, measurement_values):
-				wx.CallAfter(pub.sendMessage, 'data_capture.data', name=name, value=value)
+			dlg.live_data.extend(measurement_resource_names, measurement_values)
 
-			# Extract values out of quantities, since the units have already been taken care of in the header.
-			values = [x.original_value if hasattr(x, 'original_value') else x for x in values]
-			measurement_values = [x.original_value if hasattr(x, 'original_value') else x for x in measurement_values]
-
-			if exporting:
-				with buf_lock:
-					buf.append([cur_time] + values + measurement_values)
-
-					if len(buf) >= max_buf_size:
-						flush()
+			if exporter is not None:
+				exporter.add_row(capture.export_row(cur_time, values, measurement_values, dlg.settle_time))
 
 		def close_callback():
 			self.capture_dialogs -= 1
 
-			if exporting:
-				with buf_lock:
-					flush()
-					export_file.close()
+			if exporter is not None:
+				exporter.close()
+
+			# Anything left over from the last timer tick.
+			wx.CallAfter(dlg.publish_live_data)
 
 			for name in measurement_resource_names:
 				wx.CallAfter(pub.sendMessage, 'data_capture.stop', name=name)
@@ -2,6 +2,7 @@ from functools import partial
 from threading import Thread
 import wx
 
+from spacq.interface.ramp import Ramp
 from spacq.iteration.variables import OutputVariable
 from spacq.tool.box import sift
 
@@ -18,6 +19,9 @@ class SmoothResetPanel(wx.Panel):
 
 		self.global_store = global_store
 
+		# The ramp in progress, if any.
+		self.ramp = None
+
 		# Panel.
 		panel_box = wx.BoxSizer(wx.VERTICAL)
 
@@ -41,6 +45,12 @@ class SmoothResetPanel(wx.Panel):
 		self.Bind(wx.EVT_BUTTON, self.OnResetToValue, self.toVal_button)
 		reset_box.Add(self.toVal_button, flag=wx.EXPAND)
 
+		### Stop.
+		self.stop_button = wx.Button(self, label='Stop')
+		self.Bind(wx.EVT_BUTTON, self.OnStop, self.stop_button)
+		reset_box.Add(self.stop_button, flag=wx.EXPAND)
+		self.stop_button.Disable()
+
 		### Steps.
 		steps_static_box = wx.StaticBox(self, label='Steps')
 		steps_box = wx.StaticBoxSizer(steps_static_box, wx.VERTICAL)
@@ -85,13 +95,18 @@ class SmoothResetPanel(wx.Panel):
 		self.to_button.Disable()
 		self.from_button.Disable()
 		self.toVal_button.Disable()
+		self.stop_button.Enable()
 
 		def exception_callback(e):
 			MessageDialog(self, str(e), 'Error writing to resource').Show()
 
+		steps = self.reset_steps_input.Value
+
 		def sweep_all_vars():
 			try:
-				thrs = []
+				# All the resources are swept together, from a single thread.
+				self.ramp = ramp = Ramp()
+
 				for var in vars:
 					resource = self.global_store.resources[var.resource_name]
 
@@ -102,20 +117,19 @@ class SmoothResetPanel(wx.Panel):
 					else:
 						value_from, value_to = resource.value , var.with_type(var.const)
 
-					thr = Thread(target=resource.sweep, args=(value_from, value_to, self.reset_steps_input.Value),
-							kwargs={'exception_callback': partial(wx.CallAfter, exception_callback)})
-					thr.daemon = True
-					thrs.append(thr)
+					ramp.add(resource, value_from, value_to, steps, partial(wx.CallAfter, exception_callback))
 
-				for thr in thrs:
-					thr.start()
-				for thr in thrs:
-					thr.join()
+				ramp.run()
+			except Exception as e:
+				wx.CallAfter(exception_callback, e)
 			finally:
+				self.ramp = None
+
 				if self:
 					wx.CallAfter(self.to_button.Enable)
 					wx.CallAfter(self.from_button.Enable)
 					wx.CallAfter(self.toVal_button.Enable)
+					wx.CallAfter(self.stop_button.Disable)
 
 		thr = Thread(target=sweep_all_vars)
 		thr.daemon = True
@@ -129,3 +143,8 @@ class SmoothResetPanel(wx.Panel):
 		
 	def OnResetToValue(self, evt=None):
 		self.reset(2)
+
+	def OnStop(self, evt=None):
+		ramp = self.ramp
+		if ramp is not None:
+			ramp.abort()
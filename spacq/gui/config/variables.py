@@ -3,7 +3,7 @@ import wx
 
 from numpy import array
 from spacq.interface.units import Quantity
-from spacq.iteration.variables import OutputVariable, LinSpaceConfig, ArbitraryConfig
+from spacq.iteration.variables import OutputVariable, LinSpaceConfig, ArbitraryConfig, AdaptiveConfig
 from spacq.iteration.variables import ConditionVariable, Condition
 
 from ..tool.box import Dialog, MessageDialog, load_pickled, save_pickled, load_csv
@@ -79,6 +79,86 @@ class LinSpaceConfigPanel(wx.Panel):
 				str(config.final), config.steps)
 
 
+class AdaptiveConfigPanel(wx.Panel):
+	def __init__(self, parent, *args, **kwargs):
+		wx.Panel.__init__(self, parent, *args, **kwargs)
+
+		# Panel.
+		panel_box = wx.BoxSizer(wx.VERTICAL)
+
+		## Config.
+		config_sizer = wx.FlexGridSizer(rows=6, cols=2)
+		config_sizer.AddGrowableCol(1, 1)
+		panel_box.Add(config_sizer, proportion=1, flag=wx.EXPAND)
+
+		### Initial.
+		config_sizer.Add(wx.StaticText(self, label='Initial:'),
+				flag=wx.ALIGN_CENTER_VERTICAL|wx.ALIGN_RIGHT|wx.ALL, border=5)
+		self.initial_input = wx.TextCtrl(self)
+		config_sizer.Add(self.initial_input, flag=wx.EXPAND|wx.ALL, border=5)
+
+		### Final.
+		config_sizer.Add(wx.StaticText(self, label='Final:'),
+				flag=wx.ALIGN_CENTER_VERTICAL|wx.ALIGN_RIGHT|wx.ALL, border=5)
+		self.final_input = wx.TextCtrl(self)
+		config_sizer.Add(self.final_input, flag=wx.EXPAND|wx.ALL, border=5)
+
+		### Coarse steps.
+		config_sizer.Add(wx.StaticText(self, label='Coarse steps:'),
+				flag=wx.ALIGN_CENTER_VERTICAL|wx.ALIGN_RIGHT|wx.ALL, border=5)
+		self.steps_input = wx.SpinCtrl(self, min=2, initial=10, max=1e9)
+		config_sizer.Add(self.steps_input, flag=wx.EXPAND|wx.ALL, border=5)
+
+		### Maximum points.
+		config_sizer.Add(wx.StaticText(self, label='Max points:'),
+				flag=wx.ALIGN_CENTER_VERTICAL|wx.ALIGN_RIGHT|wx.ALL, border=5)
+		self.max_points_input = wx.SpinCtrl(self, min=2, initial=100, max=1e9)
+		config_sizer.Add(self.max_points_input, flag=wx.EXPAND|wx.ALL, border=5)
+
+		### Tolerance.
+		config_sizer.Add(wx.StaticText(self, label='Tolerance:'),
+				flag=wx.ALIGN_CENTER_VERTICAL|wx.ALIGN_RIGHT|wx.ALL, border=5)
+		self.tolerance_input = wx.TextCtrl(self, value='0')
+		config_sizer.Add(self.tolerance_input, flag=wx.EXPAND|wx.ALL, border=5)
+
+		### Measurement.
+		config_sizer.Add(wx.StaticText(self, label='Measurement:'),
+				flag=wx.ALIGN_CENTER_VERTICAL|wx.ALIGN_RIGHT|wx.ALL, border=5)
+		self.measurement_input = wx.TextCtrl(self)
+		config_sizer.Add(self.measurement_input, flag=wx.EXPAND|wx.ALL, border=5)
+
+		self.SetSizerAndFit(panel_box)
+
+	def GetValue(self):
+		# Ensure the values are sane.
+		try:
+			initial = float(self.initial_input.Value)
+		except ValueError:
+			raise ValueError('Invalid initial value.')
+
+		try:
+			final = float(self.final_input.Value)
+		except ValueError:
+			raise ValueError('Invalid final value.')
+
+		try:
+			tolerance = float(self.tolerance_input.Value)
+		except ValueError:
+			raise ValueError('Invalid tolerance.')
+
+		if self.max_points_input.Value < self.steps_input.Value:
+			raise ValueError('Max points must be at least the number of coarse steps.')
+
+		return AdaptiveConfig(initial, final, self.steps_input.Value, max_points=self.max_points_input.Value,
+				tolerance=tolerance, measurement=self.measurement_input.Value)
+
+	def SetValue(self, config):
+		self.initial_input.Value, self.final_input.Value, self.steps_input.Value = (str(config.initial),
+				str(config.final), config.steps)
+		self.max_points_input.Value, self.tolerance_input.Value = config.max_points, str(config.tolerance)
+		self.measurement_input.Value = config.measurement
+
+
 class ArbitraryConfigPanel(wx.Panel):
 	def __init__(self, parent, *args, **kwargs):
 		wx.Panel.__init__(self, parent, *args, **kwargs)
@@ -528,6 +608,11 @@ class OutputVariableEditor(Dialog):
 		self.config_panel_types.append(ArbitraryConfig)
 		self.config_notebook.AddPage(file_config_panel, 'From File')
 
+		### Adaptive.
+		adaptive_config_panel = AdaptiveConfigPanel(self.config_notebook)
+		self.config_panel_types.append(AdaptiveConfig)
+		self.config_notebook.AddPage(adaptive_config_panel, 'Adaptive')
+
 		## Smooth set.
 		smooth_static_box = wx.StaticBox(self, label='Smooth set')
 		smooth_box = wx.StaticBoxSizer(smooth_static_box, wx.HORIZONTAL)
@@ -569,6 +654,23 @@ class OutputVariableEditor(Dialog):
 		self.units_input = wx.TextCtrl(self)
 		quantity_box.Add(self.units_input)
 
+		## Adaptive dwell.
+		settle_static_box = wx.StaticBox(self, label='Settle (wait time is the maximum)')
+		settle_box = wx.StaticBoxSizer(settle_static_box, wx.HORIZONTAL)
+		dialog_box.Add(settle_box, flag=wx.CENTER|wx.ALL, border=5)
+
+		settle_box.Add(wx.StaticText(self, label='Readback:'), flag=wx.CENTER)
+		self.settle_resource_input = wx.TextCtrl(self)
+		settle_box.Add(self.settle_resource_input, flag=wx.CENTER|wx.ALL, border=5)
+
+		settle_box.Add(wx.StaticText(self, label='Tolerance:'), flag=wx.CENTER)
+		self.settle_tolerance_input = wx.TextCtrl(self, size=(80, -1))
+		settle_box.Add(self.settle_tolerance_input, flag=wx.CENTER|wx.ALL, border=5)
+
+		settle_box.Add(wx.StaticText(self, label='Interval:'), flag=wx.CENTER)
+		self.settle_interval_input = wx.TextCtrl(self, size=(80, -1))
+		settle_box.Add(self.settle_interval_input, flag=wx.CENTER|wx.ALL, border=5)
+
 		## End buttons.
 		button_box = wx.BoxSizer(wx.HORIZONTAL)
 		dialog_box.Add(button_box, flag=wx.CENTER|wx.ALL, border=5)
@@ -596,11 +698,26 @@ class OutputVariableEditor(Dialog):
 			# Ensure that the units are valid.
 			Quantity(1, units)
 
+		settle_tolerance = self.settle_tolerance_input.Value
+		settle_interval = self.settle_interval_input.Value
+
+		# Ensure that the settle parameters are valid.
+		try:
+			float(settle_tolerance)
+		except ValueError:
+			Quantity(settle_tolerance)
+
+		interval = Quantity(settle_interval)
+		if not interval.assert_dimensions('s', exception=False) or interval.value <= 0:
+			raise ValueError('Invalid settle interval: {0}'.format(settle_interval))
+
 		return (self.config_notebook.CurrentPage.GetValue(), self.smooth_steps_input.Value,
 				self.smooth_from_checkbox.Value, self.smooth_to_checkbox.Value,
-				self.smooth_transition_checkbox.Value, type, units)
+				self.smooth_transition_checkbox.Value, type, units, self.settle_resource_input.Value,
+				settle_tolerance, settle_interval)
 
-	def SetValue(self, config, smooth_steps, smooth_from, smooth_to, smooth_transition, type, units):
+	def SetValue(self, config, smooth_steps, smooth_from, smooth_to, smooth_transition, type, units,
+			settle_resource_name, settle_tolerance, settle_interval):
 		config_type = self.config_panel_types.index(config.__class__)
 		self.config_notebook.ChangeSelection(config_type)
 		self.config_notebook.CurrentPage.SetValue(config)
@@ -617,6 +734,10 @@ class OutputVariableEditor(Dialog):
 			self.type_quantity.Value = True
 			self.units_input.Value = units if units is not None else ''
 
+		self.settle_resource_input.Value = settle_resource_name
+		self.settle_tolerance_input.Value = settle_tolerance
+		self.settle_interval_input.Value = settle_interval
+
 	def OnOk(self, evt=None):
 		if self.ok_callback(self):
 			self.Destroy()
@@ -911,7 +1032,8 @@ class GuiVariable(object):
 			self.editor = OutputVariableEditor
 			self.editor_parameters = ('config', 'smooth_steps', 'smooth_from',
 										'smooth_to', 'smooth_transition',
-										'type', 'units')
+										'type', 'units', 'settle_resource_name',
+										'settle_tolerance', 'settle_interval')
 
 	def __getattr__(self, name):
 		#If the gui variable doesn't have the attribute, then create the attribute
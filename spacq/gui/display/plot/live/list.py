@@ -385,10 +385,11 @@ class ListLiveViewPanel(wx.Panel):
 			if self.enabled:
 				self.capturing_data = True
 
-	def msg_data_capture_data(self, name, value):
+	def msg_data_capture_data(self, name, block):
 		if name == self.measurement_resource_name:
 			if self.capturing_data:
-				self.add_values(value)
+				# Only the latest list is shown.
+				self.add_values(block.values[-1])
 
 	def msg_data_capture_stop(self, name):
 		if name == self.measurement_resource_name:
@@ -5,6 +5,8 @@ import numpy
 from pubsub import pub
 import wx
 
+from spacq.tool.buffer import RingBuffer, decimate_rows
+
 from ....config.measurement import MeasurementConfigPanel
 from ....tool.box import Dialog, MessageDialog
 
@@ -97,6 +99,9 @@ class ListLiveViewPanel(wx.Panel):
 	A panel to display a live view plot of a list resource.
 	"""
 
+	# Smallest size (in pixels) at which the lines are drawn, however small the plot is.
+	min_display_size = 100
+
 	def __init__(self, parent, global_store, *args, **kwargs):
 		wx.Panel.__init__(self, parent, *args, **kwargs)
 
@@ -189,10 +194,15 @@ class ListLiveViewPanel(wx.Panel):
 		"""
 
 		# Wait for at least one line.
-		if self._lines is None:
+		if self._lines is None or not len(self._lines):
 			self.plot.surface_data = None
 		else:
-			self.plot.surface_data = (self._lines, self.time_range, (1, len(self._lines)))
+			# There is no point in drawing more than fits on the screen.
+			width, height = self.plot.control.Size
+			lines = decimate_rows(self._lines.get(), max(height, self.min_display_size),
+					max(width, self.min_display_size))
+
+			self.plot.surface_data = (lines, self.time_range, (1, len(self._lines)))
 
 		wx.CallAfter(self.plot.redraw)
 
@@ -201,35 +211,43 @@ class ListLiveViewPanel(wx.Panel):
 		Update the plot with a new list of values.
 		"""
 
+		self.add_lines([values])
+
+	def add_lines(self, lines):
+		"""
+		Update the plot with several new lists of values, redrawing only once.
+		"""
+
 		if not self.plot_settings.enabled:
 			return
 
+		for values in lines:
+			self._add_line(values)
+
+		# Plot.
+		self.update_plot()
+
+	def _add_line(self, values):
 		# Extract the times and the data values.
-		times, values = zip(*values)
-		time_range = min(times), max(times)
+		values = numpy.asarray(values, dtype=float)
+		times, values = values[:, 0], values[:, 1]
+		time_range = times.min(), times.max()
 
 		# Sanity check, since the new values must match existing ones.
 		if self._lines is not None:
-			if len(self._lines[-1]) != len(values):
-				log.warning('Data length mismatch: was {0}, became {1}'.format(len(self._lines[-1]), len(values)))
+			if self._lines.shape != values.shape:
+				log.warning('Data length mismatch: was {0}, became {1}'.format(self._lines.shape[0], len(values)))
 				self.init_values()
 			elif self.time_range != time_range:
 				log.warning('Time range mismatch: was {0}, became {1}'.format(self.time_range, time_range))
 				self.init_values()
 
-		# Update values.
+		# Update values; the oldest line is overwritten once the buffer is full.
 		if self._lines is None:
-			self._lines = numpy.array([values])
+			self._lines = RingBuffer(int(self.plot_settings.num_lines), shape=values.shape)
 			self.time_range = time_range
-		else:
-			self._lines = numpy.append(self._lines, [values], 0)
 
-		cut_idx = len(self._lines) - self.plot_settings.num_lines
-		if cut_idx > 0:
-			self._lines = self._lines[cut_idx:]
-
-		# Plot.
-		self.update_plot()
+		self._lines.append(values)
 
 	def close(self):
 		"""
@@ -253,6 +271,10 @@ class ListLiveViewPanel(wx.Panel):
 		def ok_callback(dlg):
 			self.plot_settings = dlg.GetValue()
 
+			if self._lines is not None and self._lines.capacity != self.plot_settings.num_lines:
+				self._lines.resize(int(self.plot_settings.num_lines))
+				self.update_plot()
+
 		dlg = PlotSettingsDialog(self, ok_callback)
 		dlg.SetValue(self.plot_settings)
 		dlg.Show()
@@ -262,10 +284,10 @@ class ListLiveViewPanel(wx.Panel):
 			if self.enabled:
 				self.capturing_data = True
 
-	def msg_data_capture_data(self, name, value):
+	def msg_data_capture_data(self, name, block):
 		if name == self.measurement_resource_name:
 			if self.capturing_data:
-				self.add_values(value)
+				self.add_lines(block.values)
 
 	def msg_data_capture_stop(self, name):
 		if name == self.measurement_resource_name:
@@ -12,6 +12,7 @@ from wx.lib.agw import floatspin
 
 from spacq.interface.resources import AcquisitionThread
 from spacq.interface.units import Quantity
+from spacq.tool.buffer import EnvelopeHistory, RingBuffer
 
 from ....config.measurement import MeasurementConfigPanel
 from ....tool.box import Dialog, MessageDialog
@@ -45,6 +46,8 @@ class PlotSettings(object):
 		self.y_scale = 0
 		self.units_from = ''
 		self.units_to = ''
+		# Keep the minimum and maximum of everything older than the latest points.
+		self.history = False
 
 
 class PlotSettingsDialog(Dialog):
@@ -85,6 +88,10 @@ class PlotSettingsDialog(Dialog):
 		self.delay_input = floatspin.FloatSpin(self, min_val=0.2, max_val=1e4, increment=0.1, digits=2)
 		capture_sizer.Add(self.delay_input, flag=wx.CENTER)
 
+		## History.
+		self.history_checkbox = wx.CheckBox(self, label='Keep min/max history')
+		capture_box.Add(self.history_checkbox, flag=wx.CENTER|wx.TOP, border=5)
+
 		# Axes.
 		axes_static_box = wx.StaticBox(self, label='Axes')
 		axes_box = wx.StaticBoxSizer(axes_static_box, wx.HORIZONTAL)
@@ -173,6 +180,7 @@ class PlotSettingsDialog(Dialog):
 		plot_settings.y_scale = self.y_scale.GetValue()
 		plot_settings.units_from = self.units_from_input.Value
 		plot_settings.units_to = self.units_to_input.Value
+		plot_settings.history = self.history_checkbox.Value
 
 		return plot_settings
 
@@ -187,6 +195,7 @@ class PlotSettingsDialog(Dialog):
 		self.y_scale.SetValue(plot_settings.y_scale)
 		self.units_from_input.Value = plot_settings.units_from
 		self.units_to_input.Value = plot_settings.units_to
+		self.history_checkbox.Value = plot_settings.history
 
 
 class ScalarLiveViewPanel(wx.Panel):
@@ -194,6 +203,9 @@ class ScalarLiveViewPanel(wx.Panel):
 	A panel to display a live view plot of a scalar resource.
 	"""
 
+	# Number of min/max buckets in the long history.
+	history_buckets = 2000
+
 	def __init__(self, parent, global_store, *args, **kwargs):
 		wx.Panel.__init__(self, parent, *args, **kwargs)
 
@@ -340,9 +352,11 @@ class ScalarLiveViewPanel(wx.Panel):
 		Clear captured values.
 		"""
 
-		self._points = numpy.array([])
-		self._times = numpy.array([])
-		self._values = numpy.array([])
+		# Point number, time and value of the latest points.
+		self.buffer = RingBuffer(int(self.plot_settings.num_points), shape=(3,))
+		self.history = EnvelopeHistory(self.history_buckets)
+		# Number of points seen so far.
+		self.num_points = 0
 
 		self.current_value = None
 
@@ -353,29 +367,32 @@ class ScalarLiveViewPanel(wx.Panel):
 		Redraw the plot.
 		"""
 
-		if not len(self._points) > 0:
+		if not len(self.buffer) > 0:
 			display_time = [0]
 			display_values = [0]
 		else:
+			points, times, values = self.buffer.get().T
+
 			if self.plot_settings.time_value == 0: # Time.
-				display_time = self._times
+				if self.plot_settings.history:
+					# The older values are shown as an envelope.
+					history_times, history_values = self.history.trace(before=times[0])
+					times = numpy.concatenate((history_times, times))
+					values = numpy.concatenate((history_values, values))
 
 				if self.plot_settings.time_mode == 0: # Relative.
 					# Calculate the number of seconds passed since each point.
-					max_time = self._times[-1]
-					display_time = [x - max_time for x in display_time]
+					display_time = times - times[-1]
 				elif self.plot_settings.time_mode == 1: # Absolute.
-					display_time = [x - self.start_time for x in display_time]
+					display_time = times - self.start_time
 			elif self.plot_settings.time_value == 1: # Points.
-				display_time = self._points
+				display_time = points
 
 				if self.plot_settings.time_mode == 0: # Relative.
-					# Calculate the number of seconds passed since each point.
-					max_point = self._points[-1]
-					display_time = [x - max_point for x in display_time]
+					# Calculate the number of points since each point.
+					display_time = points - points[-1]
 
-			display_values = [x * 10 ** (self.plot_settings.y_scale + self.unit_conversion) for
-					x in self._values]
+			display_values = values * 10 ** (self.plot_settings.y_scale + self.unit_conversion)
 
 		if self.plot_settings.update_x:
 			self.plot.x_autoscale()
@@ -389,38 +406,41 @@ class ScalarLiveViewPanel(wx.Panel):
 		Update the plot with a new value.
 		"""
 
-		if not self.plot_settings.enabled:
-			return
-
 		# Extract the value of a Quantity.
+		units = None
 		try:
-			# Label with the base dimensions.
-			if self.unit_conversion == 0:
-				self.plot.y_label = '({0})'.format(value.original_units)
+			units = value.original_units
 			value = value.original_value
 		except AttributeError:
 			pass
 
+		self.add_values([time.time()], [value], units)
+
+	def add_values(self, times, values, units=None):
+		"""
+		Update the plot with several new values at once.
+		"""
+
+		if not self.plot_settings.enabled or not len(values):
+			return
+
+		# Label with the base dimensions.
+		if units is not None and self.unit_conversion == 0:
+			self.plot.y_label = '({0})'.format(units)
+
 		# Update values.
-		try:
-			self._points = numpy.append(self._points, self._points[-1] + 1)
-		except IndexError:
-			self._points = numpy.append(self._points, 0)
-		cur_time = time.time()
-		self._times = numpy.append(self._times, cur_time)
-		self._values = numpy.append(self._values, value)
+		points = numpy.arange(self.num_points, self.num_points + len(values))
+		self.num_points += len(values)
+		self.buffer.extend(numpy.column_stack((points, times, values)))
 
-		if self.start_time is None:
-			self.start_time = cur_time
+		if self.plot_settings.history:
+			self.history.add(times, values)
 
-		cut_idx = len(self._points) - int(self.plot_settings.num_points)
-		if cut_idx > 0:
-			self._points = self._points[cut_idx:]
-			self._times = self._times[cut_idx:]
-			self._values = self._values[cut_idx:]
+		if self.start_time is None:
+			self.start_time = times[0]
 
 		# Set number display.
-		self.current_value = value * 10 ** (self.plot_settings.y_scale + self.unit_conversion)
+		self.current_value = values[-1] * 10 ** (self.plot_settings.y_scale + self.unit_conversion)
 		self.numeric_display.Value = '{0:.6g}'.format(self.current_value)
 
 		# Plot.
@@ -486,6 +506,11 @@ class ScalarLiveViewPanel(wx.Panel):
 		def ok_callback(dlg):
 			self.plot_settings = dlg.GetValue()
 
+			if self.plot_settings.num_points != self.buffer.capacity:
+				self.buffer.resize(int(self.plot_settings.num_points))
+			if not self.plot_settings.history:
+				self.history.clear()
+
 			if self.plot_settings.units_from and self.plot_settings.units_to:
 				try:
 					quantity_from = Quantity(1, self.plot_settings.units_from)
@@ -536,10 +561,10 @@ class ScalarLiveViewPanel(wx.Panel):
 				self.resource_backup = self.resource
 				self.resource = None
 
-	def msg_data_capture_data(self, name, value):
+	def msg_data_capture_data(self, name, block):
 		if name == self.measurement_resource_name:
 			if self.capturing_data:
-				self.add_value(value)
+				self.add_values(block.times, block.values, block.units)
 
 	def msg_data_capture_stop(self, name):
 		if name == self.measurement_resource_name:
@@ -95,13 +95,20 @@ class WaveformsPlotSetupDialog(PlotSetupDialog):
 		axis = self.axes[0]
 		lp = ListParser()
 
+		# Binary files provide the waveforms as arrays, rather than as strings.
+		def parse(value):
+			if isinstance(value, basestring):
+				return lp(value)
+			else:
+				return value
+
 		try:
-			surface_data = array([[x[1] for x in lp(row)] for row in self.data[:,axis]])
+			surface_data = array([[x[1] for x in parse(row)] for row in self.data[:,axis]])
 		except ValueError as e:
 			MessageDialog(self, str(e), 'Invalid value').Show()
 			return
 
-		x_axis = [x[0] for x in lp(self.data[:,axis][0])]
+		x_axis = [x[0] for x in parse(self.data[:,axis][0])]
 		x_bounds = (x_axis[0], x_axis[-1])
 
 		x_label, y_label, z_label = 'Waveform (s)', 'History', self.headings[axis]
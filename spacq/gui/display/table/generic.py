@@ -1,8 +1,8 @@
-from numpy import array, compress, zeros
+from numpy import arange, array, compress
 import wx
 from wx.lib.mixins.listctrl import ListCtrlAutoWidthMixin
 
-from spacq.interface.list_columns import ListParser
+from spacq.interface.column_data import find_type, ColumnData
 
 
 """
@@ -13,6 +13,9 @@ Embeddable, generic, virtual, tabular display.
 class VirtualListCtrl(wx.ListCtrl, ListCtrlAutoWidthMixin):
 	"""
 	A generic virtual list.
+
+	The values are held as column data, and filters only keep track of which rows remain, so cells are only
+	formatted as they are displayed.
 	"""
 
 	max_value_len = 10 # Characters.
@@ -25,21 +28,7 @@ class VirtualListCtrl(wx.ListCtrl, ListCtrlAutoWidthMixin):
 		The type is one of: scalar, list, string.
 		"""
 
-		try:
-			float(value)
-		except ValueError:
-			pass
-		else:
-			return 'scalar'
-
-		try:
-			ListParser()(value)
-		except ValueError:
-			pass
-		else:
-			return 'list'
-
-		return 'string'
+		return find_type(value)
 
 	def __init__(self, parent, *args, **kwargs):
 		wx.ListCtrl.__init__(self, parent,
@@ -52,21 +41,24 @@ class VirtualListCtrl(wx.ListCtrl, ListCtrlAutoWidthMixin):
 
 	def reset(self):
 		self.headings = []
-		self.data = array([])
-		self.filtered_data = None
-		self.display_data = array([])
+		self.data = ColumnData([], [], [], 0)
+		self.filtered_rows = None
 
 		self.types = []
 
-	def refresh_with_values(self, data):
-		self.ItemCount = len(data)
+	@property
+	def rows(self):
+		"""
+		Indices of the visible rows.
+		"""
 
-		if self.ItemCount > 0:
-			self.display_data = zeros(data.shape, dtype='|S{0}'.format(self.max_value_len))
+		if self.filtered_rows is not None:
+			return self.filtered_rows
+		else:
+			return arange(len(self.data))
 
-			for i, _ in enumerate(self.headings):
-				# Truncate for display.
-				self.display_data[:,i] = [str(x)[:self.max_value_len] for x in data[:,i]]
+	def refresh_with_values(self, rows):
+		self.ItemCount = len(rows)
 
 		self.Refresh()
 
@@ -82,16 +74,14 @@ class VirtualListCtrl(wx.ListCtrl, ListCtrlAutoWidthMixin):
 		"""
 
 		if afresh:
-			self.filtered_data = None
+			self.filtered_rows = None
 
-		if self.filtered_data is not None:
-			original_set = self.filtered_data
-		else:
-			original_set = self.data
+		original_set = self.rows
 
-		self.filtered_data = compress([f(i, x) for i, x in enumerate(original_set)], original_set, axis=0)
+		keep = [f(i, self.data.row(x)) for i, x in enumerate(original_set)]
+		self.filtered_rows = compress(keep, original_set)
 
-		self.refresh_with_values(self.filtered_data)
+		self.refresh_with_values(self.filtered_rows)
 
 	def GetValue(self, types=None):
 		# Get all types by default.
@@ -103,12 +93,7 @@ class VirtualListCtrl(wx.ListCtrl, ListCtrlAutoWidthMixin):
 		# Find column indices of the correct type.
 		idxs = [i for i, t in enumerate(self.types) if t in types]
 
-		if self.filtered_data is not None:
-			data = self.filtered_data
-		else:
-			data = self.data
-
-		return ([self.headings[i] for i in idxs], data[:,idxs], [self.types[i] for i in idxs])
+		return ([self.headings[i] for i in idxs], self.data.values(idxs, self.rows), [self.types[i] for i in idxs])
 
 	def SetValue(self, headings, data):
 		"""
@@ -116,13 +101,25 @@ class VirtualListCtrl(wx.ListCtrl, ListCtrlAutoWidthMixin):
 		data: A 2D NumPy array.
 		"""
 
+		self.SetColumnData(ColumnData.from_array(headings, data))
+
+	def SetColumnData(self, data):
+		"""
+		data: A ColumnData instance.
+		"""
+
 		self.ClearAll()
+
+		old_data = self.data
 		self.reset()
 
-		self.headings = headings
+		if old_data is not data:
+			old_data.close()
+
+		self.headings = data.headings
 		self.data = data
 
-		self.refresh_with_values(self.data)
+		self.refresh_with_values(self.rows)
 
 		if self.ItemCount > 0:
 			width, height = self.GetSize()
@@ -132,15 +129,20 @@ class VirtualListCtrl(wx.ListCtrl, ListCtrlAutoWidthMixin):
 			for i, heading in enumerate(self.headings):
 				self.InsertColumn(i, heading, width=col_width)
 
-				type = self.find_type(data[0,i])
-				self.types.append(type)
+			self.types = list(data.types)
 
 	def OnGetItemText(self, item, col):
 		"""
 		Return cell value for LC_VIRTUAL.
 		"""
 
-		return self.display_data[item,col]
+		if self.filtered_rows is not None:
+			item = self.filtered_rows[item]
+
+		value = self.data.cell(item, col)
+
+		# Truncate for display.
+		return str(value)[:self.max_value_len]
 
 
 class TabularDisplayPanel(wx.Panel):
@@ -183,6 +185,13 @@ class TabularDisplayPanel(wx.Panel):
 
 		self.SetValue(headers, rows)
 
+	def from_column_data(self, data):
+		"""
+		Import the given column data into the table.
+		"""
+
+		self.table.SetColumnData(data)
+
 	def GetValue(self, *args, **kwargs):
 		return self.table.GetValue(*args, **kwargs)
 
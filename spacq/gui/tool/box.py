@@ -3,6 +3,8 @@ from os.path import basename
 import pickle
 import wx
 
+from spacq.interface.column_data import load_columns
+
 
 OK_BACKGROUND_COLOR = 'PALE GREEN'
 
@@ -110,6 +112,26 @@ def load_csv(parent, extension='csv', file_type='CSV'):
 				# Wrap all problems.
 				raise IOError('Could not load data.', e)
 
+def load_data(parent, extension='csv', file_type='CSV'):
+	"""
+	Load column data from a CSV or binary sweep file based on a file dialog.
+
+	Unlike load_csv, only the scalar columns are read into memory.
+	"""
+
+	wildcard = '{0} (*.{1})|*.{1}|Binary (*.bin)|*.bin|All files|*'.format(file_type, extension)
+	dlg = wx.FileDialog(parent=parent, message='Load...', wildcard=wildcard,
+			style=wx.FD_OPEN)
+
+	if dlg.ShowModal() == wx.ID_OK:
+		path = dlg.GetPath()
+
+		try:
+			return (load_columns(path), basename(path))
+		except Exception as e:
+			# Wrap all problems.
+			raise IOError('Could not load data.', e)
+
 def save_csv(parent, values, headers=None, extension='csv', file_type='CSV'):
 	"""
 	Save data to a CSV file based on a file dialog.
@@ -0,0 +1,292 @@
+from array import array
+import csv
+import mmap
+import numpy
+
+from spacq.iteration.export import format_heading, load_binary
+
+from .list_columns import ListParser
+
+"""
+Column-oriented access to tabular data, without holding every cell in memory as a string.
+"""
+
+
+def find_type(value):
+	"""
+	Determine the type of a column based on a single value.
+
+	The type is one of: scalar, list, string.
+	"""
+
+	try:
+		float(value)
+	except (TypeError, ValueError):
+		pass
+	else:
+		return 'scalar'
+
+	if not isinstance(value, basestring):
+		return 'list'
+
+	try:
+		ListParser()(value)
+	except ValueError:
+		pass
+	else:
+		return 'list'
+
+	return 'string'
+
+
+def fill_headings(headings, num_columns):
+	"""
+	Ensure that all columns have a heading.
+	"""
+
+	headings = list(headings) + [''] * (num_columns - len(headings))
+
+	return [heading if heading else 'Column {0}'.format(i + 1) for i, heading in enumerate(headings)]
+
+
+class Row(object):
+	"""
+	A lazy view of a single row.
+	"""
+
+	def __init__(self, data, idx):
+		self.data = data
+		self.idx = idx
+
+	def __len__(self):
+		return len(self.data.headings)
+
+	def __getitem__(self, col):
+		return self.data.cell(self.idx, col)
+
+	def __iter__(self):
+		for col in xrange(len(self)):
+			yield self[col]
+
+
+class ColumnData(object):
+	"""
+	Tabular data stored by column.
+
+	Scalar columns are float arrays; other columns are any indexable sequence (strings for CSV data, arrays for
+	binary data), which need not be in memory.
+	"""
+
+	def __init__(self, headings, types, columns, num_rows):
+		"""
+		headings: A list of strings.
+		types: The type of each column.
+		columns: The values of each column.
+		num_rows: The number of rows.
+		"""
+
+		self.headings = headings
+		self.types = types
+		self.columns = columns
+		self.num_rows = num_rows
+
+	def __len__(self):
+		return self.num_rows
+
+	@classmethod
+	def from_array(cls, headings, data):
+		"""
+		Wrap a 2D array of values, such as strings from a CSV file.
+		"""
+
+		data = numpy.asarray(data)
+
+		if data.ndim != 2 or len(data) == 0:
+			return cls(list(headings), ['string'] * len(headings), [[] for _ in headings], 0)
+
+		types, columns = [], []
+		for i in xrange(len(headings)):
+			column = data[:,i]
+			type = find_type(column[0])
+
+			if type == 'scalar':
+				try:
+					column = column.astype(float)
+				except ValueError:
+					# Only the first value was checked.
+					type = 'string'
+
+			types.append(type)
+			columns.append(column)
+
+		return cls(list(headings), types, columns, len(data))
+
+	def column(self, col):
+		"""
+		All the values in a column.
+		"""
+
+		return self.columns[col]
+
+	def cell(self, row, col):
+		"""
+		The value of a single cell.
+		"""
+
+		return self.columns[col][row]
+
+	def row(self, idx):
+		return Row(self, idx)
+
+	def values(self, cols, rows=None):
+		"""
+		A 2D array of the given columns, for the given row indices (or all rows).
+
+		If all the columns are scalar, the result is an array of floats; otherwise, it is an object array.
+		"""
+
+		if rows is None:
+			rows = numpy.arange(self.num_rows)
+
+		if all(self.types[col] == 'scalar' for col in cols):
+			result = numpy.empty((len(rows), len(cols)))
+
+			for j, col in enumerate(cols):
+				result[:,j] = self.columns[col][rows]
+		else:
+			result = numpy.empty((len(rows), len(cols)), dtype=object)
+
+			for j, col in enumerate(cols):
+				column = self.columns[col]
+
+				for i, row in enumerate(rows):
+					result[i,j] = column[row]
+
+		return result
+
+	def close(self):
+		pass
+
+
+class CSVColumn(object):
+	"""
+	A non-scalar CSV column, read back from the file on demand.
+	"""
+
+	def __init__(self, data, col):
+		self.data = data
+		self.col = col
+
+	def __len__(self):
+		return self.data.num_rows
+
+	def __getitem__(self, idx):
+		return self.data.raw_row(idx)[self.col]
+
+
+class CSVColumnData(ColumnData):
+	"""
+	Column data from a CSV file, as written by the data capture panel.
+
+	The file is read a row at a time; only the scalar columns and the offset of each row are kept, and the rest of
+	the cells are read back from a memory map as needed.
+	"""
+
+	def __init__(self, path):
+		self.path = path
+
+		# Byte offset of the start of each row.
+		offsets = array('L')
+
+		with open(path, 'rb') as f:
+			reader = csv.reader(iter(f.readline, ''))
+
+			# A blank first row means that there are no headings.
+			try:
+				headings = reader.next()
+			except StopIteration:
+				headings = []
+
+			types = None
+			scalars = {}
+
+			pos = f.tell()
+			for row in reader:
+				start, pos = pos, f.tell()
+
+				if not row:
+					continue
+
+				if types is None:
+					types = [find_type(x) for x in row]
+					scalars = dict((i, array('d')) for i, t in enumerate(types) if t == 'scalar')
+
+				offsets.append(start)
+
+				for i, values in scalars.iteritems():
+					try:
+						values.append(float(row[i]))
+					except (IndexError, ValueError):
+						values.append(numpy.nan)
+
+		if types is None:
+			types = ['string'] * len(headings)
+
+		columns = [numpy.array(scalars[i]) if t == 'scalar' else CSVColumn(self, i) for i, t in enumerate(types)]
+
+		ColumnData.__init__(self, fill_headings(headings, len(types)), types, columns, len(offsets))
+
+		self.offsets = numpy.array(offsets, dtype=numpy.int64)
+
+		self.file = open(path, 'rb')
+		if self.num_rows > 0:
+			self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+		else:
+			self.map = None
+
+	def raw_row(self, idx):
+		"""
+		Read a row back from the file, as strings.
+		"""
+
+		if idx < 0:
+			idx += self.num_rows
+
+		start = self.offsets[idx]
+		end = self.offsets[idx + 1] if idx + 1 < self.num_rows else len(self.map)
+
+		return csv.reader([self.map[start:end]]).next()
+
+	def close(self):
+		if self.map is not None:
+			self.map.close()
+			self.map = None
+
+		self.file.close()
+
+
+def load_binary_columns(path):
+	"""
+	Column data from a file written by the binary exporter.
+	"""
+
+	headings, columns = load_binary(path)
+
+	types = ['scalar' if column.ndim == 1 else 'list' for column in columns]
+	num_rows = len(columns[0]) if columns else 0
+
+	return ColumnData([format_heading(name, units) for name, units in headings], types, columns, num_rows)
+
+
+def load_columns(path):
+	"""
+	Column data from either a CSV file or a binary sweep file, depending on its contents.
+	"""
+
+	with open(path, 'rb') as f:
+		is_binary = f.read(len('SPACQ-BINARY')) == 'SPACQ-BINARY'
+
+	if is_binary:
+		return load_binary_columns(path)
+	else:
+		return CSVColumnData(path)
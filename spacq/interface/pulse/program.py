@@ -1,7 +1,9 @@
-from copy import copy, deepcopy
-from os.path import basename, dirname
+from copy import copy
+from os import stat
+from os.path import basename, dirname, join
 
 from ..units import Quantity
+from ..waveform import Generator
 from .parser import Parser, PulseError, PulseSyntaxError
 from .tree import Environment
 
@@ -73,6 +75,21 @@ class Program(object):
 		self.times_average = 1
 		self.acq_delay = Quantity(0, 's')
 
+		self._reset_compiled()
+
+	def _reset_compiled(self):
+		"""
+		Forget all previously generated waveforms.
+		"""
+
+		# Outputs whose waveforms changed during the last generation.
+		self.changed_outputs = set()
+
+		self._compiled_state = None
+		self._segments = {}
+		self._segment_caches = {}
+		self._rendered = {}
+
 	@property
 	def all_values(self):
 		return self._env.all_values
@@ -104,21 +121,119 @@ class Program(object):
 
 		self._env.values[parameter] = value
 
+	def _shape_file_state(self, shape):
+		"""
+		The path, modification time and size of the file for a pulse shape, so that editing the file is noticed.
+
+		The file is looked for in the same places as when generating the waveforms.
+		"""
+
+		paths = [shape]
+		if self._env.cwd is not None:
+			paths.append(join(self._env.cwd, shape))
+
+		for p in paths:
+			try:
+				info = stat(p)
+			except OSError:
+				continue
+
+			return (p, info.st_mtime, info.st_size)
+
+	def _value_state(self):
+		"""
+		A comparable snapshot of everything that the waveforms depend on.
+
+		Values which cannot be compared (unhashable ones) are always taken to have changed.
+		"""
+
+		def key(parameter, value):
+			# Quantities only compare approximately.
+			if isinstance(value, Quantity):
+				return (value.value, frozenset(value.dimensions))
+			elif parameter[-1] == 'shape' and isinstance(value, basestring) and value != 'square':
+				return (value, self._shape_file_state(value))
+
+			try:
+				hash(value)
+			except TypeError:
+				# Never equal to anything else.
+				return object()
+
+			return value
+
+		return (key(('frequency',), self.frequency), self._env.cwd,
+				frozenset((k, key(k, v)) for k, v in self._env.values.items()))
+
 	def generate_waveforms(self, dry_run=False):
 		"""
 		Generate the waveforms, given that the values are all filled in.
+
+		The program is first compiled into a flat list of segments for each output, with all values resolved. Only
+		the outputs whose segments differ from the previous call are rendered again; their names are left in
+		changed_outputs. If no values have changed at all, the previous waveforms are returned as-is.
 		"""
 
+		if dry_run:
+			self._env.stage = self._env.stages.waveforms
+			self._env.dry_run = True
+			self._env.missing_shapes = set()
+			self._env.errors = []
+			self._env.traverse_tree(self._ast)
+
+			if self._env.errors:
+				raise PulseError(self._env.format_errors())
+
+			return self._env.waveforms
+
+		state = self._value_state()
+		if state == self._compiled_state:
+			self.changed_outputs = set()
+
+			return self._rendered
+
 		self._env.stage = self._env.stages.waveforms
-		self._env.dry_run = dry_run
+		self._env.dry_run = False
+		self._env.record = True
 		self._env.missing_shapes = set()
 		self._env.errors = []
-		self._env.traverse_tree(self._ast)
+
+		try:
+			self._env.traverse_tree(self._ast)
+		finally:
+			self._env.record = False
 
 		if self._env.errors:
 			raise PulseError(self._env.format_errors())
 
-		return self._env.waveforms
+		self.changed_outputs = set()
+		rendered = {}
+		for output, recorder in self._env.generators.items():
+			if recorder.segments == self._segments.get(output):
+				rendered[output] = self._rendered[output]
+				continue
+
+			# Only keep the pulse shapes which are still in use.
+			old_cache, cache = self._segment_caches.get(output, {}), {}
+			for segment in recorder.segments:
+				if segment in old_cache:
+					cache[segment] = old_cache[segment]
+
+			generator = Generator(frequency=self.frequency)
+			generator.replay(recorder.segments, cache)
+
+			rendered[output] = generator.waveform
+			self._segments[output] = recorder.segments
+			self._segment_caches[output] = cache
+
+			self.changed_outputs.add(output)
+
+		self._rendered = rendered
+		self._compiled_state = state
+
+		self._env.waveforms.update(rendered)
+
+		return rendered
 
 	@property
 	def with_resources(self):
@@ -131,7 +246,8 @@ class Program(object):
 		result = copy(self)
 
 		# We plan to modify the values in the Environment.
-		result._env = deepcopy(self._env)
+		result._env = self._env.copy()
+		result._reset_compiled()
 
 		for parameter, label in self.resource_labels.items():
 			def setter(x, parameter=parameter):
@@ -1,4 +1,7 @@
+import os
 from os import path
+import shutil
+import tempfile
 from nose.tools import assert_raises, eq_
 from numpy.testing import assert_array_almost_equal, assert_array_equal
 from unittest import main, TestCase
@@ -106,7 +109,7 @@ error: File "this-shape-doesn't-exist" (due to "wobble") not found at column 17
 		f1 = waveforms['f1']
 		loop = [0.0] * 10 + [0.5] + [0.0] * 7 + [0.5] + [0.0] * 7
 		assert_array_equal(f1.data, [0.0] * 10 + [0.5] * 1 + [0.0] * 7 + loop * 2 + [0.0] * 20 + [-0.5] * 5 + [0.0] * 49)
-		eq_(f1.markers[1], [False] * 90 + [True] * 54)
+		assert_array_equal(f1.markers[1], [False] * 90 + [True] * 54)
 
 		f2 = waveforms['f2']
 		f2_gen = p._env.generators['f2']
@@ -147,6 +150,118 @@ error: File "this-shape-doesn't-exist" (due to "wobble") not found at column 17
 		eq_(list(waveforms['f2'].data), [])
 		eq_(waveforms['f2'].markers, {})
 
+	def testRegenerate(self):
+		"""
+		Only the outputs affected by changed values are generated again.
+		"""
+
+		p = program.Program.from_file(path.join(resource_dir, '01.pulse'))
+
+		for name, value in self.missing:
+			p.set_value(name, value)
+
+		p.set_value(('wobble', 'shape'), 'non-square')
+		p.frequency = Quantity(1, 'GHz')
+
+		waveforms = p.generate_waveforms()
+		eq_(p.changed_outputs, set(['f1', 'f2']))
+
+		# Nothing changed.
+		p.set_value(('first_square', 'amplitude'), Quantity(500, 'mV'))
+		eq_(p.generate_waveforms(), waveforms)
+		eq_(p.changed_outputs, set())
+
+		# Only f2 uses the manipulator.
+		p.set_value(('manipulator', 'amplitude'), Quantity(0.5, 'V'))
+		new_waveforms = p.generate_waveforms()
+		eq_(p.changed_outputs, set(['f2']))
+		assert new_waveforms['f1'] is waveforms['f1']
+
+		# Timing changes affect everything.
+		p.set_value(('settle',), Quantity(30, 'ns'))
+		new_waveforms = p.generate_waveforms()
+		eq_(p.changed_outputs, set(['f1', 'f2']))
+
+		# The result is the same as starting from scratch.
+		p2 = program.Program.from_file(path.join(resource_dir, '01.pulse'))
+		for name, value in self.missing:
+			p2.set_value(name, value)
+		p2.set_value(('wobble', 'shape'), 'non-square')
+		p2.set_value(('manipulator', 'amplitude'), Quantity(0.5, 'V'))
+		p2.set_value(('settle',), Quantity(30, 'ns'))
+		p2.frequency = Quantity(1, 'GHz')
+
+		for output, (data, markers) in p2.generate_waveforms().items():
+			assert_array_equal(new_waveforms[output].data, data)
+			eq_(sorted(new_waveforms[output].markers), sorted(markers))
+			for num in markers:
+				assert_array_equal(new_waveforms[output].markers[num], markers[num])
+
+		# Copies start afresh.
+		p3 = p.with_resources
+		p3.generate_waveforms()
+		eq_(p3.changed_outputs, set(['f1', 'f2']))
+
+		p3.set_value(('settle',), Quantity(10, 'ns'))
+		eq_(p.values[('settle',)], Quantity(30, 'ns'))
+
+	def testRegenerateShapeFile(self):
+		"""
+		A shape file which is edited is read again.
+		"""
+
+		dir = tempfile.mkdtemp()
+
+		try:
+			for name in ['01.pulse', 'non-square']:
+				shutil.copy(path.join(resource_dir, name), dir)
+
+			p = program.Program.from_file(path.join(dir, '01.pulse'))
+
+			for name, value in self.missing:
+				p.set_value(name, value)
+
+			p.set_value(('wobble', 'shape'), 'non-square')
+			p.frequency = Quantity(1, 'GHz')
+
+			waveforms = p.generate_waveforms()
+			eq_(p.generate_waveforms(), waveforms)
+			eq_(p.changed_outputs, set())
+
+			shape_path = path.join(dir, 'non-square')
+			with open(shape_path, 'w') as f:
+				f.write('1.0, 2.0, 3.0\n')
+			# Even if the file system only keeps the time to the second.
+			mtime = os.stat(shape_path).st_mtime + 2
+			os.utime(shape_path, (mtime, mtime))
+
+			new_waveforms = p.generate_waveforms()
+			eq_(p.changed_outputs, set(['f2']))
+			assert new_waveforms['f1'] is waveforms['f1']
+		finally:
+			shutil.rmtree(dir)
+
+	def testRegenerateUnhashable(self):
+		"""
+		Values which cannot be compared are taken to have changed.
+		"""
+
+		p = program.Program.from_file(path.join(resource_dir, '01.pulse'))
+
+		for name, value in self.missing:
+			p.set_value(name, value)
+
+		p.set_value(('wobble', 'shape'), 'non-square')
+		p.set_value(('extra', 'data'), [1.0, 2.0])
+		p.frequency = Quantity(1, 'GHz')
+
+		state = p._value_state()
+		assert state != p._value_state()
+
+		p.generate_waveforms()
+		waveforms = p.generate_waveforms()
+		eq_(set(waveforms.keys()), set(['f1', 'f2']))
+
 
 if __name__ == '__main__':
 	main()
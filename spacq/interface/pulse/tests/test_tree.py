@@ -1,5 +1,5 @@
 from nose.tools import assert_raises, eq_
-from numpy.testing import assert_array_almost_equal
+from numpy.testing import assert_array_almost_equal, assert_array_equal
 from os import path
 from unittest import main, TestCase
 
@@ -152,7 +152,7 @@ class ValidTreeTest(TestCase):
 		assert_array_almost_equal(pqr2.data, [0.0] * 110 + loop * 2 + [0.0] * 5)
 
 		assert 1 not in pqr2.markers
-		eq_(pqr2.markers[5], [False] * 478 + [True] * 5)
+		assert_array_equal(pqr2.markers[5], [False] * 478 + [True] * 5)
 
 
 class InvalidTreeTest(TestCase):
@@ -1,12 +1,13 @@
 import logging
 log = logging.getLogger(__name__)
 
+from copy import copy
 from os import path
 
 from spacq.tool.box import Enum
 
 from ..units import IncompatibleDimensions, Quantity
-from ..waveform import Generator
+from ..waveform import Generator, SegmentRecorder
 from .tool.box import find_location, format_error, load_values
 
 """
@@ -70,6 +71,9 @@ class Environment(object):
 		# Whether to actually generate waveforms.
 		self.dry_run = False
 
+		# Whether to only record the waveform segments, rather than generating them.
+		self.record = False
+
 		# Waveform generators for the output channels.
 		# Keys are output names.
 		self.generators = {}
@@ -112,7 +116,10 @@ class Environment(object):
 
 			# Set up output waveform generators.
 			for output in self.waveforms:
-				self.generators[output] = Generator(frequency=self.frequency, dry_run=self.dry_run)
+				if self.record:
+					self.generators[output] = SegmentRecorder(frequency=self.frequency)
+				else:
+					self.generators[output] = Generator(frequency=self.frequency, dry_run=self.dry_run)
 
 	def post_stage(self):
 		"""
@@ -141,6 +148,24 @@ class Environment(object):
 			for output in self.generators:
 				self.waveforms[output] = self.generators[output].waveform
 
+	def copy(self):
+		"""
+		A copy of the environment whose values can be changed independently, without any generated waveforms.
+		"""
+
+		result = copy(self)
+
+		result.stack = []
+		result.variables = self.variables.copy()
+		result.values = self.values.copy()
+		result.all_values = set(self.all_values)
+		result.errors = list(self.errors)
+		result.missing_shapes = set(self.missing_shapes)
+		result.generators = dict.fromkeys(self.generators)
+		result.waveforms = dict.fromkeys(self.waveforms)
+
+		return result
+
 	def set_value(self, target, value):
 		"""
 		Set a value if the types work out. TypeError otherwise.
@@ -496,11 +521,11 @@ class ParallelPulses(ASTNode):
 		env.stack.pop()
 
 		if env.stage == env.stages.waveforms:
-			max_length = max(len(waveform._wave) for waveform in env.generators.values())
+			max_length = max(waveform.length for waveform in env.generators.values())
 
 			for waveform in env.generators.values():
-				if len(waveform._wave) < max_length:
-					waveform.append([0.0] * (max_length - len(waveform._wave)))
+				if waveform.length < max_length:
+					waveform.pad(max_length - waveform.length)
 
 
 class Pulse(ASTNode):
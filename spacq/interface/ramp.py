@@ -0,0 +1,175 @@
+import logging
+log = logging.getLogger(__name__)
+
+from math import ceil
+from threading import Event, Lock
+from time import time
+
+from .units import Quantity
+
+"""
+Smoothly change several resources at once, from a single timing loop.
+"""
+
+
+def magnitude(value):
+	"""
+	A plain float for a number or a Quantity (in its base units).
+	"""
+
+	if isinstance(value, Quantity):
+		return value.value
+	else:
+		return float(value)
+
+
+class Ramp(object):
+	"""
+	A set of resources which are swept together, so that they all finish at the same time.
+
+	Each resource may limit its ramps with the following attributes:
+		slew_rate: The fastest allowed change, per second; a Quantity for resources with units.
+		max_step: The largest allowed step. If set, the number of steps is chosen by the distance to travel rather
+			than by the number of steps requested, and a change no larger than one step is written directly.
+
+	Without a slew rate, each value is held for the given delay, as Resource.sweep has always done.
+	"""
+
+	def __init__(self, delay=0.1):
+		"""
+		delay: Time in s for which each value is held, for resources without a slew rate.
+		"""
+
+		self.delay = delay
+
+		# (resource, values, duration, exception_callback)
+		self.ramps = []
+
+		self._abort = Event()
+		self.lock = Lock()
+
+	def add(self, resource, value_from, value_to, steps, exception_callback=None):
+		"""
+		Add a resource to be swept from one value to another.
+
+		steps: The number of values (including both ends), when the resource does not set a maximum step.
+		exception_callback: Called with the exception if a value cannot be written, which ends the resource's ramp.
+		"""
+
+		# Check for dimension mismatches.
+		if isinstance(value_from, Quantity) and not isinstance(value_to, Quantity) and value_to == 0:
+			value_to = Quantity(0, value_from.original_units)
+		elif isinstance(value_to, Quantity) and not isinstance(value_from, Quantity) and value_from == 0:
+			value_from = Quantity(0, value_to.original_units)
+		elif isinstance(value_from, Quantity) and isinstance(value_to, Quantity):
+			value_from.assert_dimensions(value_to)
+
+		distance = abs(magnitude(value_to) - magnitude(value_from))
+
+		max_step = getattr(resource, 'max_step', None)
+		if max_step is not None:
+			max_step = magnitude(max_step)
+
+			if distance <= max_step:
+				# Not worth ramping.
+				steps = 1
+			else:
+				steps = int(ceil(distance / max_step)) + 1
+
+		if steps <= 1:
+			values = [value_to]
+		else:
+			values = [value_from + (value_to - value_from) * (float(i) / (steps - 1)) for i in xrange(steps)]
+
+		slew_rate = getattr(resource, 'slew_rate', None)
+		if slew_rate is not None:
+			if len(values) > 1:
+				# Each value is held until the next step is allowed.
+				duration = len(values) * distance / (len(values) - 1) / magnitude(slew_rate)
+			else:
+				duration = 0.0
+		else:
+			duration = len(values) * self.delay
+
+		with self.lock:
+			self.ramps.append((resource, values, duration, exception_callback))
+
+	@property
+	def duration(self):
+		"""
+		The time in s which the ramp will take.
+		"""
+
+		with self.lock:
+			return max([duration for _, _, duration, _ in self.ramps] + [0.0])
+
+	@property
+	def aborted(self):
+		return self._abort.is_set()
+
+	def abort(self):
+		"""
+		Stop the ramp as soon as possible, leaving the resources wherever they are.
+		"""
+
+		self._abort.set()
+
+	def run(self):
+		"""
+		Write all the values on schedule, returning once every resource has reached its final value.
+
+		Returns False if the ramp was aborted.
+		"""
+
+		with self.lock:
+			ramps = list(self.ramps)
+
+		total = max([duration for _, _, duration, _ in ramps] + [0.0])
+
+		# Every resource spreads its values evenly over the same time, so they all finish together.
+		pending = []
+		for resource, values, _, exception_callback in ramps:
+			interval = total / len(values)
+			# [resource, values, interval, next value, time at which it is due, exception_callback]
+			pending.append([resource, values, interval, 0, 0.0, exception_callback])
+
+		start_time = time()
+
+		while pending:
+			if self._abort.is_set():
+				return False
+
+			for item in list(pending):
+				resource, values, interval, pos, due, exception_callback = item
+
+				now = time() - start_time
+				if due > now:
+					continue
+
+				try:
+					resource.value = values[pos]
+				except Exception as e:
+					if exception_callback is not None:
+						exception_callback(e)
+					else:
+						log.error('Could not write {0!r} during ramp: {1!r}'.format(values[pos], e))
+
+					pending.remove(item)
+					continue
+
+				if pos == len(values) - 1:
+					pending.remove(item)
+				else:
+					# Every step is written, and the next one is held back for a full interval, so that a late ramp
+					# takes longer rather than moving faster.
+					item[3] = pos + 1
+					item[4] = now + interval
+
+			if pending:
+				next_time = min(due for _, _, _, _, due, _ in pending)
+			else:
+				next_time = total
+
+			self._abort.wait(max(next_time - (time() - start_time), 0))
+
+		return not self._abort.is_set()
@@ -2,10 +2,10 @@ import logging
 log = logging.getLogger(__name__)
 
 from copy import copy
-from numpy import linspace
 from threading import Thread
 import time
 
+from .ramp import Ramp
 from .units import IncompatibleDimensions, Quantity
 
 from spacq.tool.box import Without
@@ -72,6 +72,10 @@ class Resource(object):
 		# Resources marked slow should not be fetched implicitly.
 		self.slow = False
 
+		# Limits for ramps (see Ramp); None for no limit.
+		self.slew_rate = None
+		self.max_step = None
+
 	@property
 	def units(self):
 		return self._units
@@ -242,25 +246,13 @@ class Resource(object):
 	def sweep(self, value_from, value_to, steps, delay=0.1, exception_callback=None):
 		"""
 		Sweep the Resource slowly over a linear space.
+
+		To sweep several resources together, use a Ramp.
 		"""
 
-		# Check for dimension mismatches.
-		if isinstance(value_from, Quantity) and not isinstance(value_to, Quantity) and value_to == 0:
-			value_to = Quantity(0, value_from.original_units)
-		elif isinstance(value_to, Quantity) and not isinstance(value_from, Quantity) and value_from == 0:
-			value_from = Quantity(0, value_to.original_units)
-		elif isinstance(value_from, Quantity) and isinstance(value_to, Quantity):
-			value_from.assert_dimensions(value_to)
-
-		for value in linspace(value_from, value_to, steps):
-			try:
-				self.value = value
-			except Exception as e:
-				if exception_callback is not None:
-					exception_callback(e)
-				return
-
-			time.sleep(delay)
+		ramp = Ramp(delay)
+		ramp.add(self, value_from, value_to, steps, exception_callback)
+		ramp.run()
 
 
 class AcquisitionThread(Thread):
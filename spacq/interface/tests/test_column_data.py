@@ -0,0 +1,128 @@
+import csv
+from nose.tools import eq_
+from numpy import isnan
+from numpy.testing import assert_array_equal
+import os
+import shutil
+import tempfile
+from unittest import main, TestCase
+
+from spacq.iteration.export import BinaryExporter
+
+from .. import column_data
+
+
+class ColumnDataTest(TestCase):
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def write_csv(self, rows):
+		path = os.path.join(self.dir, 'test.csv')
+
+		with open(path, 'wb') as f:
+			csv.writer(f).writerows(rows)
+
+		return path
+
+	def testFindType(self):
+		"""
+		Guess column types.
+		"""
+
+		eq_(column_data.find_type('1.5e-3'), 'scalar')
+		eq_(column_data.find_type(2.0), 'scalar')
+		eq_(column_data.find_type('[(1.0, 2.0)]'), 'list')
+		eq_(column_data.find_type([(1.0, 2.0)]), 'list')
+		eq_(column_data.find_type('abc'), 'string')
+
+	def testCSV(self):
+		"""
+		Scalars are parsed up front; everything else is read back from the file.
+		"""
+
+		path = self.write_csv([['Time (s)', '', 'Name', 'Wave']] +
+				[[i, i * 2, 'x,{0}'.format(i), str([(0.0, i), (1.0, -i)])] for i in xrange(20)] +
+				[[20, 'bad', 'y', '[(0.0, 1.0)]']])
+
+		data = column_data.load_columns(path)
+
+		eq_(data.headings, ['Time (s)', 'Column 2', 'Name', 'Wave'])
+		eq_(data.types, ['scalar', 'scalar', 'string', 'list'])
+		eq_(len(data), 21)
+
+		assert_array_equal(data.column(0), range(21))
+		assert isnan(data.cell(20, 1))
+		eq_(data.cell(3, 2), 'x,3')
+		eq_(data.cell(-1, 2), 'y')
+		eq_(data.cell(5, 3), '[(0.0, 5), (1.0, -5)]')
+		eq_(list(data.row(2)), [2.0, 4.0, 'x,2', '[(0.0, 2), (1.0, -2)]'])
+
+		assert_array_equal(data.values([1, 0], rows=[1, 2]), [[2.0, 1.0], [4.0, 2.0]])
+		eq_(data.values([0, 2], rows=[4]).tolist(), [[4.0, 'x,4']])
+
+		data.close()
+
+	def testCSVNoHeadings(self):
+		"""
+		A blank first row.
+		"""
+
+		path = self.write_csv([[], ['1', '2'], [], ['3', '4']])
+
+		data = column_data.load_columns(path)
+
+		eq_(data.headings, ['Column 1', 'Column 2'])
+		assert_array_equal(data.values([0, 1]), [[1, 2], [3, 4]])
+
+		data.close()
+
+	def testCSVEmpty(self):
+		"""
+		Only headings.
+		"""
+
+		path = self.write_csv([['a', 'b']])
+
+		data = column_data.load_columns(path)
+
+		eq_(data.headings, ['a', 'b'])
+		eq_(len(data), 0)
+
+		data.close()
+
+	def testBinary(self):
+		"""
+		Columns are views of the file.
+		"""
+
+		path = os.path.join(self.dir, 'test.bin')
+
+		exporter = BinaryExporter(path, [('Time', 's'), ('Wave', 'V')])
+		for i in xrange(5):
+			exporter.add_row([float(i), [(0.0, i), (1.0, -i)]])
+		exporter.close()
+
+		data = column_data.load_columns(path)
+
+		eq_(data.headings, ['Time (s)', 'Wave (V)'])
+		eq_(data.types, ['scalar', 'list'])
+		assert_array_equal(data.column(0), range(5))
+		assert_array_equal(data.cell(3, 1), [(0.0, 3), (1.0, -3)])
+
+	def testFromArray(self):
+		"""
+		Wrap existing values.
+		"""
+
+		data = column_data.ColumnData.from_array(['a', 'b'], [['1', 'x'], ['2', 'y']])
+
+		eq_(data.types, ['scalar', 'string'])
+		assert_array_equal(data.column(0), [1.0, 2.0])
+		eq_(data.cell(1, 1), 'y')
+
+
+if __name__ == '__main__':
+	main()
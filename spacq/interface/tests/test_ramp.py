@@ -0,0 +1,161 @@
+from nose.tools import eq_
+from threading import Thread
+import time
+from unittest import main, TestCase
+
+from ..resources import Resource
+from ..units import Quantity
+
+from .. import ramp
+
+
+class RampTest(TestCase):
+	def make_resource(self):
+		buf = []
+
+		def setter(value):
+			if abs(value) > 10:
+				raise ValueError(value)
+
+			buf.append((time.time(), value))
+
+		return Resource(setter=setter), buf
+
+	def testTogether(self):
+		"""
+		Resources finish together, however many steps they take.
+		"""
+
+		res1, buf1 = self.make_resource()
+		res2, buf2 = self.make_resource()
+
+		r = ramp.Ramp(delay=0.05)
+		r.add(res1, 0.0, 4.0, 5)
+		r.add(res2, 1.0, 2.0, 2)
+		eq_(r.duration, 0.25)
+
+		start_time = time.time()
+		assert r.run()
+		elapsed = time.time() - start_time
+		assert 0.25 <= elapsed < 0.35, elapsed
+
+		eq_([v for _, v in buf1], [0.0, 1.0, 2.0, 3.0, 4.0])
+		eq_([v for _, v in buf2], [1.0, 2.0])
+
+		# The second resource is spread out over the same time.
+		assert buf2[1][0] - start_time >= 0.12, buf2
+
+	def testLimits(self):
+		"""
+		The slew rate and step size decide how long a ramp takes.
+		"""
+
+		res1, buf1 = self.make_resource()
+		res1.slew_rate = 20.0
+		res1.max_step = 0.5
+
+		res2, buf2 = self.make_resource()
+		res2.max_step = 0.5
+
+		r = ramp.Ramp(delay=0.01)
+		r.add(res1, 0.0, 1.0, 100)
+		# Too small to bother.
+		r.add(res2, 0.0, 0.1, 100)
+
+		# 3 values, each held for 0.5 / 20 s.
+		eq_(r.duration, 0.075)
+
+		assert r.run()
+		eq_([v for _, v in buf1], [0.0, 0.5, 1.0])
+		eq_([v for _, v in buf2], [0.1])
+
+		# Nothing to do at all.
+		buf1[:] = []
+		r = ramp.Ramp()
+		r.add(res1, 1.0, 1.0, 10)
+		eq_(r.duration, 0.0)
+		assert r.run()
+		eq_([v for _, v in buf1], [1.0])
+
+	def testQuantities(self):
+		"""
+		Ramp resources with units.
+		"""
+
+		res, buf = self.make_resource()
+		res.units = 'V'
+		res.setter = lambda value: buf.append(value)
+		res.slew_rate = Quantity(1, 'kV.s-1')
+
+		r = ramp.Ramp()
+		r.add(res, Quantity(10, 'mV'), Quantity(30, 'mV'), 3)
+		assert abs(r.duration - 3 * 0.01 / 1e3) < 1e-12, r.duration
+
+		assert r.run()
+		eq_(buf, [Quantity(x, 'mV') for x in [10, 20, 30]])
+
+		buf[:] = []
+		r = ramp.Ramp(delay=0)
+		r.add(res, Quantity(10, 'mV'), 0, 2)
+		r.run()
+		eq_(buf, [Quantity(x, 'mV') for x in [10, 0]])
+
+	def testLate(self):
+		"""
+		Slow writes hold up the ramp, but no step is skipped.
+		"""
+
+		res, buf = self.make_resource()
+		setter = res.setter
+		res.setter = lambda value: (setter(value), time.sleep(0.03))
+		res.max_step = 1.0
+
+		r = ramp.Ramp(delay=0.01)
+		r.add(res, 0.0, 5.0, 2)
+
+		assert r.run()
+		eq_([v for _, v in buf], [0.0, 1.0, 2.0, 3.0, 4.0, 5.0])
+
+	def testAbort(self):
+		"""
+		Stop midway.
+		"""
+
+		res, buf = self.make_resource()
+
+		r = ramp.Ramp(delay=0.1)
+		r.add(res, 0.0, 9.0, 10)
+
+		start_time = time.time()
+
+		timer = Thread(target=lambda: (time.sleep(0.25), r.abort()))
+		timer.daemon = True
+		timer.start()
+
+		assert not r.run()
+		assert r.aborted
+		assert time.time() - start_time < 0.4
+		eq_([v for _, v in buf], [0.0, 1.0, 2.0])
+
+	def testExceptions(self):
+		"""
+		A failed write ends only that resource's ramp.
+		"""
+
+		res1, buf1 = self.make_resource()
+		res2, buf2 = self.make_resource()
+
+		exceptions = []
+
+		r = ramp.Ramp(delay=0.01)
+		r.add(res1, 9.0, 12.0, 4, exceptions.append)
+		r.add(res2, 0.0, 3.0, 4)
+
+		assert r.run()
+		eq_([v for _, v in buf1], [9.0, 10.0])
+		eq_([tuple(e) for e in exceptions], [(11.0,)])
+		eq_([v for _, v in buf2], [0.0, 1.0, 2.0, 3.0])
+
+
+if __name__ == '__main__':
+	main()
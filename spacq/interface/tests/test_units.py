@@ -1,5 +1,7 @@
 from copy import deepcopy
 from nose.tools import assert_raises, eq_
+import pickle
+import quantities as pq
 from unittest import main, TestCase
 
 from .. import units
@@ -79,11 +81,14 @@ class QuantityTest(TestCase):
 		# Insert fake unit.
 		assert 'ps' not in units.SIValues.units
 		units.SIValues.units.add('ps')
+		# Parsed units are cached.
+		units.Units.clear_cache()
 
 		try:
 			assert_raises(ValueError, units.Quantity, 5, 'ps')
 		finally:
 			units.SIValues.units.remove('ps')
+			units.Units.clear_cache()
 
 	def testAssertDimensions(self):
 		"""
@@ -246,6 +251,42 @@ class QuantityTest(TestCase):
 
 		eq_(deepcopy(q), units.Quantity('100 ns.V2'))
 
+	def testCachedUnits(self):
+		"""
+		Units are only parsed once, and carried through arithmetic.
+		"""
+
+		q1 = units.Quantity(5, 'mV.s')
+		q2 = units.Quantity('7 mV.s')
+
+		assert q1._units is q2._units
+
+		q = (q1 + q2) * 2 - abs(q1 / -2)
+		eq_(q.original_units, 'mV.s')
+		eq_(str(q), '21.5 mV.s')
+
+		# Same dimensions, different symbols.
+		assert units.Quantity(1, 'V.ks').dimensions is q.dimensions
+
+	def testPickle(self):
+		"""
+		Quantities survive pickling, including those from before the units were cached.
+		"""
+
+		q = units.Quantity(-1.5, 'kg.ms-1')
+
+		for protocol in xrange(pickle.HIGHEST_PROTOCOL + 1):
+			result = pickle.loads(pickle.dumps(q, protocol))
+
+			eq_(result.value, q.value)
+			eq_(str(result), str(q))
+
+		q = units.Quantity.__new__(units.Quantity)
+		q.__setstate__({'_q': pq.Quantity(0.25, 's'), 'original_units': 'ms', 'original_multiplier': -3})
+
+		eq_(q, units.Quantity(250, 'ms'))
+		eq_(str(q), '250 ms')
+
 
 if __name__ == '__main__':
 	main()
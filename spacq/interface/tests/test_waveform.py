@@ -1,5 +1,5 @@
 from nose.tools import assert_raises, eq_
-from numpy.testing import assert_array_almost_equal
+from numpy.testing import assert_array_almost_equal, assert_array_equal
 from unittest import main, TestCase
 
 from ..units import Quantity
@@ -37,8 +37,8 @@ class GeneratorTest(TestCase):
 
 		wave, markers = wg.waveform
 		assert_array_almost_equal(wave, expected, 4)
-		eq_(markers[1], [False] * 3 + [True] * 6 + [False] * 5)
-		eq_(markers[2], [False] * 3 + [True] * 11)
+		assert_array_equal(markers[1], [False] * 3 + [True] * 6 + [False] * 5)
+		assert_array_equal(markers[2], [False] * 3 + [True] * 11)
 		assert 3 not in markers
 
 	def testEndWithMarker(self):
@@ -52,8 +52,35 @@ class GeneratorTest(TestCase):
 		wg.marker(2, False)
 
 		wave, markers = wg.waveform
-		eq_(wave, [0.0])
-		eq_(markers, {1: [True], 2: [False]})
+		assert_array_equal(wave, [0.0])
+		eq_(sorted(markers), [1, 2])
+		assert_array_equal(markers[1], [True])
+		assert_array_equal(markers[2], [False])
+
+	def testMarkerRuns(self):
+		"""
+		Markers set repeatedly at the same position, and long waveforms.
+		"""
+
+		wg = waveform.Generator(frequency=Quantity(1, 'GHz'))
+
+		wg.marker(1, True)
+		wg.marker(1, False)
+		wg.set_next(0.5)
+		wg.delay(Quantity(1, 'ms'))
+		wg.marker(1, True)
+		wg.set_next(0.25)
+		wg.marker(1, True)
+		wg.delay(Quantity(1, 'ms'), less_points=0)
+
+		wave, markers = wg.waveform
+
+		eq_(len(wave), 2000001)
+		eq_(wave[999999], 0.5)
+		eq_(wave[-1], 0.25)
+		eq_(markers[1].dtype, bool)
+		eq_(markers[1].sum(), 1000001)
+		assert not markers[1][:1000000].any()
 
 	def testTooLong(self, dry_run=False):
 		"""
@@ -1,9 +1,7 @@
 import logging
 log = logging.getLogger(__name__)
 
-from copy import deepcopy
 from math import log10
-from numpy import allclose
 import quantities as pq
 
 """
@@ -55,11 +53,86 @@ class SIValues(object):
 	units.update(['Hz', 'J', 'N', 'T', 'V', 'G'])
 
 
+def close(a, b):
+	"""
+	Whether two floats are equal within the default tolerances of numpy.allclose.
+	"""
+
+	return a == b or abs(a - b) <= 1e-08 + 1e-05 * abs(b)
+
+
+class Units(object):
+	"""
+	A group of unit symbols, along with their dimensions and scale relative to the SI base units.
+
+	Instances are cached by symbol string, so each distinct string is only parsed once.
+	"""
+
+	__slots__ = ['symbols', 'dimensions', 'dimensionality', 'scale', 'multiplier', 'original_scale']
+
+	# Symbol string to Units.
+	_cache = {}
+	# Dimensions, so that equal dimensions are usually also identical.
+	_dimensions = {}
+
+	@classmethod
+	def get(cls, symbols):
+		"""
+		The (possibly cached) units for the symbol string.
+		"""
+
+		try:
+			return cls._cache[symbols]
+		except KeyError:
+			pass
+
+		result = cls._cache[symbols] = cls(symbols)
+
+		return result
+
+	@classmethod
+	def clear_cache(cls):
+		"""
+		Forget all parsed units, such as after changing SIValues.
+		"""
+
+		cls._cache.clear()
+		cls._dimensions.clear()
+
+	def __init__(self, symbols):
+		# Remove unit prefixes.
+		new_units, multiplier = Quantity.parse_units(symbols)
+
+		# Normalize to SI base units.
+		simplified = pq.Quantity(1.0, new_units).simplified
+		factor = float(simplified.magnitude)
+
+		self.symbols = symbols
+		self.dimensionality = simplified.dimensionality
+
+		dimensions = frozenset(self.dimensionality.items())
+		self.dimensions = self._dimensions.setdefault(dimensions, dimensions)
+
+		# Factor from a value in these units to a value in the base units.
+		self.scale = (10 ** multiplier) * factor
+
+		# Information to restore original representation.
+		if factor == 1:
+			self.multiplier = multiplier
+		else:
+			self.multiplier = multiplier + log10(abs(factor))
+		self.original_scale = 10 ** self.multiplier
+
+
 class Quantity(object):
 	"""
 	A quantity with a value and dimensions.
+
+	The value is kept as a float in the SI base units, so arithmetic does not need to deal with the units at all.
 	"""
 
+	__slots__ = ['_value', '_units']
+
 	@staticmethod
 	def parse_units(string):
 		"""
@@ -138,27 +211,42 @@ class Quantity(object):
 		if isinstance(value, basestring):
 			value, units = self.from_string(value)
 
+		self._units = Units.get(units)
 		# Always work with single floats.
-		value = float(value)
+		self._value = float(value) * self._units.scale
 
-		log.debug('Creating Quantity: {0}, {1}'.format(value, units))
+	def _derive(self, value):
+		"""
+		A new quantity with the same units.
+		"""
 
-		# Remove unit prefixes.
-		new_units, multiplier = self.parse_units(units)
-		new_value = value * (10 ** multiplier)
+		result = Quantity.__new__(Quantity)
+		result._value = value
+		result._units = self._units
 
-		# Normalize to SI base units.
-		original_quantity = pq.Quantity(new_value, new_units)
-		self._q = original_quantity.simplified
+		return result
 
-		# Information to restore original representation.
-		self.original_units = units
-		self.original_multiplier = multiplier
+	def _other_value(self, other):
+		"""
+		The value of another quantity, which must have matching dimensions.
+		"""
+
+		try:
+			dimensions = other.dimensions
+		except AttributeError:
+			raise TypeError('Expected dimensions for "{0!r}"'.format(other))
+
+		self.assert_dimensions(dimensions)
 
-		# Find the normalization factor.
-		q, orig = self._q.magnitude, original_quantity.magnitude
-		if q != orig:
-			self.original_multiplier += log10(abs(q)) - log10(abs(orig))
+		return other.value
+
+	@property
+	def original_units(self):
+		return self._units.symbols
+
+	@property
+	def original_multiplier(self):
+		return self._units.multiplier
 
 	@property
 	def dimensions(self):
@@ -166,15 +254,15 @@ class Quantity(object):
 		The set of simplified units and their exponents.
 		"""
 
-		return set(self._q.dimensionality.items())
-	
+		return self._units.dimensions
+
 	@property
 	def dimensions_string(self):
 		"""
 		Returns the simplified units and their exponents in string form.
 		"""
-		
-		return self._q.dimensionality
+
+		return self._units.dimensionality
 
 	@property
 	def value(self):
@@ -182,9 +270,7 @@ class Quantity(object):
 		The magnitude of the quantity, normalized to the base units.
 		"""
 
-		result = self._q.magnitude
-
-		return result.tolist()
+		return self._value
 
 	@property
 	def original_value(self):
@@ -192,7 +278,7 @@ class Quantity(object):
 		The magnitude of the quantity that matches the units.
 		"""
 
-		return self._q.magnitude / (10 ** self.original_multiplier)
+		return self._value / self._units.original_scale
 
 	def assert_dimensions(self, other, exception=True):
 		"""
@@ -203,34 +289,26 @@ class Quantity(object):
 
 		if isinstance(other, basestring):
 			# Given a units string.
-			other = Quantity(1, other).dimensions
+			other = Units.get(other).dimensions
 		elif isinstance(other, Quantity):
 			# Given a Quantity.
 			other = other.dimensions
 
-		if self.dimensions == other:
+		dimensions = self._units.dimensions
+
+		if dimensions is other or dimensions == other:
 			return True
 		elif exception:
-			raise IncompatibleDimensions(self.dimensions, other)
+			raise IncompatibleDimensions(set(dimensions), set(other))
 		else:
 			return False
 
 	# FIXME: Python 2.7 provides functools.total_ordering()
 	def __eq__(self, other):
-		try:
-			self.assert_dimensions(other.dimensions)
-		except AttributeError:
-			raise TypeError('Expected dimensions for "{0!r}"'.format(other))
-
-		return allclose(self.value, other.value)
+		return close(self._value, self._other_value(other))
 
 	def __lt__(self, other):
-		try:
-			self.assert_dimensions(other.dimensions)
-		except AttributeError:
-			raise TypeError('Expected dimensions for "{0!r}"'.format(other))
-
-		return self.value < other.value
+		return self._value < self._other_value(other)
 
 	def __ne__(self, other):
 		return not self == other
@@ -245,8 +323,8 @@ class Quantity(object):
 		return not self <= other
 
 	def __abs__(self):
-		if self.value < 0:
-			return Quantity(abs(self.original_value), self.original_units)
+		if self._value < 0:
+			return self._derive(-self._value)
 		else:
 			return self
 
@@ -255,40 +333,21 @@ class Quantity(object):
 		Addition with matching dimensions.
 		"""
 
-		try:
-			self.assert_dimensions(other.dimensions)
-		except AttributeError:
-			raise TypeError('Expected dimensions for "{0!r}"'.format(other))
-
-		result = deepcopy(self)
-		result._q += other._q
-
-		return result
+		return self._derive(self._value + self._other_value(other))
 
 	def __sub__(self, other):
 		"""
 		Subtraction with matching dimensions.
 		"""
 
-		try:
-			self.assert_dimensions(other.dimensions)
-		except AttributeError:
-			raise TypeError('Expected dimensions for "{0!r}"'.format(other))
-
-		result = deepcopy(self)
-		result._q -= other._q
-
-		return result
+		return self._derive(self._value - self._other_value(other))
 
 	def __mul__(self, other):
 		"""
 		Multiplication by reals.
 		"""
 
-		result = deepcopy(self)
-		result._q *= other
-
-		return result
+		return self._derive(float(self._value * other))
 
 	def __rmul__(self, other):
 		return self * other
@@ -298,10 +357,7 @@ class Quantity(object):
 		Division by reals.
 		"""
 
-		result = deepcopy(self)
-		result._q /= other
-
-		return result
+		return self._derive(float(self._value / other))
 
 	def __repr__(self):
 		return '{0}(\'{1}\')'.format(self.__class__.__name__, str(self))
@@ -317,4 +373,17 @@ class Quantity(object):
 		Rather than copying anything, simply create a new instance.
 		"""
 
-		return Quantity(str(self))
+		return self._derive(self._value)
+
+	def __getstate__(self):
+		return (self._value, self._units.symbols)
+
+	def __setstate__(self, state):
+		if isinstance(state, dict):
+			# Pickled when the value was held in a pq.Quantity.
+			value, symbols = float(state['_q'].magnitude), state['original_units']
+		else:
+			value, symbols = state
+
+		self._value = value
+		self._units = Units.get(symbols)
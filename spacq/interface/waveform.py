@@ -2,7 +2,7 @@ import logging
 log = logging.getLogger(__name__)
 
 from collections import namedtuple
-from numpy import append, array, interp, linspace
+from numpy import around, array, concatenate, full, interp, linspace, zeros
 
 """
 A waveform generator.
@@ -29,12 +29,32 @@ class Generator(object):
 		# If True, do not generate a waveform. Useful for verifying the generating code.
 		self.dry_run = dry_run
 
-		# The resulting wave, with each data point on the interval [-1.0, 1.0].
-		self._wave = array([])
+		# The resulting wave, with each data point on the interval [-1.0, 1.0], as a list of segments which are
+		# only joined once the waveform is requested.
+		self._segments = []
+		self.wave_length = 0
+		self._last_value = 0.0
 
-		# The resulting marker channels, with each channel being a sparse list represented as a dictionary.
+		# The resulting marker channels, with each channel being a run-length encoded list of (position, value)
+		# pairs, in order of position.
 		self._markers = {}
 
+	@property
+	def _wave(self):
+		"""
+		The wave data generated so far.
+		"""
+
+		if len(self._segments) != 1:
+			if self._segments:
+				wave = concatenate(self._segments)
+			else:
+				wave = zeros(0)
+
+			self._segments = [wave]
+
+		return self._segments[0]
+
 	@property
 	def waveform(self):
 		"""
@@ -42,13 +62,13 @@ class Generator(object):
 		"""
 
 		try:
-			last_marker_point = max(pos for data in self._markers.values() for pos in data.keys())
+			last_marker_point = max(data[-1][0] for data in self._markers.values())
 		except ValueError:
 			last_marker_point = -1
 
-		extra_points = last_marker_point + 1 - len(self._wave)
+		extra_points = last_marker_point + 1 - self.wave_length
 		if extra_points > 0:
-			resulting_wave = append(self._wave, [0.0] * extra_points)
+			resulting_wave = concatenate([self._wave, zeros(extra_points)])
 		else:
 			resulting_wave = self._wave
 
@@ -65,30 +85,23 @@ class Generator(object):
 	def append(self, values):
 		self.length += len(values)
 
-		if not self.dry_run:
-			self._wave = append(self._wave, values)
+		if not self.dry_run and len(values) > 0:
+			values = array(values, dtype=float)
+
+			self._segments.append(values)
+			self.wave_length += len(values)
+			self._last_value = values[-1]
 
 	def _get_marker(self, num, length):
 		"""
 		Get the marker values for all data points in the waveform.
 		"""
 
-		result = []
+		result = zeros(length, dtype=bool)
 
-		def last_value():
-			try:
-				return result[-1]
-			except IndexError:
-				return False
-
-		for idx, value in sorted(self._markers[num].items()):
-			if idx >= len(result):
-				result.extend([last_value()] * (idx - len(result) + 1))
-
-			result[idx] = value
-
-		if len(result) < length:
-			result.extend([last_value()] * (length - len(result)))
+		runs = self._markers[num]
+		for (idx, value), (next_idx, _) in zip(runs, runs[1:] + [(length, None)]):
+			result[idx:next_idx] = value
 
 		return result
 
@@ -97,9 +110,11 @@ class Generator(object):
 		Convert a time value to a number of samples based on the frequency.
 		"""
 
-		log.debug('Parsing time "{0!r}" with frequency {1!r}'.format(value, self.frequency))
 		result = int(value.value * self.frequency.value)
-		log.debug('Parsed time "{0!r}" as {1} samples'.format(value, result))
+
+		# Formatting quantities is comparatively slow, and this is called for every delay.
+		if log.isEnabledFor(logging.DEBUG):
+			log.debug('Parsed time "{0!r}" with frequency {1!r} as {2} samples'.format(value, self.frequency, result))
 
 		return result
 
@@ -110,27 +125,36 @@ class Generator(object):
 		Due to the discrete nature of these waveforms, interpolation is used when changing duration.
 		"""
 
-		if not data:
+		if duration is not None:
+			duration = self._parse_time(duration)
+
+		return self._resample(data, amplitude, duration)
+
+	def _resample(self, data, amplitude=None, num_points=None):
+		"""
+		As _scale_waveform, but with the duration given as a number of points.
+		"""
+
+		if len(data) == 0:
 			return data
 
-		new_data = data[:]
+		new_data = array(data, dtype=float)
 
 		# Change amplitude.
 		if amplitude is not None:
-			new_data = [amplitude * x for x in new_data]
+			new_data *= amplitude
 
 		# Change duration.
-		if duration is not None:
-			duration = self._parse_time(duration)
+		if num_points is not None:
 			actual_duration = len(new_data)
 
-			points = linspace(0, 1, duration)
+			points = linspace(0, 1, num_points)
 			actual_points = linspace(0, 1, actual_duration)
 
 			new_data = interp(points, actual_points, new_data)
-			new_data = [round(x, 5) for x in new_data]
+			new_data = around(new_data, 5)
 
-		return new_data
+		return new_data.tolist()
 
 	def set_next(self, value):
 		"""
@@ -145,29 +169,37 @@ class Generator(object):
 		Extend the last value of the waveform to last the length of the delay.
 		"""
 
-		delay_length = self._parse_time(value) - less_points
+		self.delay_points(self._parse_time(value) - less_points)
 
-		self.check_length(delay_length)
+	def delay_points(self, num_points):
+		"""
+		Extend the last value of the waveform by a number of points.
+		"""
 
-		try:
-			last_value = self._wave[-1]
-		except IndexError:
-			last_value = 0.0
+		self.check_length(num_points)
 
-		self.append([last_value] * delay_length)
+		if num_points > 0:
+			self.append(full(num_points, self._last_value))
+
+	def pad(self, num_points):
+		"""
+		Extend the waveform with zeros.
+		"""
+
+		self.append(zeros(num_points))
 
 	def square(self, amplitude, length):
 		"""
 		Generate a square pulse.
 		"""
 
-		try:
-			return_to = self._wave[-1]
-		except IndexError:
-			return_to = 0.0
+		self.square_points(amplitude, self._parse_time(length))
+
+	def square_points(self, amplitude, num_points):
+		return_to = self._last_value
 
 		self.set_next(amplitude)
-		self.delay(length, less_points=1)
+		self.delay_points(num_points - 1)
 		self.set_next(return_to)
 
 	def pulse(self, values, amplitude, duration):
@@ -175,7 +207,10 @@ class Generator(object):
 		Literal amplitude values.
 		"""
 
-		data = self._scale_waveform(values, amplitude, duration)
+		self.pulse_points(values, amplitude, self._parse_time(duration) if duration is not None else None)
+
+	def pulse_points(self, values, amplitude, num_points):
+		data = self._resample(values, amplitude, num_points)
 
 		self.check_length(len(data))
 		self.append(data)
@@ -188,7 +223,89 @@ class Generator(object):
 		if self.dry_run:
 			return
 
-		if num not in self._markers:
-			self._markers[num] = {}
+		runs = self._markers.setdefault(num, [])
 
-		self._markers[num][len(self._wave)] = value
+		# A later value at the same position replaces the earlier one.
+		if runs and runs[-1][0] == self.wave_length:
+			runs.pop()
+
+		runs.append((self.wave_length, value))
+
+	def replay(self, segments, cache=None):
+		"""
+		Generate the waveform from segments recorded by a SegmentRecorder.
+
+		If a cache dictionary is given, resampled pulse shapes are looked up in and added to it.
+		"""
+
+		for segment in segments:
+			kind, args = segment[0], segment[1:]
+
+			if kind == 'pulse' and cache is not None:
+				try:
+					data = cache[segment]
+				except KeyError:
+					data = cache[segment] = self._resample(*args)
+
+				self.check_length(len(data))
+				self.append(data)
+			else:
+				getattr(self, self.replay_methods[kind])(*args)
+
+	replay_methods = {
+		'set_next': 'set_next',
+		'delay': 'delay_points',
+		'pad': 'pad',
+		'square': 'square_points',
+		'pulse': 'pulse_points',
+		'values': 'append',
+		'marker': 'marker',
+	}
+
+
+class SegmentRecorder(Generator):
+	"""
+	A generator which only records the segments that make up a waveform, with all times converted to numbers of
+	points, so that they can be compared and rendered later by Generator.replay.
+
+	The length is still tracked, so that timing and length checks behave as for a real generator.
+	"""
+
+	def __init__(self, frequency):
+		Generator.__init__(self, frequency, dry_run=True)
+
+		self.segments = []
+
+	def _add(self, num_points, *segment):
+		self.check_length(num_points)
+		self.length += max(num_points, 0)
+
+		self.segments.append(segment)
+
+	def append(self, values):
+		self._add(len(values), 'values', tuple(values))
+
+	def set_next(self, value):
+		self._add(1, 'set_next', value)
+
+	def delay_points(self, num_points):
+		self._add(num_points, 'delay', num_points)
+
+	def pad(self, num_points):
+		self._add(num_points, 'pad', num_points)
+
+	def square_points(self, amplitude, num_points):
+		self._add(2 + max(num_points - 1, 0), 'square', amplitude, num_points)
+
+	def pulse_points(self, values, amplitude, num_points):
+		if len(values) == 0:
+			length = 0
+		elif num_points is not None:
+			length = num_points
+		else:
+			length = len(values)
+
+		self._add(length, 'pulse', tuple(values), amplitude, num_points)
+
+	def marker(self, num, value):
+		self.segments.append(('marker', num, value))
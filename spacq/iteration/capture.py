@@ -0,0 +1,362 @@
+import logging
+log = logging.getLogger(__name__)
+
+import os
+from time import localtime
+
+from spacq.interface.pulse.parser import PulseError
+from spacq.interface.units import IncompatibleDimensions
+from spacq.tool.box import flatten, sift
+
+from .export import exporters
+from .sweep import PulseConfiguration, SweepController
+from .variables import sort_output_variables, sort_condition_variables, InputVariable, OutputVariable, ConditionVariable
+
+"""
+Preparation of sweeps for data capture, independently of any user interface.
+
+Variables are matched up with their resources and checked, so that the sweep can be handed to a SweepController,
+and the results can be exported.
+"""
+
+
+class CaptureError(ValueError):
+	"""
+	The sweep cannot be started.
+	"""
+
+	def __init__(self, problems):
+		"""
+		problems: A list of (title, message).
+		"""
+
+		ValueError.__init__(self, '; '.join('{0}: {1}'.format(title, msg) for title, msg in problems))
+
+		self.problems = problems
+
+
+def export_name(extension):
+	"""
+	A file name based on the current time: YYYY-MM-DD_HH-MM-SS.ext
+	"""
+
+	return '{0:04}-{1:02}-{2:02}_{3:02}-{4:02}-{5:02}.{6}'.format(*(localtime()[:6] + (extension,)))
+
+
+class Capture(object):
+	"""
+	A sweep which has been checked and is ready to run.
+	"""
+
+	def __init__(self, output_variables, num_items, input_variables, condition_variables, resources,
+			measurement_resources, measurement_units, condition_resources, settle_resources, pulse_config,
+			continuous=False):
+		self.output_variables = output_variables
+		self.num_items = num_items
+		self.input_variables = input_variables
+		self.condition_variables = condition_variables
+		self.resources = resources
+		self.measurement_resources = measurement_resources
+		self.measurement_units = measurement_units
+		self.condition_resources = condition_resources
+		self.settle_resources = settle_resources
+		self.pulse_config = pulse_config
+		self.continuous = continuous
+
+	@property
+	def measurement_resource_names(self):
+		return [var.resource_name for var in self.input_variables]
+
+	@property
+	def controller_args(self):
+		"""
+		The positional arguments for SweepController.
+		"""
+
+		return (self.resources, self.output_variables, self.num_items, self.measurement_resources,
+				self.input_variables, self.condition_resources, self.condition_variables, self.pulse_config)
+
+	@property
+	def controller_kwargs(self):
+		return {
+			'continuous': self.continuous,
+			'settle_resources': self.settle_resources,
+		}
+
+	def create_controller(self, cls=SweepController):
+		return cls(*self.controller_args, **self.controller_kwargs)
+
+	@property
+	def headings(self):
+		"""
+		The (name, units) headings of the exported columns.
+		"""
+
+		return ([('Time', 's')] +
+				[(var.name, var.units) for var in flatten(self.output_variables)] +
+				[(var.name, units) for var, units in zip(self.input_variables, self.measurement_units)] +
+				([('Settle time', 's')] if self.settle_resources else []))
+
+	@property
+	def column_shapes(self):
+		"""
+		The shapes of the values in the exported columns, where known ahead of time.
+
+		Measurements may be lists (such as waveforms), so their shapes are only known once they have been read.
+		"""
+
+		return ([()] +
+				[() for _ in flatten(self.output_variables)] +
+				[None for _ in self.input_variables] +
+				([()] if self.settle_resources else []))
+
+	def export_row(self, cur_time, values, measurement_values, settle_time=None):
+		"""
+		The exported row for the values passed to a data callback.
+		"""
+
+		return ([cur_time] + list(values) + list(measurement_values) +
+				([settle_time] if self.settle_resources else []))
+
+	def open_exporter(self, dir, format='CSV'):
+		"""
+		Create an exporter for a new file in the given directory.
+		"""
+
+		try:
+			exporter_class = exporters[format]
+		except KeyError:
+			raise CaptureError([('Export format', 'Unknown format: {0}'.format(format))])
+
+		if not dir:
+			raise CaptureError([('Export path', 'No directory selected.')])
+
+		if not os.path.isdir(dir):
+			raise CaptureError([('Export path', 'Invalid directory selected')])
+
+		file_path = os.path.join(dir, export_name(exporter_class.extension))
+		if os.path.exists(file_path):
+			raise CaptureError([('File exists', file_path)])
+
+		return exporter_class(file_path, self.headings, self.column_shapes)
+
+
+def check_conditions(condition_variables, condition_resources):
+	"""
+	Check that all the condition arguments are compatible with one another.
+
+	The current values of the resources are read to do so.
+	"""
+
+	for cvar in flatten(condition_variables):
+		for cond in cvar.conditions:
+			value1 = cond.arg1
+			value2 = cond.arg2
+			resource1 = None
+			resource2 = None
+
+			# If working with resources, use their values as the values.
+			if cond.type1 == 'resource name':
+				resource1 = [resource for (name, resource) in flatten(condition_resources) if name == cond.arg1][0]
+				value1 = resource1.value
+			if cond.type2 == 'resource name':
+				resource2 = [resource for (name, resource) in flatten(condition_resources) if name == cond.arg2][0]
+				value2 = resource2.value
+
+			# Check if the other argument is in the allowed values.
+			if getattr(resource1, 'allowed_values', None) is not None:
+				if value2 not in resource1.allowed_values:
+					raise CaptureError([('Condition error', 'In the condition {0}, {1} is not in allowed_values '
+							'of {2}.'.format(cond, value2, cond.arg1))])
+			if getattr(resource2, 'allowed_values', None) is not None:
+				if value1 not in resource2.allowed_values:
+					raise CaptureError([('Condition error', 'In the condition {0}, {1} is not in allowed_values '
+							'of {2}.'.format(cond, value1, cond.arg2))])
+
+			# Check if units agree.
+			for resource, value, other in [(resource1, value1, value2), (resource2, value2, value1)]:
+				if resource is not None and resource.units is not None:
+					try:
+						value.assert_dimensions(other)
+					except ValueError:
+						raise CaptureError([('Condition error', 'In the condition {0}, {1} does not have a '
+								'dimension.'.format(cond, other))])
+					except IncompatibleDimensions:
+						raise CaptureError([('Condition error', 'In the condition {0}, {1} and {2} do not have '
+								'matching dimensions.'.format(cond, value1, value2))])
+
+
+def prepare(variables, resources, devices, pulse_program=None, continuous=False):
+	"""
+	Match up the enabled variables with their resources, and check that the sweep can be run.
+
+	variables: All the variables, enabled or not.
+	resources: Resources by name.
+	devices: DeviceConfig objects by name, for the pulse program.
+	pulse_program: A Program (with resources), or None.
+
+	Returns a Capture, or raises CaptureError listing everything that is wrong. A PulseError is raised as-is.
+	"""
+
+	all_variables = [var for var in variables if var.enabled]
+	output_variables = sift(all_variables, OutputVariable)
+	input_variables = [var for var in sift(all_variables, InputVariable) if var.resource_name != '']
+	condition_variables = sift(all_variables, ConditionVariable)
+
+	if not output_variables:
+		output_variables.append(OutputVariable(order=0, name='<Dummy>', enabled=True))
+
+	output_variables, num_items = sort_output_variables(output_variables)
+	condition_variables = sort_condition_variables(condition_variables)
+
+	resource_names = [tuple(var.resource_name for var in group) for group in output_variables]
+	measurement_resource_names = [var.resource_name for var in input_variables]
+	condition_resource_names = [tuple(set(flatten([var.resource_names for var in group])))
+			for group in condition_variables]
+
+	missing_resources = set()
+	unreadable_resources = set()
+	unwritable_resources = set()
+	missing_devices = set()
+
+	pulse_config = None
+	if pulse_program is not None:
+		try:
+			pulse_program.generate_waveforms(dry_run=True)
+		except PulseError:
+			raise
+		except Exception as e:
+			raise CaptureError([('Pulse program error', str(e))])
+
+		pulse_awg, pulse_oscilloscope = None, None
+		pulse_channels = {}
+
+		try:
+			pulse_awg = devices[pulse_program.awg].device
+			if pulse_awg is None:
+				raise KeyError
+		except KeyError:
+			missing_devices.add(pulse_program.awg)
+		else:
+			# Gather used channel numbers.
+			pulse_channels = dict((k, v) for k, v in pulse_program.output_channels.items() if v is not None)
+
+			actual_channels = range(1, len(pulse_awg.channels))
+			invalid_channels = [k for k, v in pulse_channels.items() if v not in actual_channels]
+
+			if invalid_channels:
+				raise CaptureError([('Invalid channels', 'Invalid channels for: {0}'.format(
+						', '.join(invalid_channels)))])
+
+		try:
+			pulse_oscilloscope = devices[pulse_program.oscilloscope].device
+			if pulse_oscilloscope is None:
+				raise KeyError
+		except KeyError:
+			missing_devices.add(pulse_program.oscilloscope)
+
+		if not missing_devices:
+			try:
+				pulse_config = PulseConfiguration(pulse_program, pulse_channels, pulse_awg, pulse_oscilloscope)
+			except TypeError as e:
+				raise CaptureError([('Device configuration error', str(e))])
+
+	group_resources_list = []
+	for group in resource_names:
+		group_resources = []
+
+		for name in group:
+			if name == '':
+				group_resources.append((str(len(group_resources_list)), None))
+			elif name not in resources:
+				missing_resources.add(name)
+			else:
+				resource = resources[name]
+
+				if resource.writable:
+					group_resources.append((name, resource))
+				else:
+					unwritable_resources.add(name)
+
+		group_resources_list.append(tuple(group_resources))
+
+	measurement_resources = []
+	measurement_units = []
+	for name in measurement_resource_names:
+		if name not in resources:
+			missing_resources.add(name)
+		else:
+			resource = resources[name]
+
+			if resource.readable:
+				measurement_resources.append((name, resource))
+				measurement_units.append(resource.display_units)
+			else:
+				unreadable_resources.add(name)
+
+	condition_resources = []
+	for group in condition_resource_names:
+		group_resources = []
+
+		for name in group:
+			if name not in resources:
+				missing_resources.add(name)
+			else:
+				resource = resources[name]
+
+				if resource.readable:
+					group_resources.append((name, resource))
+				else:
+					unreadable_resources.add(name)
+
+		condition_resources.append(tuple(group_resources))
+
+	settle_resources = {}
+	for name in set(var.settle_resource_name for var in flatten(output_variables)):
+		if name == '':
+			continue
+		elif name not in resources:
+			missing_resources.add(name)
+		else:
+			resource = resources[name]
+
+			if resource.readable:
+				settle_resources[name] = resource
+			else:
+				unreadable_resources.add(name)
+
+	mismatched_resources = []
+	for (res_name, resource), var in zip(flatten(group_resources_list), flatten(output_variables)):
+		if resource is None:
+			continue
+
+		if resource.units is not None:
+			if not (var.type == 'quantity' and
+					resource.verify_dimensions(var.units, exception=False, from_string=True)):
+				mismatched_resources.append((res_name, var.name))
+		else:
+			if var.type not in ['float', 'integer']:
+				mismatched_resources.append((res_name, var.name))
+
+	problems = []
+	for items, msg in [
+		(missing_resources, 'Missing resources'),
+		(unreadable_resources, 'Unreadable resources'),
+		(unwritable_resources, 'Unwritable resources'),
+		(missing_devices, 'Missing devices')]:
+
+		if items:
+			problems.append((msg, ', '.join('"{0}"'.format(x) for x in sorted(items))))
+
+	if mismatched_resources:
+		problems.append(('Mismatched resources', ', '.join('Mismatched resource type for resource name {0} with '
+				'variable name {1}'.format(x[0], x[1]) for x in mismatched_resources)))
+
+	if problems:
+		raise CaptureError(problems)
+
+	check_conditions(condition_variables, condition_resources)
+
+	return Capture(output_variables, num_items, input_variables, condition_variables, group_resources_list,
+			measurement_resources, measurement_units, condition_resources, settle_resources, pulse_config,
+			continuous)
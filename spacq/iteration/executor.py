@@ -0,0 +1,62 @@
+import logging
+log = logging.getLogger(__name__)
+
+from spacq.tool.executor import wait_all, DeviceExecutor, Future, FutureCancelled, FutureTimeout, StageTiming
+
+"""
+Long-lived workers for fanning out resource accesses during a sweep.
+
+The workers themselves are in spacq.tool.executor, and are also available from here.
+"""
+
+
+def resource_owner(resource):
+	"""
+	Find the object on which the resource operates, if any.
+	"""
+
+	obj = resource.obj
+
+	if obj is None:
+		for accessor in [resource.getter, resource.setter]:
+			obj = getattr(accessor, '__self__', None)
+
+			if obj is not None:
+				break
+
+	return obj
+
+
+def device_key(resource):
+	"""
+	Find the object whose calls must be serialized for the given resource.
+
+	Subdevices share the lock of their parent device, so the lock is used when available. Resources which are not
+	attached to any device are their own key.
+	"""
+
+	obj = resource_owner(resource)
+
+	if obj is None:
+		return resource
+
+	lock = getattr(obj, 'lock', None)
+	if lock is not None:
+		return lock
+	else:
+		return obj
+
+
+def find_device(resource):
+	"""
+	Find the device which ultimately receives the commands for the given resource, if any.
+
+	Subdevices are followed up to their parent device.
+	"""
+
+	obj = resource_owner(resource)
+
+	while obj is not None and not hasattr(obj, 'transaction'):
+		obj = getattr(obj, 'device', None)
+
+	return obj
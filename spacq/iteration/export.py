@@ -0,0 +1,301 @@
+import logging
+log = logging.getLogger(__name__)
+
+import csv
+import json
+import numpy
+import os
+from threading import Lock
+
+"""
+Exporters for sweep data.
+
+Every exporter is created with a list of (name, units) headings, one per column, and is then given rows of the
+form [time, output values..., measurement values...]. The shape of the values in each column may also be given,
+where it is known ahead of time: () for scalars, or None if unknown.
+"""
+
+
+def plain_value(x):
+	"""
+	Extract values out of quantities, since the units are already known from the headings.
+	"""
+
+	return x.original_value if hasattr(x, 'original_value') else x
+
+
+def csv_value(x):
+	"""
+	Arrays (such as waveforms) are written out as lists of tuples, so that they can be read back as list columns.
+	"""
+
+	x = plain_value(x)
+
+	if isinstance(x, numpy.ndarray):
+		if x.ndim == 2:
+			return str([tuple(row) for row in x.tolist()])
+		else:
+			return str(x.tolist())
+
+	return x
+
+
+def format_heading(name, units):
+	if units is not None:
+		return '{0} ({1})'.format(name, units)
+	else:
+		return name
+
+
+class Exporter(object):
+	"""
+	Buffer rows and write them out a chunk at a time.
+	"""
+
+	# Number of rows to buffer before writing.
+	chunk_size = 10
+
+	def __init__(self, path, headings, shapes=None):
+		self.path = path
+		self.headings = headings
+
+		if shapes is None:
+			shapes = [None] * len(headings)
+		self.shapes = list(shapes)
+
+		self.buf = []
+		self.buf_lock = Lock()
+
+		self.closed = False
+
+	def _write_chunk(self, rows):
+		raise NotImplementedError()
+
+	def _close(self):
+		pass
+
+	def add_row(self, row):
+		with self.buf_lock:
+			self.buf.append(row)
+
+			if len(self.buf) >= self.chunk_size:
+				self._flush()
+
+	def _flush(self):
+		if self.buf:
+			self._write_chunk(self.buf)
+			self.buf = []
+
+	def flush(self):
+		with self.buf_lock:
+			self._flush()
+
+	def close(self):
+		with self.buf_lock:
+			if self.closed:
+				return
+
+			self._flush()
+			self._close()
+
+			self.closed = True
+
+
+class CSVExporter(Exporter):
+	"""
+	Plain CSV with a header row.
+	"""
+
+	extension = 'csv'
+
+	def __init__(self, *args, **kwargs):
+		Exporter.__init__(self, *args, **kwargs)
+
+		self.file = open(self.path, 'w')
+		self.writer = csv.writer(self.file)
+
+		self.writer.writerow([format_heading(name, units) for name, units in self.headings])
+
+	def _write_chunk(self, rows):
+		self.writer.writerows([[csv_value(x) for x in row] for row in rows])
+		self.file.flush()
+
+	def _close(self):
+		self.file.close()
+
+
+class BinaryExporter(Exporter):
+	"""
+	Append-only binary file with one fixed-size record per row.
+
+	The file starts with a line of the form "SPACQ-BINARY <version> <header length>", followed by a JSON header
+	describing the columns (name, units, shape) and then the little-endian float64 records. Scalars take up one
+	value; lists (such as waveforms) take up a fixed-width block whose shape is set by the first value seen.
+
+	The header is written as soon as the shape of every column is known: when the file is opened, if all the shapes
+	are given. Until then, rows are held back for up to one chunk, so that a column whose first values are missing
+	is not fixed as a scalar column too early; any column still without a value after that is a scalar column.
+
+	Only whole records are ever counted when loading, so a file cut off mid-write is still readable.
+	"""
+
+	extension = 'bin'
+	version = 1
+
+	chunk_size = 100
+
+	def __init__(self, *args, **kwargs):
+		Exporter.__init__(self, *args, **kwargs)
+
+		self.file = open(self.path, 'wb')
+		self.dtype = None
+
+		if None not in self.shapes:
+			self._start()
+
+	def _find_shapes(self, row):
+		"""
+		Fix the shapes of any unknown columns which have a value in the row.
+		"""
+
+		for i, value in enumerate(row):
+			if self.shapes[i] is not None or value is None:
+				continue
+
+			try:
+				self.shapes[i] = numpy.shape(numpy.asarray(plain_value(value), dtype=float))
+			except (TypeError, ValueError):
+				# Not storable anyway.
+				self.shapes[i] = ()
+
+	def _start(self):
+		"""
+		Write the header, giving up on any shapes which are still unknown.
+		"""
+
+		self.shapes = [() if shape is None else shape for shape in self.shapes]
+
+		header = json.dumps({
+			'columns': [{'name': name, 'units': units, 'shape': shape}
+					for (name, units), shape in zip(self.headings, self.shapes)],
+		})
+
+		# Keep the records aligned.
+		first_line = 'SPACQ-BINARY {0} '.format(self.version)
+		length = len(header)
+		while (len(first_line) + len(str(length)) + 1 + length) % 8 != 0:
+			length += 1
+		header = header.ljust(length)
+
+		self.file.write('{0}{1}\n{2}'.format(first_line, length, header))
+		self.file.flush()
+
+		self.dtype = numpy.dtype([('c{0}'.format(i), '<f8', shape) for i, shape in enumerate(self.shapes)])
+
+	def add_row(self, row):
+		with self.buf_lock:
+			if self.dtype is None:
+				self._find_shapes(row)
+
+				if None not in self.shapes:
+					self._start()
+
+		Exporter.add_row(self, row)
+
+	def _write_chunk(self, rows):
+		if self.dtype is None:
+			# A whole chunk has been held back.
+			self._start()
+
+		records = numpy.empty(len(rows), dtype=self.dtype)
+
+		for i, name in enumerate(self.dtype.names):
+			column = records[name]
+			shape = self.dtype[name].shape
+
+			for j, row in enumerate(rows):
+				value = row[i]
+
+				if value is None:
+					column[j] = numpy.nan
+					continue
+
+				try:
+					value = numpy.asarray(plain_value(value), dtype=float)
+				except (TypeError, ValueError):
+					log.warning('Cannot store value in column "{0}": {1!r}'.format(self.headings[i][0], value))
+					column[j] = numpy.nan
+					continue
+
+				if value.shape == shape:
+					column[j] = value
+				else:
+					# Pad or truncate to the fixed width.
+					log.warning('Value of shape {0} does not fit column "{1}" of shape {2}'.format(value.shape,
+							self.headings[i][0], shape))
+
+					column[j] = numpy.nan
+
+					if value.ndim == len(shape):
+						fit = tuple(slice(0, min(a, b)) for a, b in zip(value.shape, shape))
+						column[j][fit] = value[fit]
+
+		self.file.write(records.tostring())
+		self.file.flush()
+		os.fsync(self.file.fileno())
+
+	def _close(self):
+		if self.dtype is None:
+			# No rows at all.
+			self._start()
+
+		self.file.close()
+
+
+exporters = {
+	'CSV': CSVExporter,
+	'Binary': BinaryExporter,
+}
+
+
+def load_binary(path):
+	"""
+	Load a file written by BinaryExporter.
+
+	Returns a tuple of:
+		the (name, units) headings
+		a list of memory-mapped column arrays, with one row per record
+	"""
+
+	with open(path, 'rb') as f:
+		first_line = f.readline()
+
+		try:
+			magic, version, length = first_line.split()
+			version, length = int(version), int(length)
+		except ValueError:
+			raise ValueError('Not a binary sweep file: {0}'.format(path))
+
+		if magic != 'SPACQ-BINARY':
+			raise ValueError('Not a binary sweep file: {0}'.format(path))
+
+		if version != BinaryExporter.version:
+			raise ValueError('Unsupported version: {0}'.format(version))
+
+		header = json.loads(f.read(length))
+
+	offset = len(first_line) + length
+
+	headings = [(column['name'], column['units']) for column in header['columns']]
+	dtype = numpy.dtype([('c{0}'.format(i), '<f8', tuple(column['shape']))
+			for i, column in enumerate(header['columns'])])
+
+	# Ignore any partial record at the end.
+	num_records = (os.path.getsize(path) - offset) // dtype.itemsize
+
+	if num_records > 0:
+		records = numpy.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(num_records,))
+	else:
+		records = numpy.zeros(0, dtype=dtype)
+
+	return headings, [records[name] for name in dtype.names]
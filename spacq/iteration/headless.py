@@ -0,0 +1,238 @@
+import logging
+log = logging.getLogger(__name__)
+
+import argparse
+from datetime import timedelta
+import pickle
+import sys
+from threading import Event, Thread
+from time import time
+
+from spacq.devices.config import ConnectionError
+
+from .capture import prepare, CaptureError
+from .export import exporters
+from .sweep import SweepController
+
+"""
+Run sweeps from the command line, without any GUI.
+
+The variables are loaded from a file saved by the variables panel (*.var), and the devices from files saved by
+the device configuration dialog (*.dev). Progress is printed to the terminal, and the results are exported as in
+the GUI.
+
+For example:
+	python -m spacq.iteration.headless sweep.var dm34410a.dev smf100a.dev --directory data/
+"""
+
+
+class TerminalSweepController(SweepController):
+	"""
+	A sweep controller which reports its progress on a stream.
+	"""
+
+	# Number of stages shown in the breakdown.
+	breakdown_len = 4
+
+	def __init__(self, *args, **kwargs):
+		SweepController.__init__(self, *args, **kwargs)
+
+		self.stream = sys.stdout
+		# Time in s between progress reports.
+		self.progress_interval = 5
+
+		self.errors = []
+		self.finished = Event()
+		self.threads = []
+
+		self.general_exception_handler = self._general_exception_handler
+		self.resource_exception_handler = self._resource_exception_handler
+
+	def _general_exception_handler(self, f, e):
+		log.error('Sweep error in "{0}": {1}'.format(f, e))
+
+		self.errors.append((f, e))
+
+	def _resource_exception_handler(self, resource_name, e, write=True):
+		dir = 'writing to' if write else 'reading from'
+		log.error('Error {0} resource "{1}": {2}'.format(dir, resource_name, e))
+
+		self.errors.append((resource_name, e))
+
+		self.abort(fatal=write)
+
+	def progress(self):
+		"""
+		A line describing how far along the sweep is.
+		"""
+
+		elapsed_time = time() - self.sweep_start_time
+		items_done, total_items = self.items_done, self.total_items
+		parts = ['{0}/{1}'.format(items_done, total_items)]
+
+		if total_items > 0 and self.item >= 0:
+			parts.append('{0}%'.format(int(100.0 * items_done / total_items)))
+
+		parts.append('elapsed {0}'.format(timedelta(seconds=int(elapsed_time))))
+
+		if not self.continuous:
+			remaining_time = self.remaining_time(elapsed_time)
+			if remaining_time is not None:
+				parts.append('remaining {0}'.format(timedelta(seconds=int(remaining_time))))
+
+		if self.current_f is not None:
+			parts.append(self.current_f)
+
+		breakdown = self.timings.breakdown()[:self.breakdown_len]
+		if breakdown:
+			parts.append('(' + ', '.join('{0} {1:.0%}'.format(name, fraction) for name, fraction in breakdown) + ')')
+
+		return '  '.join(parts)
+
+	def report(self):
+		while not self.finished.wait(self.progress_interval):
+			print >>self.stream, self.progress()
+			self.stream.flush()
+
+	def end(self):
+		try:
+			SweepController.end(self)
+		finally:
+			self.finished.set()
+
+	def start(self):
+		"""
+		Run the sweep in the background.
+		"""
+
+		self.threads = [Thread(target=self.report), Thread(target=self.run)]
+
+		for thr in self.threads:
+			thr.daemon = True
+			thr.start()
+
+	def join(self):
+		for thr in self.threads:
+			thr.join()
+
+
+def load_pickled(path):
+	with open(path, 'rb') as f:
+		return pickle.load(f)
+
+
+def connect_devices(device_configs):
+	"""
+	Connect to the devices, and find all their labelled resources.
+
+	Returns a tuple of:
+		the DeviceConfig objects by name
+		the resources by label
+	"""
+
+	devices, resources = {}, {}
+
+	for dev_cfg in device_configs:
+		if dev_cfg.name in devices:
+			raise ValueError('Duplicate device name: {0}'.format(dev_cfg.name))
+
+		log.info('Connecting to "{0}"'.format(dev_cfg.name))
+		dev_cfg.connect()
+
+		for path, label in dev_cfg.resource_labels.items():
+			if label in resources:
+				raise ValueError('Duplicate resource label: {0}'.format(label))
+
+			dev_cfg.resources[label] = resources[label] = dev_cfg.device.find_resource(path)
+
+		devices[dev_cfg.name] = dev_cfg
+
+	return devices, resources
+
+
+def main(args=None):
+	parser = argparse.ArgumentParser(description='Run a sweep without the GUI.')
+	parser.add_argument('variables', help='variables file (*.var)')
+	parser.add_argument('devices', nargs='*', help='device configuration files (*.dev)')
+	parser.add_argument('--directory', help='directory in which to export the data (default: no export)')
+	parser.add_argument('--format', default='CSV', choices=sorted(exporters), help='export format')
+	parser.add_argument('--continuous', action='store_true', help='sweep until interrupted')
+	parser.add_argument('--progress-interval', type=float, default=5, help='time between progress reports (s)')
+	parser.add_argument('--trace', help='file in which to write a timing trace')
+	parser.add_argument('--verbose', '-v', action='store_true')
+	args = parser.parse_args(args)
+
+	logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+	try:
+		variables = load_pickled(args.variables)
+		devices, resources = connect_devices([load_pickled(path) for path in args.devices])
+	except (IOError, pickle.UnpicklingError, ConnectionError, ValueError) as e:
+		print >>sys.stderr, 'Could not load configuration: {0}'.format(e)
+		return 1
+
+	try:
+		capture = prepare(variables, resources, devices, continuous=args.continuous)
+
+		exporter = None
+		if args.directory is not None:
+			exporter = capture.open_exporter(args.directory, args.format)
+	except CaptureError as e:
+		for title, msg in e.problems:
+			print >>sys.stderr, '{0}: {1}'.format(title, msg)
+		return 1
+
+	ctrl = capture.create_controller(TerminalSweepController)
+	ctrl.progress_interval = args.progress_interval
+	ctrl.trace_path = args.trace
+
+	def data_callback(cur_time, values, measurement_values):
+		if exporter is not None:
+			exporter.add_row(capture.export_row(cur_time, values, measurement_values, ctrl.settle_time))
+
+	def close_callback():
+		if exporter is not None:
+			exporter.close()
+
+	ctrl.data_callback = data_callback
+	ctrl.close_callback = close_callback
+
+	if exporter is not None:
+		print 'Exporting to {0}'.format(exporter.path)
+
+	ctrl.start()
+
+	try:
+		# Waiting with a timeout leaves the main thread able to receive KeyboardInterrupt.
+		while not ctrl.finished.wait(0.1):
+			pass
+	except KeyboardInterrupt:
+		if ctrl.continuous and not ctrl.last_continuous:
+			print 'Finishing the current loop; interrupt again to abort.'
+			ctrl.last_continuous = True
+
+			try:
+				while not ctrl.finished.wait(0.1):
+					pass
+			except KeyboardInterrupt:
+				pass
+
+		if not ctrl.finished.is_set():
+			print 'Aborting.'
+			ctrl.abort()
+
+			while not ctrl.finished.wait(0.1):
+				pass
+
+	ctrl.join()
+
+	print ctrl.progress()
+
+	if ctrl.errors or ctrl.aborting:
+		return 1
+
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
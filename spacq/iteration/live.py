@@ -0,0 +1,117 @@
+import logging
+log = logging.getLogger(__name__)
+
+from collections import deque, OrderedDict
+import numpy
+from time import time
+
+"""
+Passing live data from the sweep thread to a display, in batches.
+
+The sweep thread only ever appends, and never waits for the display. The display drains whatever has arrived at
+its own frame rate, and gets all the values for each name at once.
+"""
+
+
+class Block(object):
+	"""
+	Consecutive values for one name.
+	"""
+
+	def __init__(self, times, values, units=None):
+		"""
+		times: Array of the times (in s since the epoch) at which the values arrived.
+		values: Array of the values, along the first axis; quantities are given in their original units.
+		units: The original units of the values, if they are quantities.
+		"""
+
+		self.times = times
+		self.values = values
+		self.units = units
+
+	def __len__(self):
+		return len(self.times)
+
+	@classmethod
+	def from_values(cls, times, values):
+		units = None
+		plain_values = []
+
+		for value in values:
+			if value is None:
+				value = numpy.nan
+			else:
+				try:
+					units = value.original_units
+					value = value.original_value
+				except AttributeError:
+					pass
+
+			plain_values.append(value)
+
+		try:
+			values = numpy.array(plain_values, dtype=float)
+		except (TypeError, ValueError):
+			# Lists of differing lengths.
+			values = numpy.empty(len(plain_values), dtype=object)
+			values[:] = plain_values
+
+		return cls(numpy.array(times, dtype=float), values, units)
+
+
+class LiveDataChannel(object):
+	"""
+	A queue of (name, value) pairs which is drained in batches.
+
+	Appending and draining are safe from different threads without any locking, since deque.append and
+	deque.popleft are atomic.
+	"""
+
+	def __init__(self, maxlen=None):
+		"""
+		maxlen: The most values kept; the oldest are dropped if the display falls behind.
+		"""
+
+		self.queue = deque(maxlen=maxlen)
+
+	def __len__(self):
+		return len(self.queue)
+
+	def append(self, name, value):
+		self.queue.append((name, time(), value))
+
+	def extend(self, names, values):
+		"""
+		Append a value for each name, all with the same time.
+		"""
+
+		cur_time = time()
+
+		for name, value in zip(names, values):
+			self.queue.append((name, cur_time, value))
+
+	def drain(self):
+		"""
+		Remove everything which has arrived so far.
+
+		Returns an ordered dictionary of names to Blocks, in order of first arrival.
+		"""
+
+		items = OrderedDict()
+
+		# Only take as many as are there now, so that a fast producer cannot keep this going forever.
+		for _ in xrange(len(self.queue)):
+			try:
+				name, cur_time, value = self.queue.popleft()
+			except IndexError:
+				break
+
+			try:
+				times, values = items[name]
+			except KeyError:
+				times, values = items[name] = [], []
+
+			times.append(cur_time)
+			values.append(value)
+
+		return OrderedDict((name, Block.from_values(times, values)) for name, (times, values) in items.items())
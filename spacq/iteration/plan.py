@@ -0,0 +1,174 @@
+import logging
+log = logging.getLogger(__name__)
+
+from itertools import islice, izip
+import numpy
+
+"""
+Precomputed iteration plans for sweeps.
+"""
+
+
+class SweepPlan(object):
+	"""
+	The full sequence of points visited by a sweep, computed up front.
+
+	For every item, the plan knows the index into each group of variables, the first group which changes at that
+	item, and which orders reach the end of their period there.
+	"""
+
+	def __init__(self, variables, condition_orders=[]):
+		"""
+		variables: Output variables, as sorted and grouped by sort_output_variables.
+		condition_orders: Orders of any condition variables, which also need boundaries.
+		"""
+
+		self.variables = variables
+
+		# Typed values for each group; izip stops at the shortest variable in a group.
+		self.group_values = [list(izip(*(iter(var) for var in group))) for group in variables]
+		self.group_lengths = numpy.array([len(values) for values in self.group_values], dtype=int)
+
+		# Raw (untyped) values for each group, with one column per variable.
+		self.group_raw_values = [numpy.array([list(islice(var.raw_iter, length)) for var in group],
+				dtype=float).reshape(len(group), length).T for group, length in zip(variables, self.group_lengths)]
+		self.names = [var.name for group in variables for var in group]
+
+		if len(variables) > 0:
+			self.num_items = int(self.group_lengths.prod())
+		else:
+			self.num_items = 0
+
+		# Number of items between successive changes of each group; the last group changes fastest.
+		self.strides = numpy.ones(len(variables), dtype=int)
+		for pos in xrange(len(variables) - 2, -1, -1):
+			self.strides[pos] = self.strides[pos + 1] * self.group_lengths[pos + 1]
+
+		items = numpy.arange(self.num_items)
+
+		# Index into each group's values for every item.
+		self.indices = ((items[:, numpy.newaxis] // self.strides) % self.group_lengths).astype(numpy.int32)
+
+		# A group is written whenever it or any outer group changes, so only the first one matters.
+		changes = (items[:, numpy.newaxis] % self.strides == 0) & (self.group_lengths > 1)
+		if self.num_items > 0:
+			changes[0] = True
+			self.first_changed = changes.argmax(axis=1).astype(numpy.int32)
+		else:
+			self.first_changed = numpy.zeros(0, dtype=numpy.int32)
+
+		# The time to wait after each item is the longest wait of all the changed groups.
+		group_waits = numpy.array([max(var._wait.value for var in group) for group in variables], dtype=float)
+		suffix_waits = numpy.maximum.accumulate(group_waits[::-1])[::-1]
+		if self.num_items > 0:
+			self.dwell_times = suffix_waits[self.first_changed]
+		else:
+			self.dwell_times = numpy.zeros(0)
+		self._remaining_dwell = numpy.append(numpy.cumsum(self.dwell_times[::-1])[::-1], 0.0)
+
+		self._compute_order_periods(condition_orders)
+
+		# Whether each order has just finished a period at each item.
+		self.order_boundaries = dict((order, (items + 1) % period == 0)
+				for order, period in self.order_periods.items())
+
+	def _compute_order_periods(self, condition_orders):
+		"""
+		Compute the number of items iterated before each order changes.
+		"""
+
+		periods = []
+		orders = []
+
+		for group, length in reversed(zip(self.variables, self.group_lengths)):
+			# Constants never change.
+			if group[0].use_const:
+				continue
+
+			if not periods:
+				periods.append(length)
+			else:
+				periods.append(periods[-1] * length)
+
+			orders.append(group[0].order)
+
+		for order in condition_orders:
+			if order not in orders:
+				orders.append(order)
+				orders.sort()
+				new_index = orders.index(order)
+				if new_index > 0:
+					periods.insert(new_index, periods[new_index - 1])
+				else:
+					# The smallest order has a period of 1.
+					periods.insert(new_index, 1)
+
+		self.order_periods = dict((order, int(period)) for order, period in zip(orders, periods))
+
+	def values(self, item):
+		"""
+		The values of all the groups at the given item.
+		"""
+
+		return [values[idx] for values, idx in izip(self.group_values, self.indices[item])]
+
+	def changed_indices(self, item):
+		"""
+		The positions of the groups which must be written at the given item.
+		"""
+
+		return range(self.first_changed[item], len(self.variables))
+
+	def orders_changed(self, item):
+		"""
+		The sorted orders which finish a period at the given item.
+		"""
+
+		return sorted(order for order, boundaries in self.order_boundaries.items() if boundaries[item])
+
+	def remaining_dwell(self, item):
+		"""
+		Total dwell time (in seconds) for all the items after the given one.
+		"""
+
+		return self._remaining_dwell[item + 1]
+
+	@property
+	def total_dwell(self):
+		return self._remaining_dwell[0]
+
+	@property
+	def table(self):
+		"""
+		The raw value of every variable at every item, with one column per variable.
+		"""
+
+		if not self.names:
+			return numpy.zeros((self.num_items, 0))
+
+		return numpy.column_stack([raw_values[self.indices[:, pos]]
+				for pos, raw_values in enumerate(self.group_raw_values)])
+
+	def diff(self, other):
+		"""
+		The items at which this plan and another plan visit different values.
+		"""
+
+		if self.names != other.names:
+			raise ValueError('Plans have different variables: {0} and {1}'.format(self.names, other.names))
+
+		mine, theirs = self.table, other.table
+		length = min(len(mine), len(theirs))
+
+		different = numpy.any(mine[:length] != theirs[:length], axis=1).nonzero()[0]
+
+		return numpy.append(different, numpy.arange(length, max(len(mine), len(theirs))))
+
+	def save(self, f):
+		"""
+		Write the plan to a file (name or file object) in NumPy's npz format.
+		"""
+
+		numpy.savez(f, names=numpy.array(self.names), table=self.table, first_changed=self.first_changed,
+				dwell_times=self.dwell_times, **dict(('order_{0}'.format(order), boundaries)
+						for order, boundaries in self.order_boundaries.items()))
@@ -1,13 +1,22 @@
 import logging
 log = logging.getLogger(__name__)
 
+from collections import OrderedDict
 from functools import partial, wraps
-from itertools import izip, repeat
-from threading import Condition, Thread
+from itertools import repeat
+import numpy
+from threading import Condition
 from time import sleep, time
 
+from spacq.interface.ramp import Ramp
+from spacq.interface.units import Quantity
 from spacq.tool.box import flatten
 
+from .executor import device_key, find_device, wait_all, DeviceExecutor
+from .plan import SweepPlan
+from .timing import SweepTimings
+from .variables import AdaptiveConfig
+
 
 def update_current_f(f):
 	@wraps(f)
@@ -27,7 +36,7 @@ class PulseConfiguration(object):
 	"""
 
 	# All the directly-used attributes.
-	awg_attrs = ['channels', 'clear_channels', 'enabled', 'run_mode', 'sampling_rate', 'trigger']
+	awg_attrs = ['channels', 'clear_channels', 'enabled', 'run_mode', 'sampling_rate', 'sync_waveforms', 'trigger']
 	oscilloscope_attrs = ['acquiring', 'fastframe', 'fastframe_count', 'fastframe_sum', 'stopafter']
 
 	@staticmethod
@@ -61,11 +70,14 @@ class SweepController(object):
 	^       ^                                  |_____________^           |             |
 	|       |____________________________________________________________|             |
 	|__________________________________________________________________________________|	
-	
+
+	With adaptive refinement, condition goes to refine (instead of next) until each line of the innermost order
+	has been refined; refine then continues with transition.
 	"""
 
 	def __init__(self, resources, variables, num_items, measurement_resources, measurement_variables,
-			condition_resources=[], condition_variables=[], pulse_config=None, continuous=False):
+			condition_resources=[], condition_variables=[], pulse_config=None, continuous=False,
+			settle_resources=None):
 		self.resources = resources
 		self.variables = variables 
 		self.num_items = num_items 
@@ -76,6 +88,8 @@ class SweepController(object):
 		self.condition_variables = condition_variables
 		self.pulse_config = pulse_config
 		self.continuous = continuous
+		# Readback resources for adaptive dwell, by name.
+		self.settle_resources = settle_resources if settle_resources is not None else {}
 
 		# The callbacks should be set before calling run(), if necessary.
 		self.data_callback, self.close_callback, self.write_callback, self.read_callback = [None] * 4
@@ -91,6 +105,9 @@ class SweepController(object):
 		self.paused = False
 		self.pause_lock = Condition()
 
+		# Time in seconds taken to settle at the current item, if any variable has an adaptive dwell.
+		self.settle_time = None
+
 		self.last_continuous = False
 		self.done = False
 		self.aborting = False
@@ -104,103 +121,121 @@ class SweepController(object):
 		self.condition_orders = [group[0].order for group in self.condition_variables]
 		self.conditional_wait = 0
 		self.order_periods = None
-		
-	def compute_order_periods(self):
-		"""
-		This function computes the number of elements iterated before each order changes.
-		"""
-		periods = []
-		orders = []
-		
+		self.plan = None
 
-		
-		for group in reversed(self.variables):
-			#skip if vars in group are consts.
-			if group[0].use_const != 1:
-				num_in_group = None
-		
-				#get the length of the group
-				for var in group:
-					num_in_var = len(var)
-		
-					if num_in_group is None or num_in_var < num_in_group:
-						num_in_group = num_in_var
-				
-				#append the period of this group and its order.
-				if not periods:
-					periods.append(num_in_group)
-				else:
-					periods.append(periods[-1]*num_in_group)
-					
-				orders.append(group[0].order)
-		
-		
-		for order in self.condition_orders:
-			if order not in orders:
-				orders.append(order)
-				orders.sort()
-				new_index = orders.index(order)
-				if new_index > 0:
-					periods.insert(new_index, periods[new_index - 1])
-				else: #if the condition is the smallest order, it has a period of 1
-					periods.insert(new_index, 1)
-			
-		# create a dict.
-		self.order_periods = dict(zip(orders, periods))
-			
-	def create_iterator(self, pos):
-		"""
-		Create an iterator for an order of variables.
-		"""
+		# Workers for resource accesses; lives for the whole run.
+		self.executor = None
 
-		return izip(*(iter(var) for var in self.variables[pos]))
+		# The ramp in progress, if any.
+		self.current_ramp = None
 
+		# Where the time goes; a trace file is written if a path is set before calling run().
+		self.timings = SweepTimings()
+		self.trace_path = None
+		
 	def ramp(self, resources, values_from, values_to, steps):
 		"""
-		Slowly sweep the resources.
+		Slowly sweep the resources, all together.
 		"""
 
-		thrs = []
-		for (name, resource), value_from, value_to, resource_steps in zip(resources,
-				values_from, values_to, steps):
+		ramp = Ramp()
+
+		for (name, resource), value_from, value_to, resource_steps in zip(resources, values_from, values_to, steps):
 			if resource is None:
 				continue
 
-			kwargs = {}
+			exception_callback = None
 			if self.resource_exception_handler is not None:
-				kwargs['exception_callback'] = partial(self.resource_exception_handler, name, write=True)
+				exception_callback = partial(self.resource_exception_handler, name, write=True)
 
-			thr = Thread(target=resource.sweep, args=(value_from, value_to, resource_steps), kwargs=kwargs)
-			thrs.append(thr)
-			thr.daemon = True
-			thr.start()
+			ramp.add(resource, value_from, value_to, resource_steps, exception_callback)
 
-		for thr in thrs:
-			thr.join()
+		self.current_ramp = ramp
+
+		try:
+			# A fatal abort may have happened before the ramp was visible.
+			if self.aborting and self.abort_fatal:
+				return
+
+			with self.executor.timed('ramp'):
+				ramp.run()
+		finally:
+			self.current_ramp = None
 
 	def write_resource(self, name, resource, value):
 		"""
 		Write a value to a resource and handle exceptions.
 		"""
 
+		start_time = time()
+
 		try:
 			resource.value = value
 		except Exception as e:
 			if self.resource_exception_handler is not None:
 				self.resource_exception_handler(name, e, write=True)
 			return
+		finally:
+			self.timings.record_resource(name, 'write', start_time, time() - start_time)
+
+	@property
+	def devices(self):
+		"""
+		All the devices used by the sweep.
+		"""
+
+		resources = [resource for _, resource in list(flatten(self.resources)) + list(self.measurement_resources) +
+				self.condition_resources]
+
+		result = set(find_device(resource) for resource in resources if resource is not None)
+
+		if self.pulse_config is not None:
+			result.update([self.pulse_config.awg, self.pulse_config.oscilloscope])
+
+		return [device for device in result if hasattr(device, 'query_cache')]
+
+	def write_resources(self, items):
+		"""
+		Write values to resources on the same device, combining the commands into a single message where possible.
+
+		items: A list of (name, resource, value).
+		"""
+
+		device = find_device(items[0][1])
+
+		if device is None:
+			for name, resource, value in items:
+				self.write_resource(name, resource, value)
+
+			return
+
+		try:
+			with device.transaction():
+				for name, resource, value in items:
+					self.write_resource(name, resource, value)
+		except Exception as e:
+			# The combined message could not be sent, so none of the values were written.
+			if self.resource_exception_handler is not None:
+				for name, _, _ in items:
+					self.resource_exception_handler(name, e, write=True)
+			else:
+				raise
 
 	def read_resource(self, name, resource, save_callback):
 		"""
 		Read a value from a resource and handle exceptions.
 		"""
 
+		start_time = time()
+
 		try:
 			value = resource.value
 		except Exception as e:
 			if self.resource_exception_handler is not None:
 				self.resource_exception_handler(name, e, write=False)
 			return
+		finally:
+			self.timings.record_resource(name, 'read', start_time, time() - start_time)
 
 		save_callback(value)
 		
@@ -210,6 +245,12 @@ class SweepController(object):
 		Run the sweep.
 		"""
 
+		if self.executor is None:
+			self.executor = DeviceExecutor()
+
+		if self.trace_path is not None:
+			self.timings.open_trace(self.trace_path)
+
 		try:
 			if next_f is None:
 				next_f = self.init
@@ -235,6 +276,8 @@ class SweepController(object):
 
 				log.debug('Starting function: {0}'.format(f_name))
 
+				start_time = time()
+
 				try:
 					next_f = next_f()
 				except Exception as e:
@@ -245,6 +288,8 @@ class SweepController(object):
 
 					# Attempt to exit normally at this point.
 					next_f = None
+				finally:
+					self.timings.record_stage(f_name, start_time, time() - start_time)
 		finally:
 			self.end()
 
@@ -254,14 +299,31 @@ class SweepController(object):
 		Initialize values and possibly devices.
 		"""
 
-		self.iterators = None
 		self.current_values = None
 		self.last_values = None
 
 		self.item = -1
-		
-		self.compute_order_periods()
-		
+
+		self.waveforms_uploaded = False
+
+		if self.plan is None:
+			self.plan = SweepPlan(self.variables, self.condition_orders)
+			self.order_periods = self.plan.order_periods
+
+		# Variables with adaptive dwell, and the fixed waits of the others, for each group.
+		self.settle_groups, self.fixed_group_waits = [], []
+		for group in self.variables:
+			settling = [(var, self.settle_resources.get(var.settle_resource_name)) for var in group]
+			settling = [(var, resource) for var, resource in settling if resource is not None]
+			settling_vars = [var for var, _ in settling]
+
+			self.settle_groups.append(settling)
+			self.fixed_group_waits.append(max([var._wait.value for var in group if var not in settling_vars] + [0]))
+
+		self.adaptive_dwell = any(self.settle_groups)
+
+		self._setup_refinement()
+
 		if not self.devices_configured:
 			log.debug('Configuring devices')
 
@@ -275,42 +337,124 @@ class SweepController(object):
 
 			self.devices_configured = True
 
+		if self.pulse_config is not None:
+			# The AWG may have been used since the last run.
+			self.pulse_config.awg.sync_waveforms()
+
+		# Settings may have been changed by hand since the last run.
+		for device in self.devices:
+			device.query_cache.clear()
+
 		return self.next
 
 	@update_current_f
 	def next(self):
 		"""
-		Get the next set of values from the iterators.
+		Get the next set of values from the plan.
 		"""
-		
+
 		self.item += 1
 		if self.current_values is not None:
-			self.last_values = self.current_values[:]
+			self.last_values = self.current_values
 
-		if self.iterators is None:
-			# First time around.
-			self.iterators = []
-			for pos in xrange(len(self.variables)):
-				self.iterators.append(self.create_iterator(pos))
+		self.current_values = self.plan.values(self.item)
+		self.changed_indices = self.plan.changed_indices(self.item)
+		self.dwell_time = self.plan.dwell_times[self.item]
 
-			self.current_values = [it.next() for it in self.iterators]
-			self.changed_indices = range(len(self.variables))
-			
-			# Calculate where the end of each order is.
+		if self.adaptive_var is not None:
+			col = self.plan.indices[self.item][-1]
+			self.current_x = self.plan.group_raw_values[-1][col, self.adaptive_col]
+
+			if col == 0:
+				# A new line.
+				self.line_points = []
+				self.line_refined = 0
+				self.line_finished = False
+
+		return self.transition
+
+	def _setup_refinement(self):
+		"""
+		Find the adaptive variable in the innermost order, if any.
+		"""
+
+		self.adaptive_var = None
+		self.line_points, self.refine_queue = [], []
+
+		# Progress of the refinement, which is not part of the plan.
+		self.refine_budget = 0
+		self.refined_items = 0
+		self.unused_refinement = 0
+		self.line_refined = 0
+		self.line_finished = False
+
+		if not self.variables or self.variables[-1][0].use_const:
+			return
+
+		group = self.variables[-1]
+		adaptive_vars = [var for var in group if isinstance(var.config, AdaptiveConfig)]
+		if not adaptive_vars:
+			return
+
+		var = adaptive_vars[0]
+
+		names = [v.name for v in self.measurement_variables]
+		if var.config.measurement:
+			try:
+				self.adaptive_measurement = names.index(var.config.measurement)
+			except ValueError:
+				raise ValueError('Adaptive variable "{0}" refers to unknown measurement "{1}"'.format(var.name,
+						var.config.measurement))
+		elif names:
+			self.adaptive_measurement = 0
 		else:
-			pos = len(self.variables) - 1
-			while pos >= 0: 
-				try:
-					self.current_values[pos] = self.iterators[pos].next()
-					break
-				except StopIteration:
-					self.iterators[pos] = self.create_iterator(pos)
-					self.current_values[pos] = self.iterators[pos].next()
-					
+			raise ValueError('Adaptive variable "{0}" needs a measurement'.format(var.name))
 
-					pos -= 1
-					
-			self.changed_indices = range(pos, len(self.variables))
+		self.adaptive_var = var
+		self.adaptive_col = group.index(var)
+
+		# The most points which may be added to each line, and the dwell time at each of them.
+		self.refine_budget = max(var.config.max_points - self.plan.group_lengths[-1], 0)
+		self.refine_dwell = max(v._wait.value for v in group)
+
+		# The other variables in the group follow along, interpolating between their coarse values.
+		raw_values = self.plan.group_raw_values[-1]
+		order = numpy.argsort(raw_values[:, self.adaptive_col])
+		self.adaptive_coarse = raw_values[order]
+
+	def adaptive_values(self, x):
+		"""
+		Values for the innermost group, with the adaptive variable at x.
+		"""
+
+		xs = self.adaptive_coarse[:, self.adaptive_col]
+
+		result = []
+		for i, var in enumerate(self.variables[-1]):
+			if i == self.adaptive_col:
+				result.append(var.with_type(x))
+			else:
+				result.append(var.with_type(numpy.interp(x, xs, self.adaptive_coarse[:, i])))
+
+		return tuple(result)
+
+	@update_current_f
+	def refine(self):
+		"""
+		Move on to the next point added to the current line by adaptive refinement.
+		"""
+
+		self.current_x = self.refine_queue.pop(0)
+		self.refined_items += 1
+		self.line_refined += 1
+
+		self.last_values = self.current_values
+		self.current_values = self.current_values[:-1] + [self.adaptive_values(self.current_x)]
+
+		# Only the innermost group changes.
+		pos = len(self.variables) - 1
+		self.changed_indices = [pos]
+		self.dwell_time = self.refine_dwell
 
 		return self.transition
 	
@@ -371,20 +515,22 @@ class SweepController(object):
 		Write the next values to their resources.
 		"""
 
-		thrs = []
-		for pos in self.changed_indices:
-			for i, ((name, resource), value) in enumerate(zip(self.resources[pos], self.current_values[pos])):
-				if resource is not None:
-					thr = Thread(target=self.write_resource, args=(name, resource, value))
-					thrs.append(thr)
-					thr.daemon = True
-					thr.start()
+		# Writes to the same device are sent together.
+		groups = OrderedDict()
+
+		with self.executor.timed('write'):
+			for pos in self.changed_indices:
+				for i, ((name, resource), value) in enumerate(zip(self.resources[pos], self.current_values[pos])):
+					if resource is not None:
+						groups.setdefault(device_key(resource), []).append((name, resource, value))
+
+					if self.write_callback is not None:
+						self.write_callback(pos, i, value)
 
-				if self.write_callback is not None:
-					self.write_callback(pos, i, value)
+			futures = [self.executor.submit(key, 'write', self.write_resources, items)
+					for key, items in groups.iteritems()]
 
-		for thr in thrs:
-			thr.join()
+			wait_all(futures, reraise=False)
 
 		return self.dwell
 
@@ -394,14 +540,71 @@ class SweepController(object):
 		Wait for all changed variables.
 		"""
 
-		delay = max(var._wait.value for pos in self.changed_indices for var in self.variables[pos])
-		sleep(delay)
+		max_wait = self.dwell_time
+		settling = [x for pos in self.changed_indices for x in self.settle_groups[pos]]
+
+		if settling:
+			min_wait = max(self.fixed_group_waits[pos] for pos in self.changed_indices)
+			self.settle_time = self.settle(settling, min_wait, max_wait)
+		else:
+			sleep(max_wait)
+
+			if self.adaptive_dwell:
+				self.settle_time = max_wait
 
 		if self.pulse_config is not None:
 			return self.pulse
 		else:
 			return self.read
 
+	def settle(self, settling, min_wait, max_wait):
+		"""
+		Poll readback resources until successive readings agree for each of them.
+
+		settling: A list of (variable, readback resource).
+		min_wait: Time in s to wait regardless, for variables without adaptive dwell.
+		max_wait: Time in s after which to give up.
+
+		Returns the time spent.
+		"""
+
+		start_time = time()
+		deadline = start_time + max_wait
+		interval = min(var._settle_interval.value for var, _ in settling)
+
+		last_values = [None] * len(settling)
+		remaining = set(xrange(len(settling)))
+
+		while remaining:
+			for i in sorted(remaining):
+				var, resource = settling[i]
+
+				try:
+					value = resource.value
+				except Exception as e:
+					log.warning('Could not read back "{0}": {1!r}'.format(var.settle_resource_name, e))
+
+					# Start over with the next reading.
+					last_values[i] = None
+					continue
+
+				if last_values[i] is not None and var.settled(last_values[i], value):
+					remaining.remove(i)
+				else:
+					last_values[i] = value
+
+			time_left = deadline - time()
+			if not remaining or time_left <= 0:
+				break
+
+			sleep(min(interval, time_left))
+
+		time_left = start_time + min_wait - time()
+		if time_left > 0:
+			sleep(time_left)
+
+		return time() - start_time
+
 	@update_current_f
 	def pulse(self):
 		"""
@@ -409,24 +612,33 @@ class SweepController(object):
 		"""
 
 		if self.pulse_config.channels:
-			waveforms = self.pulse_config.program.generate_waveforms()
-			times = self.pulse_config.program.times_average
+			program = self.pulse_config.program
+			waveforms = program.generate_waveforms()
+			times = program.times_average
 
 			# AWG
 			awg = self.pulse_config.awg
 			awg.enabled = False
 
-			awg.clear_channels()
+			# Only upload the waveforms which have changed since the first upload.
+			if not self.waveforms_uploaded:
+				awg.clear_channels()
+				changed_outputs = set(self.pulse_config.channels)
+			else:
+				changed_outputs = program.changed_outputs
 
 			channels = []
 			for output, number in self.pulse_config.channels.items():
 				channel = awg.channels[number]
 
-				waveform, markers = waveforms[output]
-				channel.set_waveform(waveform, markers, name=output)
+				if output in changed_outputs:
+					waveform, markers = waveforms[output]
+					channel.set_waveform(waveform, markers, name=output)
 
 				channels.append(channel)
 
+			self.waveforms_uploaded = True
+
 			for channel in channels:
 				channel.enabled = True
 
@@ -484,21 +696,19 @@ class SweepController(object):
 		"""
 		measurements = [None] * len(self.measurement_resources)
 
-		thrs = []
-		for i, (name, resource) in enumerate(self.measurement_resources):
-			if resource is not None:
-				def save_callback(value, i=i):
-					measurements[i] = value
-					if self.read_callback is not None:
-						self.read_callback(i, value)
-
-				thr = Thread(target=self.read_resource, args=(name, resource, save_callback))
-				thrs.append(thr)
-				thr.daemon = True
-				thr.start()
-		
-		for thr in thrs:
-			thr.join()
+		futures = []
+		with self.executor.timed('read'):
+			for i, (name, resource) in enumerate(self.measurement_resources):
+				if resource is not None:
+					def save_callback(value, i=i):
+						measurements[i] = value
+						if self.read_callback is not None:
+							self.read_callback(i, value)
+
+					futures.append(self.executor.submit(device_key(resource), 'read',
+							self.read_resource, name, resource, save_callback))
+
+			wait_all(futures, reraise=False)
 
 		if self.data_callback is not None:
 			if self.first_time_point is None:
@@ -508,7 +718,16 @@ class SweepController(object):
 				cur_time = time() - self.first_time_point
 
 			self.data_callback(cur_time, tuple(flatten(self.current_values)), tuple(measurements))
-			
+
+		if self.adaptive_var is not None:
+			signal = measurements[self.adaptive_measurement]
+
+			try:
+				signal = float(signal.value if isinstance(signal, Quantity) else signal)
+			except (TypeError, ValueError):
+				signal = None
+
+			self.line_points.append((self.current_x, signal))
 
 		return self.condition
 
@@ -521,16 +740,26 @@ class SweepController(object):
 		Once conditions are true, then the sweep controller moves on to the next order
 		and continues as usual.
 		"""		
+		if self.adaptive_var is not None and self.plan.indices[self.item][-1] == self.plan.group_lengths[-1] - 1:
+			# The coarse line is done, so refine it before anything else.
+			if not self.refine_queue and not self.line_finished:
+				xs, ys = zip(*self.line_points)
+				self.refine_queue = self.adaptive_var.config.refine(xs, ys)
+
+				if not self.refine_queue:
+					# Whatever is left of the budget is not needed after all.
+					self.line_finished = True
+					self.unused_refinement += self.refine_budget - self.line_refined
+
+			if self.refine_queue:
+				return self.refine
+
 		boolean = True
 		
 		if self.condition_variables:
 				
 			# Find the orders that have changed
-			orders_changed = []
-			for order in self.order_periods.keys():
-				if (self.item + 1) % self.order_periods[order] == 0:
-					orders_changed.append(order)
-			orders_changed.sort()
+			orders_changed = self.plan.orders_changed(self.item)
 			
 			# The wait time is defined by the max of the wait times of the lowest triggered order of condition variables
 			self.conditional_wait = 0
@@ -607,9 +836,76 @@ class SweepController(object):
 		assert not self.done
 		self.done = True
 
+		if self.executor is not None:
+			self.executor.shutdown()
+
+		self.timings.close_trace()
+
 		if self.close_callback is not None:
 			self.close_callback()
 
+	def timing_snapshot(self):
+		"""
+		The timings so far, including the time that device accesses spent waiting for their device.
+		"""
+
+		result = self.timings.snapshot()
+
+		if self.executor is not None:
+			result['bus_wait'] = dict((stage, timing['wait']) for stage, timing in self.executor.timings.items())
+		else:
+			result['bus_wait'] = {}
+
+		return result
+
+	@property
+	def items_done(self):
+		"""
+		The number of items measured so far, including those added by adaptive refinement.
+		"""
+
+		return max(self.item, 0) + getattr(self, 'refined_items', 0)
+
+	@property
+	def total_items(self):
+		"""
+		The number of items in the sweep, including as many as adaptive refinement may still add.
+
+		This shrinks whenever a line needs fewer points than allowed.
+		"""
+
+		if getattr(self, 'adaptive_var', None) is None:
+			return self.num_items
+
+		num_lines = self.num_items // self.plan.group_lengths[-1]
+
+		return self.num_items + num_lines * self.refine_budget - self.unused_refinement
+
+	def remaining_time(self, elapsed_time):
+		"""
+		Estimate the time (in seconds) left in the sweep, given the time elapsed so far.
+
+		The dwell times are known exactly from the plan (and for each point added by adaptive refinement); only the
+		overhead per item is extrapolated.
+		"""
+
+		items_done = self.items_done
+
+		if self.plan is None or items_done <= 0:
+			return None
+
+		remaining_dwell = self.plan.remaining_dwell(max(self.item, 0) - 1)
+		done_dwell = self.plan.total_dwell - remaining_dwell
+
+		if self.adaptive_var is not None:
+			remaining_refinement = self.total_items - self.num_items - self.refined_items
+			remaining_dwell += remaining_refinement * self.refine_dwell
+			done_dwell += self.refined_items * self.refine_dwell
+
+		overhead = max(elapsed_time - done_dwell, 0) / items_done
+
+		return remaining_dwell + overhead * (self.total_items - items_done)
+
 	def pause(self):
 		log.debug('Pausing.')
 
@@ -639,4 +935,9 @@ class SweepController(object):
 		if self.abort_fatal:
 			log.warning('Aborting fatally.')
 
+			# There is no ramping down afterwards, so there is no need to finish the current ramp.
+			ramp = self.current_ramp
+			if ramp is not None:
+				ramp.abort()
+
 		self.unpause()
@@ -0,0 +1,84 @@
+from nose.tools import assert_raises, eq_
+import os
+import shutil
+import tempfile
+from unittest import main, TestCase
+
+from spacq.interface.resources import Resource
+
+from .. import capture
+from ..variables import InputVariable, LinSpaceConfig, OutputVariable
+
+
+class PrepareTest(TestCase):
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def variables(self):
+		var1 = OutputVariable(name='Var 1', order=1, enabled=True, resource_name='Res 1')
+		var1.config = LinSpaceConfig(1.0, 3.0, 3)
+
+		var2 = OutputVariable(name='Var 2', order=2, enabled=True, resource_name='Res 2')
+		var2.config = LinSpaceConfig(-1.0, -2.0, 2)
+
+		disabled = OutputVariable(name='Var 3', order=1, enabled=False, resource_name='Missing')
+
+		meas = InputVariable(name='Meas', enabled=True, resource_name='Meas res')
+
+		return [var1, var2, disabled, meas]
+
+	def testPrepare(self):
+		"""
+		Everything is matched up with its resource.
+		"""
+
+		resources = {
+			'Res 1': Resource(setter=lambda x: None),
+			'Res 2': Resource(setter=lambda x: None),
+			'Meas res': Resource(getter=lambda: 5),
+		}
+
+		result = capture.prepare(self.variables(), resources, {})
+
+		eq_(result.num_items, 6)
+		eq_([[var.name for var in group] for group in result.output_variables], [['Var 2'], ['Var 1']])
+		eq_(result.resources, [(('Res 2', resources['Res 2']),), (('Res 1', resources['Res 1']),)])
+		eq_(result.measurement_resources, [('Meas res', resources['Meas res'])])
+		eq_(result.measurement_resource_names, ['Meas res'])
+		eq_(result.headings, [('Time', 's'), ('Var 2', None), ('Var 1', None), ('Meas', None)])
+		eq_(result.export_row(1.0, (2, 3), (4,)), [1.0, 2, 3, 4])
+
+		exporter = result.open_exporter(self.dir)
+		exporter.close()
+		eq_(os.listdir(self.dir), [os.path.basename(exporter.path)])
+
+		assert_raises(capture.CaptureError, result.open_exporter, os.path.join(self.dir, 'missing'))
+		assert_raises(capture.CaptureError, result.open_exporter, self.dir, 'Unknown')
+
+	def testProblems(self):
+		"""
+		All the problems are reported together.
+		"""
+
+		resources = {
+			'Res 1': Resource(getter=lambda: 5),
+			'Meas res': Resource(setter=lambda x: None),
+		}
+
+		try:
+			capture.prepare(self.variables(), resources, {})
+		except capture.CaptureError as e:
+			eq_(e.problems, [
+				('Missing resources', '"Res 2"'),
+				('Unreadable resources', '"Meas res"'),
+				('Unwritable resources', '"Res 1"'),
+			])
+		else:
+			assert False, 'Expected CaptureError.'
+
+
+if __name__ == '__main__':
+	main()
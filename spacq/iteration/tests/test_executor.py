@@ -0,0 +1,68 @@
+from nose.tools import eq_
+from threading import RLock
+from unittest import main, TestCase
+
+from spacq.interface.resources import Resource
+
+from .. import executor
+
+
+class DeviceKeyTest(TestCase):
+	def testDetached(self):
+		"""
+		Resources without devices are their own key.
+		"""
+
+		res = Resource(getter=lambda: 5)
+
+		eq_(executor.device_key(res), res)
+
+	def testDevice(self):
+		"""
+		Resources on the same device (or its subdevices) share a key.
+		"""
+
+		class Device(object):
+			def __init__(self, lock):
+				self.lock = lock
+				self.x = 0
+
+			def get_x(self):
+				return self.x
+
+		lock = RLock()
+		dev = Device(lock)
+		subdev = Device(lock)
+
+		res1 = Resource(dev, 'x')
+		res2 = Resource(subdev, 'x', 'x')
+		res3 = Resource(getter=dev.get_x)
+
+		eq_(executor.device_key(res1), lock)
+		eq_(executor.device_key(res2), lock)
+		eq_(executor.device_key(res3), lock)
+
+
+	def testFindDevice(self):
+		"""
+		Subdevices lead to their parent device.
+		"""
+
+		class Device(object):
+			def transaction(self):
+				pass
+
+		class Subdevice(object):
+			def __init__(self, device):
+				self.device = device
+				self.x = 0
+
+		dev = Device()
+		subdev = Subdevice(Subdevice(dev))
+
+		eq_(executor.find_device(Resource(subdev, 'x')), dev)
+		eq_(executor.find_device(Resource(getter=lambda: 5)), None)
+
+
+if __name__ == '__main__':
+	main()
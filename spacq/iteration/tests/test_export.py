@@ -0,0 +1,191 @@
+import csv
+from nose.tools import assert_raises, eq_
+from numpy import array, isnan
+from numpy.testing import assert_array_equal
+import os
+import shutil
+import tempfile
+from unittest import main, TestCase
+
+from spacq.interface.units import Quantity
+
+from .. import export
+
+
+class ExporterTest(TestCase):
+	headings = [('Time', 's'), ('Var', 'V'), ('Meas', None), ('Wave', 'V')]
+
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def rows(self, n):
+		return [[float(i), Quantity(i, 'mV'), i * 2, [(0.0, i), (1.0, -i)]] for i in xrange(n)]
+
+	def testCSV(self):
+		"""
+		Rows end up in a CSV file.
+		"""
+
+		path = os.path.join(self.dir, 'test.csv')
+		exporter = export.CSVExporter(path, self.headings)
+
+		for row in self.rows(15):
+			exporter.add_row(row)
+
+		# Only the first chunk has been written so far.
+		with open(path) as f:
+			eq_(len(list(csv.reader(f))), 11)
+
+		exporter.close()
+
+		with open(path) as f:
+			result = list(csv.reader(f))
+
+		eq_(result[0], ['Time (s)', 'Var (V)', 'Meas', 'Wave (V)'])
+		eq_(len(result), 16)
+		eq_(result[3], ['2.0', '2.0', '4', '[(0.0, 2), (1.0, -2)]'])
+
+	def testCSVArray(self):
+		"""
+		Array waveforms are written as lists.
+		"""
+
+		path = os.path.join(self.dir, 'test.csv')
+		exporter = export.CSVExporter(path, self.headings)
+		exporter.add_row([0.0, 1.0, 2.0, array([[0.0, 1.5], [1.0, -1.5]])])
+		exporter.close()
+
+		with open(path) as f:
+			result = list(csv.reader(f))
+
+		eq_(result[1][3], '[(0.0, 1.5), (1.0, -1.5)]')
+
+	def testBinary(self):
+		"""
+		Scalars and lists go into their own columns.
+		"""
+
+		path = os.path.join(self.dir, 'test.bin')
+		exporter = export.BinaryExporter(path, self.headings)
+
+		rows = self.rows(150)
+		# Missing values.
+		rows[3][2] = None
+		rows[4][3] = None
+		# Too short.
+		rows[5][3] = [(0.0, 5)]
+
+		for row in rows:
+			exporter.add_row(row)
+
+		# Only whole chunks are available.
+		headings, columns = export.load_binary(path)
+		eq_(headings, self.headings)
+		eq_(len(columns[0]), 100)
+
+		exporter.close()
+
+		headings, columns = export.load_binary(path)
+
+		eq_(len(columns[0]), 150)
+		assert_array_equal(columns[0], range(150))
+		assert_array_equal(columns[1][:3], [0.0, 1.0, 2.0])
+		eq_(columns[3].shape, (150, 2, 2))
+		assert_array_equal(columns[3][6], [(0.0, 6), (1.0, -6)])
+
+		assert isnan(columns[2][3])
+		assert isnan(columns[3][4]).all()
+		assert_array_equal(columns[3][5][0], [0.0, 5])
+		assert isnan(columns[3][5][1]).all()
+
+	def testBinaryShapes(self):
+		"""
+		Column shapes are only fixed once they are known.
+		"""
+
+		path = os.path.join(self.dir, 'test.bin')
+
+		# Known up front.
+		exporter = export.BinaryExporter(path, self.headings, [(), (), (), (2, 2)])
+
+		headings, columns = export.load_binary(path)
+		eq_(headings, self.headings)
+		eq_(len(columns[0]), 0)
+		eq_(columns[3].shape, (0, 2, 2))
+
+		exporter.close()
+
+		# A waveform which is missing at first.
+		exporter = export.BinaryExporter(path, self.headings, [(), (), (), None])
+
+		rows = self.rows(150)
+		for row in rows[:50]:
+			row[3] = None
+			exporter.add_row(row)
+
+		assert_raises(ValueError, export.load_binary, path)
+
+		# The header is written as soon as the shape is known.
+		exporter.add_row(rows[50])
+
+		headings, columns = export.load_binary(path)
+		eq_(len(columns[0]), 0)
+		eq_(columns[3].shape, (0, 2, 2))
+
+		for row in rows[51:]:
+			exporter.add_row(row)
+
+		headings, columns = export.load_binary(path)
+		eq_(columns[3].shape, (100, 2, 2))
+		assert isnan(columns[3][:50]).all()
+		assert_array_equal(columns[3][99], [(0.0, 99), (1.0, -99)])
+
+		exporter.close()
+
+		# Never seen at all: only held back for a single chunk.
+		exporter = export.BinaryExporter(path, self.headings, [(), (), (), None])
+
+		for row in self.rows(150):
+			row[3] = None
+			exporter.add_row(row)
+
+		headings, columns = export.load_binary(path)
+		eq_(columns[3].shape, (100,))
+		assert isnan(columns[3]).all()
+
+		exporter.close()
+
+		headings, columns = export.load_binary(path)
+		eq_(len(columns[0]), 150)
+
+		# No rows at all.
+		export.BinaryExporter(path, self.headings, [(), (), (), None]).close()
+
+		headings, columns = export.load_binary(path)
+		eq_(columns[3].shape, (0,))
+
+	def testBinaryTruncated(self):
+		"""
+		A partially-written record is ignored.
+		"""
+
+		path = os.path.join(self.dir, 'test.bin')
+		exporter = export.BinaryExporter(path, self.headings)
+
+		for row in self.rows(100):
+			exporter.add_row(row)
+
+		with open(path, 'ab') as f:
+			f.write('\0' * 7)
+
+		headings, columns = export.load_binary(path)
+		eq_(len(columns[0]), 100)
+
+		exporter.close()
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,82 @@
+import csv
+from nose.tools import eq_
+import os
+import pickle
+import shutil
+import tempfile
+from unittest import main, TestCase
+
+from spacq.devices.config import DeviceConfig
+
+from .. import headless
+from ..variables import InputVariable, LinSpaceConfig, OutputVariable
+
+
+class HeadlessTest(TestCase):
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def dump(self, name, value):
+		path = os.path.join(self.dir, name)
+
+		with open(path, 'wb') as f:
+			pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+		return path
+
+	def testMain(self):
+		"""
+		Sweep mock devices and export the data.
+		"""
+
+		dev_cfgs = []
+		for name, manufacturer, model, resource_labels in [
+				('DMM', 'Agilent', '34410A', {('reading',): 'Reading'}),
+				('Source', 'Rohde & Schwarz', 'SMF100A', {('frequency',): 'Frequency'})]:
+			dev_cfg = DeviceConfig(name=name)
+			dev_cfg.address_mode = dev_cfg.address_modes.ethernet
+			dev_cfg.ip_address = '127.0.0.1'
+			dev_cfg.manufacturer, dev_cfg.model = manufacturer, model
+			dev_cfg.mock = True
+			dev_cfg.resource_labels = resource_labels
+
+			dev_cfgs.append(self.dump('{0}.dev'.format(name), dev_cfg))
+
+		var = OutputVariable(name='Var', order=1, enabled=True, resource_name='Frequency', wait='0 s')
+		var.config = LinSpaceConfig(1.0, 4.0, 4)
+		var.type, var.units = 'quantity', 'GHz'
+		var.smooth_from, var.smooth_to, var.smooth_transition = False, False, False
+
+		meas = InputVariable(name='Meas', enabled=True, resource_name='Reading')
+
+		data_dir = os.path.join(self.dir, 'data')
+		os.mkdir(data_dir)
+
+		result = headless.main([self.dump('sweep.var', [var, meas])] + dev_cfgs + ['--directory', data_dir])
+		eq_(result, 0)
+
+		files = os.listdir(data_dir)
+		eq_(len(files), 1)
+
+		with open(os.path.join(data_dir, files[0])) as f:
+			rows = list(csv.reader(f))
+
+		eq_(rows[0], ['Time (s)', 'Var (GHz)', 'Meas (V)'])
+		eq_([float(row[1]) for row in rows[1:]], [1.0, 2.0, 3.0, 4.0])
+
+	def testMissingResource(self):
+		"""
+		Nothing is run when a resource is missing.
+		"""
+
+		var = OutputVariable(name='Var', order=1, enabled=True, resource_name='Missing')
+		var.config = LinSpaceConfig(1.0, 10.0, 4)
+
+		eq_(headless.main([self.dump('sweep.var', [var])]), 1)
+
+
+if __name__ == '__main__':
+	main()
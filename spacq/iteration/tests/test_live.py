@@ -0,0 +1,81 @@
+from nose.tools import eq_
+from numpy import isnan
+from numpy.testing import assert_array_equal
+from threading import Thread
+from unittest import main, TestCase
+
+from spacq.interface.units import Quantity
+
+from .. import live
+
+
+class LiveDataChannelTest(TestCase):
+	def testDrain(self):
+		"""
+		Values come out in blocks, by name.
+		"""
+
+		channel = live.LiveDataChannel()
+
+		channel.extend(['a', 'b'], [Quantity(1, 'mV'), [(0.0, 1.0), (1.0, 2.0)]])
+		channel.extend(['a', 'b'], [None, [(0.0, 3.0), (1.0, 4.0)]])
+		channel.append('c', 5)
+
+		blocks = channel.drain()
+		eq_(blocks.keys(), ['a', 'b', 'c'])
+
+		eq_(blocks['a'].units, 'mV')
+		eq_(blocks['a'].values[0], 1.0)
+		assert isnan(blocks['a'].values[1])
+
+		eq_(blocks['b'].units, None)
+		eq_(blocks['b'].values.shape, (2, 2, 2))
+		assert_array_equal(blocks['b'].values[-1], [(0.0, 3.0), (1.0, 4.0)])
+
+		eq_(len(blocks['c']), 1)
+		eq_(blocks['c'].times[0], blocks['c'].times[-1])
+
+		eq_(len(channel), 0)
+		eq_(channel.drain().keys(), [])
+
+	def testConcurrent(self):
+		"""
+		Nothing is lost while draining and appending at the same time.
+		"""
+
+		channel = live.LiveDataChannel()
+		num_values = 20000
+
+		def produce():
+			for i in xrange(num_values):
+				channel.append('a', i)
+
+		thr = Thread(target=produce)
+		thr.start()
+
+		values = []
+		while thr.is_alive() or len(channel):
+			for block in channel.drain().values():
+				values.extend(block.values)
+
+		thr.join()
+		for block in channel.drain().values():
+			values.extend(block.values)
+
+		eq_(values, range(num_values))
+
+	def testMaxlen(self):
+		"""
+		The oldest values are dropped.
+		"""
+
+		channel = live.LiveDataChannel(maxlen=3)
+
+		for i in xrange(5):
+			channel.append('a', i)
+
+		assert_array_equal(channel.drain()['a'].values, [2, 3, 4])
+
+
+if __name__ == '__main__':
+	main()
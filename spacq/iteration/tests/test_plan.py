@@ -0,0 +1,115 @@
+from nose.tools import assert_raises, eq_
+from numpy.testing import assert_array_almost_equal, assert_array_equal
+from StringIO import StringIO
+import numpy
+from unittest import main, TestCase
+
+from ..variables import sort_output_variables, ArbitraryConfig, LinSpaceConfig, OutputVariable
+
+from .. import plan
+
+
+class SweepPlanTest(TestCase):
+	def setUp(self):
+		var0 = OutputVariable(name='Var 0', order=2, enabled=True, wait='10 ms')
+		var0.config = LinSpaceConfig(-1.0, -2.0, 2)
+
+		var1 = OutputVariable(name='Var 1', order=1, enabled=True, wait='1 ms')
+		var1.config = LinSpaceConfig(1.0, 3.0, 3)
+
+		# Longer than its partner, so it gets truncated.
+		var2 = OutputVariable(name='Var 2', order=1, enabled=True, wait='2 ms')
+		var2.config = ArbitraryConfig([5.0, 6.0, 7.0, 8.0])
+
+		var3 = OutputVariable(name='Var 3', order=5, enabled=True, const=1.23, use_const=True, wait='100 ms')
+
+		self.vars, self.num_items = sort_output_variables([var0, var1, var2, var3])
+
+	def testValues(self):
+		"""
+		Walk through every item.
+		"""
+
+		p = plan.SweepPlan(self.vars)
+
+		eq_(p.num_items, self.num_items)
+		eq_(p.num_items, 6)
+
+		eq_([p.values(i) for i in xrange(p.num_items)], [[(1.23,), (x,), (y, y + 4.0)]
+				for x in [-1.0, -2.0] for y in [1.0, 2.0, 3.0]])
+		eq_([p.changed_indices(i) for i in xrange(p.num_items)],
+				[[0, 1, 2], [2], [2], [1, 2], [2], [2]])
+
+		assert_array_equal(p.table, [[1.23, x, y, y + 4.0] for x in [-1.0, -2.0] for y in [1.0, 2.0, 3.0]])
+		eq_(p.names, ['Var 3', 'Var 0', 'Var 1', 'Var 2'])
+
+	def testDwell(self):
+		"""
+		The dwell time is the longest wait of the changed groups.
+		"""
+
+		p = plan.SweepPlan(self.vars)
+
+		assert_array_almost_equal(p.dwell_times, [0.1, 0.002, 0.002, 0.01, 0.002, 0.002])
+		assert_array_almost_equal(p.total_dwell, 0.118)
+		assert_array_almost_equal(p.remaining_dwell(2), 0.014)
+		assert_array_almost_equal(p.remaining_dwell(5), 0.0)
+
+	def testOrders(self):
+		"""
+		Order boundaries, including for condition-only orders.
+		"""
+
+		p = plan.SweepPlan(self.vars, condition_orders=[0, 1, 3])
+
+		eq_(p.order_periods, {0: 1, 1: 3, 2: 6, 3: 6})
+		eq_([p.orders_changed(i) for i in xrange(p.num_items)],
+				[[0], [0], [0, 1], [0], [0], [0, 1, 2, 3]])
+
+	def testDiff(self):
+		"""
+		Compare plans.
+		"""
+
+		p1 = plan.SweepPlan(self.vars)
+
+		eq_(list(p1.diff(p1)), [])
+
+		self.vars[2][0].config = ArbitraryConfig([1.0, 2.5, 3.0])
+		p2 = plan.SweepPlan(self.vars)
+
+		eq_(list(p1.diff(p2)), [1, 4])
+
+		assert_raises(ValueError, p1.diff, plan.SweepPlan(self.vars[1:]))
+
+	def testSave(self):
+		"""
+		The plan can be written out.
+		"""
+
+		p = plan.SweepPlan(self.vars, condition_orders=[0])
+
+		f = StringIO()
+		p.save(f)
+		f.seek(0)
+
+		data = numpy.load(f)
+
+		assert_array_equal(data['table'], p.table)
+		assert_array_equal(data['first_changed'], [0, 2, 2, 1, 2, 2])
+		assert_array_equal(data['order_0'], [True] * 6)
+
+	def testEmpty(self):
+		"""
+		No variables at all.
+		"""
+
+		p = plan.SweepPlan([])
+
+		eq_(p.num_items, 0)
+		eq_(p.table.shape, (0, 0))
+		eq_(p.total_dwell, 0.0)
+
+
+if __name__ == '__main__':
+	main()
@@ -1,10 +1,13 @@
 from functools import partial
+import json
 from nose.tools import eq_
+import os
 from os import path
+from tempfile import mkstemp
 from threading import Thread
 from time import sleep, time
 from unittest import main, TestCase
-from itertools import cycle
+from itertools import count, cycle
 
 from spacq.devices.config import DeviceConfig
 from spacq.interface.pulse.program import Program
@@ -15,7 +18,7 @@ from spacq.tool.box import flatten
 from ..variables import sort_condition_variables, sort_output_variables, InputVariable, OutputVariable 
 from ..variables import ConditionVariable, LinSpaceConfig, Condition
 
-from .. import sweep
+from .. import sweep, variables
 
 resource_dir = path.join(path.dirname(__file__), 'resources')
 
@@ -227,6 +230,201 @@ class SweepControllerTest(TestCase):
 
 		eq_(res_buf[:len(expected_buf) * 50], expected_buf * 50)
 
+	def testTimings(self):
+		"""
+		Time the stages and resource accesses.
+		"""
+
+		res = Resource(setter=lambda x: sleep(0.01))
+		var = OutputVariable(name='Var', order=1, enabled=True, wait='20 ms')
+		var.config = LinSpaceConfig(1.0, 4.0, 4)
+
+		meas_res = Resource(getter=lambda: 5)
+		meas_var = InputVariable(name='Meas var')
+
+		vars, num_items = sort_output_variables([var])
+		ctrl = sweep.SweepController([(('Res', res),)], vars, num_items, [('Meas res', meas_res)], [meas_var])
+
+		fd, ctrl.trace_path = mkstemp(suffix='.json')
+		os.close(fd)
+
+		try:
+			ctrl.run()
+
+			with open(ctrl.trace_path) as f:
+				events = json.load(f)
+		finally:
+			os.unlink(ctrl.trace_path)
+
+		snapshot = ctrl.timing_snapshot()
+
+		for stage in ['next', 'transition', 'write', 'dwell', 'read', 'condition']:
+			eq_(snapshot['stages'][stage]['count'], 4)
+		eq_(snapshot['stages']['init']['count'], 1)
+
+		eq_(snapshot['resources']['write Res']['count'], 4)
+		assert snapshot['resources']['write Res']['total'] >= 0.04, snapshot
+		eq_(snapshot['resources']['read Meas res']['count'], 4)
+		assert 'write' in snapshot['bus_wait'], snapshot
+
+		eq_(ctrl.timings.breakdown()[0][0], 'dwell')
+
+		eq_(len([e for e in events if e['cat'] == 'stage']), 1 + 4 * 6 + 1)
+		eq_(len([e for e in events if e['cat'] == 'resource']), 8)
+
+	def testAdaptiveDwell(self):
+		"""
+		Stop waiting once the readback has settled.
+		"""
+
+		# Approaches the set value, halving the distance with every reading.
+		state = {'target': 0.0, 'value': 0.0}
+
+		def setter(value):
+			state['target'] = value
+
+		def getter():
+			state['value'] += (state['target'] - state['value']) / 2.0
+			return state['value']
+
+		res = Resource(setter=setter)
+		readback = Resource(getter=getter)
+
+		var = OutputVariable(name='Var', order=1, enabled=True, wait='2 s')
+		var.config = LinSpaceConfig(1.0, 4.0, 4)
+		var.settle_resource_name = 'Readback'
+		var.settle_tolerance = '0.01'
+		var.settle_interval = '1 ms'
+
+		meas_res = Resource(getter=lambda: state['value'])
+		meas_var = InputVariable(name='Meas var')
+
+		vars, num_items = sort_output_variables([var])
+		ctrl = sweep.SweepController([(('Res', res),)], vars, num_items, [('Meas res', meas_res)], [meas_var],
+				settle_resources={'Readback': readback})
+
+		settle_times = []
+		measurements = []
+		def data_callback(cur_time, values, measurement_values):
+			settle_times.append(ctrl.settle_time)
+			measurements.append(measurement_values[0])
+		ctrl.data_callback = data_callback
+
+		start_time = time()
+		ctrl.run()
+		elapsed_time = time() - start_time
+
+		assert elapsed_time < 2, elapsed_time
+		eq_(len(settle_times), 4)
+		assert all(0 < t < 0.5 for t in settle_times), settle_times
+		for value, target in zip(measurements, [1.0, 2.0, 3.0, 4.0]):
+			assert abs(value - target) < 0.02, measurements
+
+		# A readback which never settles waits the full time, as does a variable without one.
+		readback.getter = partial(next, count())
+		var.wait = '100 ms'
+		var2 = OutputVariable(name='Var 2', order=1, enabled=True, wait='50 ms')
+		var2.config = LinSpaceConfig(1.0, 2.0, 2)
+
+		vars, num_items = sort_output_variables([var, var2])
+		ctrl = sweep.SweepController([(('Res', res), ('Res 2', Resource(setter=lambda x: None)))], vars,
+				num_items, [], [], settle_resources={'Readback': readback})
+
+		ctrl.run()
+
+		assert 0.1 <= ctrl.settle_time < 0.2, ctrl.settle_time
+
+	def testAbortRamp(self):
+		"""
+		A fatal abort stops a ramp midway.
+		"""
+
+		res_buf = []
+
+		res = Resource(setter=res_buf.append)
+		var = OutputVariable(name='Var', order=1, enabled=True, const=0.0)
+		var.config = LinSpaceConfig(1.0, 4.0, 4)
+		var.smooth_steps = 100
+		var.smooth_from = True
+
+		vars, num_items = sort_output_variables([var])
+		ctrl = sweep.SweepController([(('Res', res),)], vars, num_items, [], [])
+
+		timer = Thread(target=lambda: (sleep(0.3), ctrl.abort(fatal=True)))
+		timer.daemon = True
+		timer.start()
+
+		start_time = time()
+		ctrl.run()
+		elapsed_time = time() - start_time
+
+		assert elapsed_time < 1, elapsed_time
+		assert 0 < len(res_buf) < 10, res_buf
+
+	def testAdaptive(self):
+		"""
+		Refine each line of the innermost order where the signal changes.
+		"""
+
+		state = {'outer': 0.0, 'x': 0.0, 'y': 0.0}
+
+		def setter(name, value):
+			state[name] = value
+
+		# A step, whose position depends on the outer variable.
+		def getter():
+			return 1.0 if state['x'] > 0.3 + state['outer'] else 0.0
+
+		outer = OutputVariable(name='Outer', order=2, enabled=True, wait='0 s')
+		outer.config = LinSpaceConfig(0.0, 0.4, 2)
+
+		x = OutputVariable(name='X', order=1, enabled=True, wait='0 s')
+		x.config = variables.AdaptiveConfig(0.0, 1.0, 5, max_points=9, batch=2, measurement='Meas')
+
+		# Follows along with X.
+		y = OutputVariable(name='Y', order=1, enabled=True, wait='0 s')
+		y.config = LinSpaceConfig(10.0, 20.0, 5)
+
+		vars, num_items = sort_output_variables([outer, x, y])
+		ctrl = sweep.SweepController([(('Outer', Resource(setter=partial(setter, 'outer'))),),
+				(('X', Resource(setter=partial(setter, 'x'))), ('Y', Resource(setter=partial(setter, 'y'))))],
+				vars, num_items, [('Other', Resource(getter=lambda: 5)), ('Meas', Resource(getter=getter))],
+				[InputVariable(name='Other'), InputVariable(name='Meas')])
+
+		rows = []
+		progress = []
+		def data_callback(cur_time, values, measurement_values):
+			rows.append(values + measurement_values)
+			progress.append((ctrl.items_done, ctrl.total_items))
+		ctrl.data_callback = data_callback
+
+		ctrl.run()
+
+		# The refinement budget is counted from the start, and what is not needed is dropped.
+		eq_(progress[0], (0, 18))
+		assert all(done < total for done, total in progress), progress
+		eq_((ctrl.items_done, ctrl.total_items), (len(rows), len(rows)))
+
+		for outer_value in [0.0, 0.4]:
+			line = [row for row in rows if row[0] == outer_value]
+			assert 5 < len(line) <= 9, line
+
+			# All the coarse points come first.
+			eq_([row[1] for row in line[:5]], [0.0, 0.25, 0.5, 0.75, 1.0])
+
+			for row in line:
+				eq_(row[2], 10.0 + 10.0 * row[1])
+				eq_(row[4], 1.0 if row[1] > 0.3 + outer_value else 0.0)
+
+			# The step is narrowed down.
+			xs = sorted(row[1] for row in line)
+			low = max(v for v in xs if v <= 0.3 + outer_value)
+			high = min(v for v in xs if v > 0.3 + outer_value)
+			assert high - low <= 0.125, xs
+
+		# Lines are finished before moving on.
+		eq_([row[0] for row in rows], sorted(row[0] for row in rows))
+
 	def testWriteException(self):
 		"""
 		Fail to read.
@@ -0,0 +1,78 @@
+from nose.tools import eq_
+import json
+import os
+from tempfile import mkstemp
+from unittest import main, TestCase
+
+from .. import timing
+
+
+class HistogramTest(TestCase):
+	def testPercentile(self):
+		"""
+		Estimate percentiles from the buckets.
+		"""
+
+		h = timing.Histogram()
+		eq_(h.percentile(50), None)
+
+		for _ in xrange(98):
+			h.add(1e-3)
+		h.add(0.5)
+		h.add(1e9)
+
+		p50 = h.percentile(50)
+		assert 1e-3 <= p50 < 1e-3 * h.factor, p50
+		p99 = h.percentile(99)
+		assert 0.5 <= p99 < 0.5 * h.factor, p99
+		eq_(h.percentile(100), h.upper_bound(h.num_buckets - 1))
+
+		eq_(h.bucket(0), 0)
+		eq_(sum(count for _, count in h.as_list()), 100)
+
+
+class SweepTimingsTest(TestCase):
+	def testTimings(self):
+		"""
+		Record stages and resource accesses, with a trace.
+		"""
+
+		fd, path = mkstemp(suffix='.json')
+		os.close(fd)
+
+		try:
+			t = timing.SweepTimings()
+			eq_(t.breakdown(), [])
+
+			t.open_trace(path)
+			t.record_stage('read', 10.0, 0.3)
+			t.record_stage('dwell', 10.3, 0.6)
+			t.record_stage('read', 10.9, 0.1)
+			t.record_resource('Meas', 'read', 10.0, 0.25)
+			t.close_trace()
+
+			# Not traced.
+			t.record_stage('dwell', 11.0, 1.0)
+
+			snapshot = t.snapshot()
+			eq_(snapshot['stages']['read']['count'], 2)
+			eq_(snapshot['stages']['dwell']['total'], 1.6)
+			eq_(snapshot['resources']['read Meas']['max'], 0.25)
+
+			eq_(t.breakdown(), [('dwell', 0.8), ('read', 0.2)])
+
+			with open(path) as f:
+				events = json.load(f)
+
+			eq_([(e['name'], e['cat'], e['ts'], e['dur']) for e in events], [
+				('read', 'stage', 10000000, 300000),
+				('dwell', 'stage', 10300000, 600000),
+				('read', 'stage', 10900000, 100000),
+				('read Meas', 'resource', 10000000, 250000),
+			])
+		finally:
+			os.unlink(path)
+
+
+if __name__ == '__main__':
+	main()
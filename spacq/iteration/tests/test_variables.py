@@ -240,6 +240,32 @@ class OutputVariableTest(TestCase):
 		var.units = None
 		assert_raises(ValueError, list, var)
 
+	def testSettled(self):
+		"""
+		Compare successive readbacks.
+		"""
+
+		var = variables.OutputVariable(name='Name', order=1)
+		eq_(var.settle_interval, '10 ms')
+		assert var.settled(1.0, 1.0)
+		assert not var.settled(1.0, 1.001)
+
+		var.settle_tolerance = '0.01'
+		assert var.settled(1.0, 0.995)
+		# In the original units of the readings.
+		assert var.settled(Quantity(1.0, 'mV'), Quantity(1.005, 'mV'))
+		assert not var.settled(Quantity(1.0, 'V'), Quantity(1.05, 'V'))
+
+		var.settle_tolerance = '2 uV'
+		assert var.settled(Quantity(1.0, 'mV'), Quantity(1.001, 'mV'))
+		assert not var.settled(Quantity(1.0, 'mV'), Quantity(1.003, 'mV'))
+		assert_raises(IncompatibleDimensions, var.settled, Quantity(1.0, 'mA'), Quantity(1.0, 'mA'))
+
+		var.settle_interval = '1 s'
+		eq_(var._settle_interval, Quantity(1, 's'))
+		assert_raises(IncompatibleDimensions, setattr, var, 'settle_interval', '1 V')
+		assert_raises(ValueError, setattr, var, 'settle_interval', '0 s')
+
 
 class LinSpaceConfigTest(TestCase):
 	def testIterator(self):
@@ -265,6 +291,52 @@ class LinSpaceConfigTest(TestCase):
 		eq_(list(it2), [10.0])
 
 
+class AdaptiveConfigTest(TestCase):
+	def testRefine(self):
+		"""
+		Add points where the signal changes.
+		"""
+
+		config = variables.AdaptiveConfig(0.0, 1.0, 5, max_points=9, batch=2)
+		eq_(list(config), [0.0, 0.25, 0.5, 0.75, 1.0])
+
+		step = lambda x: 1.0 if x > 0.6 else 0.0
+
+		xs = list(config)
+		# The step itself, then the first of its neighbours (by curvature).
+		eq_(config.refine(xs, [step(x) for x in xs]), [0.375, 0.625])
+
+		# Flat signal.
+		eq_(config.refine(xs, [1.0] * 5), [])
+		# Unreadable points are ignored.
+		eq_(config.refine(xs, [None] * 4 + [1.0]), [])
+
+		# Keep going until the budget is spent, without splitting too finely.
+		while True:
+			new_xs = config.refine(xs, [step(x) for x in xs])
+			if not new_xs:
+				break
+			xs.extend(new_xs)
+
+		assert len(xs) <= 9, xs
+		xs.sort()
+		gap = min(x for x in xs if x > 0.6) - max(x for x in xs if x <= 0.6)
+		assert gap <= 0.125, xs
+
+	def testTolerance(self):
+		"""
+		Gentle changes are left alone.
+		"""
+
+		config = variables.AdaptiveConfig(0.0, 4.0, 5, max_points=20, tolerance=0.3)
+
+		xs = list(config)
+		# Linear apart from a kink.
+		ys = [0.0, 0.1, 0.2, 1.0, 1.1]
+
+		eq_(config.refine(xs, ys), [1.5, 2.5, 3.5])
+
+
 class ArbitraryConfigTest(TestCase):
 	def testIterator(self):
 		"""
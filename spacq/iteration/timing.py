@@ -0,0 +1,235 @@
+import logging
+log = logging.getLogger(__name__)
+
+import json
+from math import floor, log as ln
+import os
+from threading import Lock
+import thread
+from time import time
+
+"""
+Timing instrumentation for sweeps.
+
+Every stage of the sweep and every resource access is timed, so that it is possible to tell where the time goes
+in a long sweep. The timings can also be written as a trace file in the Trace Event Format, which can be loaded
+into chrome://tracing or Perfetto.
+"""
+
+
+class Histogram(object):
+	"""
+	Counts of durations in logarithmically-spaced buckets.
+	"""
+
+	# The upper bound of the first bucket, in seconds; shorter durations are counted in it.
+	min_time = 1e-6
+	# Each bucket is wider than the previous one by this factor.
+	factor = 2 ** 0.5
+	# Enough to reach past a week; longer durations are counted in the last bucket.
+	num_buckets = 80
+
+	def __init__(self):
+		self.counts = [0] * self.num_buckets
+
+	def bucket(self, value):
+		if value <= self.min_time:
+			return 0
+
+		return min(int(floor(ln(value / self.min_time, self.factor))) + 1, self.num_buckets - 1)
+
+	def upper_bound(self, bucket):
+		return self.min_time * self.factor ** bucket
+
+	def add(self, value):
+		self.counts[self.bucket(value)] += 1
+
+	def percentile(self, q):
+		"""
+		An upper estimate of the q-th percentile, or None if the histogram is empty.
+		"""
+
+		total = sum(self.counts)
+
+		if total == 0:
+			return None
+
+		needed = q / 100.0 * total
+		seen = 0
+		for bucket, count in enumerate(self.counts):
+			seen += count
+
+			if count and seen >= needed:
+				return self.upper_bound(bucket)
+
+	def as_list(self):
+		"""
+		The non-empty buckets, as (upper bound, count).
+		"""
+
+		return [(self.upper_bound(bucket), count) for bucket, count in enumerate(self.counts) if count]
+
+
+class Timing(object):
+	"""
+	Cumulative timing counters for repeated operations.
+	"""
+
+	def __init__(self):
+		self.count = 0
+		# Time spent, in seconds.
+		self.total = 0.0
+		self.max = 0.0
+		self.histogram = Histogram()
+
+	def add(self, elapsed):
+		self.count += 1
+		self.total += elapsed
+		self.max = max(self.max, elapsed)
+		self.histogram.add(elapsed)
+
+	@property
+	def mean(self):
+		if self.count == 0:
+			return None
+
+		return self.total / self.count
+
+	def as_dict(self):
+		return {
+			'count': self.count,
+			'total': self.total,
+			'mean': self.mean,
+			'max': self.max,
+			'p50': self.histogram.percentile(50),
+			'p99': self.histogram.percentile(99),
+			'histogram': self.histogram.as_list(),
+		}
+
+
+class TraceWriter(object):
+	"""
+	Write complete events in the Trace Event Format, one per line.
+
+	The format allows the closing bracket to be missing, so the file is usable even if the sweep never finishes.
+	"""
+
+	def __init__(self, path):
+		self.file = open(path, 'w')
+		self.file.write('[\n')
+
+		self.pid = os.getpid()
+		self.first = True
+
+	def event(self, name, category, start_time, elapsed, args=None):
+		event = {
+			'name': name,
+			'cat': category,
+			'ph': 'X',
+			'ts': int(start_time * 1e6),
+			'dur': int(elapsed * 1e6),
+			'pid': self.pid,
+			'tid': thread.get_ident(),
+		}
+
+		if args:
+			event['args'] = args
+
+		if not self.first:
+			self.file.write(',\n')
+		self.first = False
+
+		self.file.write(json.dumps(event))
+
+	def close(self):
+		self.file.write('\n]\n')
+		self.file.close()
+
+
+class SweepTimings(object):
+	"""
+	Timings for the stages of a sweep and for the resource accesses made during it.
+
+	All the methods are thread-safe, so that workers can record their accesses directly.
+	"""
+
+	def __init__(self):
+		self.lock = Lock()
+
+		self.start_time = time()
+
+		self.stages = {}
+		# Keyed by (resource name, 'read' or 'write').
+		self.resources = {}
+
+		self.trace = None
+
+	def _add(self, timings, key, elapsed):
+		try:
+			timing = timings[key]
+		except KeyError:
+			timing = timings[key] = Timing()
+
+		timing.add(elapsed)
+
+	def open_trace(self, path):
+		"""
+		Start writing a trace file, replacing any previous one.
+		"""
+
+		with self.lock:
+			if self.trace is not None:
+				self.trace.close()
+
+			self.trace = TraceWriter(path)
+
+	def close_trace(self):
+		with self.lock:
+			if self.trace is not None:
+				self.trace.close()
+				self.trace = None
+
+	def record_stage(self, name, start_time, elapsed):
+		with self.lock:
+			self._add(self.stages, name, elapsed)
+
+			if self.trace is not None:
+				self.trace.event(name, 'stage', start_time, elapsed)
+
+	def record_resource(self, name, access, start_time, elapsed):
+		"""
+		access: Either 'read' or 'write'.
+		"""
+
+		with self.lock:
+			self._add(self.resources, (name, access), elapsed)
+
+			if self.trace is not None:
+				self.trace.event('{0} {1}'.format(access, name), 'resource', start_time, elapsed)
+
+	def snapshot(self):
+		"""
+		A copy of all the timings, as plain data.
+		"""
+
+		with self.lock:
+			return {
+				'elapsed': time() - self.start_time,
+				'stages': dict((name, timing.as_dict()) for name, timing in self.stages.items()),
+				'resources': dict(('{0} {1}'.format(access, name), timing.as_dict())
+						for (name, access), timing in self.resources.items()),
+			}
+
+	def breakdown(self):
+		"""
+		The fraction of the total stage time spent in each stage, as (stage, fraction), largest first.
+		"""
+
+		with self.lock:
+			totals = [(name, timing.total) for name, timing in self.stages.items()]
+
+		total = sum(t for _, t in totals)
+		if total <= 0:
+			return []
+
+		return sorted(((name, t / total) for name, t in totals), key=lambda x: x[1], reverse=True)
@@ -193,6 +193,13 @@ class OutputVariable(Variable):
 	# Maximum number of values to search through for the end.
 	search_values = 1000
 
+	# Adaptive dwell: if a readback resource is named, the wait time is only an upper bound, and the dwell ends once
+	# successive readings (taken every settle interval) agree to within the tolerance. The tolerance is either a
+	# quantity or a plain number in the original units of the readings.
+	settle_resource_name = ''
+	settle_tolerance = '0'
+	_settle_interval = Quantity('10 ms')
+
 	def __init__(self, order, config=None, wait='100 ms', const=0.0, use_const=False, resource_name='', *args, **kwargs):
 		Variable.__init__(self, *args, **kwargs)
 		
@@ -230,6 +237,43 @@ class OutputVariable(Variable):
 				
 		self._wait = wait
 
+	@property
+	def settle_interval(self):
+		return str(self._settle_interval)
+
+	@settle_interval.setter
+	def settle_interval(self, value):
+		interval = Quantity(value)
+		interval.assert_dimensions('s')
+
+		if interval.value <= 0:
+			raise ValueError('Settle interval must be positive: {0}'.format(value))
+
+		self._settle_interval = interval
+
+	@property
+	def settle_tolerance_value(self):
+		"""
+		The tolerance as either a float or a Quantity.
+		"""
+
+		try:
+			return float(self.settle_tolerance)
+		except ValueError:
+			return Quantity(self.settle_tolerance)
+
+	def settled(self, last_value, value):
+		"""
+		Whether two successive readbacks agree to within the tolerance.
+		"""
+
+		difference = abs(value - last_value)
+		tolerance = self.settle_tolerance_value
+
+		if isinstance(difference, Quantity) and not isinstance(tolerance, Quantity):
+			difference = difference.original_value
+
+		return difference <= tolerance
 
 	def with_type(self, value):
 		"""
@@ -325,3 +369,89 @@ class ArbitraryConfig(object):
 
 	def __len__(self):
 		return len(self.values)
+
+
+class AdaptiveConfig(LinSpaceConfig):
+	"""
+	Adaptive refinement variable configuration.
+
+	The variable starts out as a coarse linear space. Once the coarse values have been measured, points are added in
+	the intervals where the measured signal changes the most, a batch at a time, until the point budget is spent or
+	no interval is worse than the tolerance.
+
+	Only a variable in the innermost order is refined; elsewhere, it is a plain linear space.
+	"""
+
+	def __init__(self, initial=0.0, final=0.0, steps=1, max_points=100, tolerance=0.0, batch=8, measurement=''):
+		"""
+		max_points: The most values to take, including the coarse ones.
+		tolerance: Intervals whose loss is no larger are left alone; the loss is a fraction of the signal range.
+		batch: The number of points added at a time.
+		measurement: The name of the input variable which is measured; the first one if empty.
+		"""
+
+		LinSpaceConfig.__init__(self, initial, final, steps)
+
+		self.max_points = max_points
+		self.tolerance = tolerance
+		self.batch = batch
+		self.measurement = measurement
+
+	@property
+	def resolution(self):
+		"""
+		The narrowest interval which is still split.
+		"""
+
+		return 2.0 * abs(self.final - self.initial) / max(self.max_points - 1, 1)
+
+	def losses(self, xs, ys):
+		"""
+		The loss of each interval between successive sorted points.
+
+		The loss combines the change in the signal over the interval (the gradient) with the change in slope at
+		either end (the curvature), both relative to the range of the signal.
+		"""
+
+		ys = numpy.asarray(ys, dtype=float)
+
+		y_range = ys.max() - ys.min()
+		if len(ys) < 2 or y_range == 0:
+			return numpy.zeros(max(len(ys) - 1, 0))
+
+		ys = ys / y_range
+
+		dy = numpy.abs(numpy.diff(ys))
+
+		# Second differences at the interior points, shared with the intervals on either side.
+		curvature = numpy.zeros(len(ys))
+		curvature[1:-1] = numpy.abs(numpy.diff(ys, 2))
+
+		return dy + numpy.maximum(curvature[:-1], curvature[1:])
+
+	def refine(self, xs, ys):
+		"""
+		The values to measure next, given the values measured so far (in any order).
+
+		Points without a numeric signal (None) are ignored. Returns an empty list when refinement is done.
+		"""
+
+		points = {}
+		for x, y in zip(xs, ys):
+			if y is not None:
+				points[x] = y
+
+		budget = min(self.max_points - len(set(xs)), self.batch)
+		if budget <= 0 or len(points) < 2:
+			return []
+
+		xs = numpy.array(sorted(points))
+		ys = numpy.array([points[x] for x in xs])
+
+		losses = self.losses(xs, ys)
+		# Do not split intervals which are already narrow enough.
+		losses[numpy.diff(xs) < self.resolution] = 0
+
+		candidates = [i for i in numpy.argsort(-losses, kind='mergesort')[:budget] if losses[i] > self.tolerance]
+
+		return [(xs[i] + xs[i + 1]) / 2.0 for i in sorted(candidates)]
@@ -1,8 +1,10 @@
 from functools import wraps
 from itertools import chain
-from numpy import linspace, meshgrid, sort, unique, where, nan, zeros, ones, arange, fliplr
-from numpy import min as npmin
-from scipy.interpolate import griddata, interp1d
+from multiprocessing import Pool
+from numpy import linspace, meshgrid, sort, unique, where, nan, arange
+from numpy import allclose, append, asarray, column_stack, diff, empty, lexsort, rint, searchsorted, sqrt
+from scipy.interpolate import griddata, make_interp_spline
+from scipy.spatial import cKDTree
 
 """
 Generic tools.
@@ -24,35 +26,70 @@ def sift(items, cls):
 
 	return [item for item in items if isinstance(item, cls)]
 
-def get_mask(x,y, tx, ty):
+def get_mask(x, y, tx, ty):
+	"""
+	Mask out the points of the target grid which are far from every data point.
+
+	A target point is kept if there is a data point closer than the diagonal of a grid cell.
+
+	Returns an array of shape (len(ty), len(tx)), with 1 for kept points and NaN elsewhere.
+	"""
+
 	dx = (tx[-1] - tx[0])/(tx.size -1)
 	dy = (ty[-1] - ty[0])/(ty.size -1)
 
-	d2 = dx**2 + dy**2
+	target_x, target_y = meshgrid(tx, ty)
 
-	xgrid = meshgrid(x,tx)
-	ygrid = meshgrid(y,ty)
-	
-	xdist = (xgrid[0] - xgrid[1])**2
-	ydist = (ygrid[0] - ygrid[1])**2
+	# Only the distance to the nearest data point matters.
+	tree = cKDTree(column_stack((x, y)))
+	distances, _ = tree.query(column_stack((target_x.ravel(), target_y.ravel())),
+			distance_upper_bound=sqrt(dx**2 + dy**2))
 
-	mask = ones((tx.shape[0], ty.shape[0]))
-	
-	for i in range (mask.shape[0]):
-		for j in range (mask.shape[1]):
-			mask[i,j] = npmin(xdist[i] + ydist[j])
+	mask = where(distances < sqrt(dx**2 + dy**2), 1.0, nan)
 
-	mask = (mask < d2)*1
-	mask = where(mask, mask, nan)
+	return mask.reshape(target_x.shape)
 
-	return mask.T
-	
+
+def regular_mesh(x, y, z, x_values, y_values, min_fill=0.5):
+	"""
+	Place the z-values of a rectangular sweep directly on a mesh, without any interpolation.
+
+	The points may come in any order (eg. row by row, column by column, or back and forth), and some may be missing,
+	as when a sweep is cut short.
+
+	Returns the mesh, with NaN for missing points, or None if the points do not lie on an evenly-spaced grid with at
+	most one point per grid position.
+	"""
+
+	num_x, num_y = len(x_values), len(y_values)
+
+	if len(z) < min_fill * num_x * num_y:
+		return None
+
+	for values in [x_values, y_values]:
+		if len(values) > 2:
+			steps = diff(values)
+			if not allclose(steps, steps.mean(), rtol=1e-6, atol=0):
+				return None
+
+	cells = searchsorted(y_values, y) * num_x + searchsorted(x_values, x)
+	if len(unique(cells)) != len(cells):
+		return None
+
+	mesh = empty(num_x * num_y)
+	mesh.fill(nan)
+	mesh[cells] = z
+
+	return mesh.reshape(num_y, num_x)
 
 
 def triples_to_mesh(x, y, z, max_mesh=[-1,-1], has_mask=False):
 	"""
 	Convert 3 equal-sized lists of co-ordinates into an interpolated 2D mesh of z-values.
 
+	Points from a rectangular sweep are used as-is, with no interpolation; if there are more than max_mesh along an
+	axis, only evenly-spaced rows or columns are kept.
+
 	Returns a tuple of:
 		the mesh
 		the x bounds
@@ -60,6 +97,7 @@ def triples_to_mesh(x, y, z, max_mesh=[-1,-1], has_mask=False):
 		the z bounds
 	"""
 
+	x, y, z = asarray(x, dtype=float), asarray(y, dtype=float), asarray(z, dtype=float)
 	x_values, y_values = sort(unique(x)), sort(unique(y))
 	
 	if (all (item > 0 for item in max_mesh)):
@@ -69,26 +107,62 @@ def triples_to_mesh(x, y, z, max_mesh=[-1,-1], has_mask=False):
 		display_len_x = len(x_values)
 		display_len_y = len(y_values)
 
-	x_space = linspace(x_values[0], x_values[-1], display_len_x)
-	y_space = linspace(y_values[0], y_values[-1], display_len_y)
+	target_z = regular_mesh(x, y, z, x_values, y_values)
+
+	if target_z is not None:
+		# Every grid position has a data point nearby, so there is nothing to mask.
+		rows = rint(linspace(0, len(y_values) - 1, display_len_y)).astype(int)
+		columns = rint(linspace(0, len(x_values) - 1, display_len_x)).astype(int)
+		target_z = target_z[rows][:, columns]
+	else:
+		x_space = linspace(x_values[0], x_values[-1], display_len_x)
+		y_space = linspace(y_values[0], y_values[-1], display_len_y)
 
-	target_x, target_y = meshgrid(x_space, y_space)
+		target_x, target_y = meshgrid(x_space, y_space)
 
-	target_z = griddata((x, y), z, (target_x, target_y), method='cubic')
+		target_z = griddata((x, y), z, (target_x, target_y), method='cubic')
 
-	if (has_mask):	
-		mask =	get_mask (x, y, x_space, y_space)
-		target_z = target_z * mask
+		if (has_mask):
+			mask = get_mask(x, y, x_space, y_space)
+			target_z = target_z * mask
 
 	return (target_z, (x_values[0], x_values[-1]), (y_values[0], y_values[-1]),
 			(min(z), max(z)))
 
-def triples_to_mesh_y(x, y, z, max_mesh=[-1,-1]):
+def _resample_columns(args):
+	"""
+	Interpolate columns of z-values which share the same (increasing) y-values onto new y-values.
+
+	Returns an array with a row for each new y-value, which is NaN outside the original y-values.
+	"""
+
+	y, z, y_space = args
+
+	result = empty((len(y_space), z.shape[1]))
+	result.fill(nan)
+
+	if len(y) == 1:
+		result[y_space == y[0]] = z[0]
+	elif len(y) > 1:
+		# Cubic where possible, as with interp1d.
+		spline = make_interp_spline(y, z, k=min(3, len(y) - 1), axis=0)
+
+		inside = (y_space >= y[0]) & (y_space <= y[-1])
+		result[inside] = spline(y_space[inside])
+
+	return result
+
+
+def triples_to_mesh_y(x, y, z, max_mesh=[-1,-1], processes=None):
 	"""
 	Convert 3 equal-sized lists of co-ordinates into an interpolated mesh of z-values; with 
-	interpolation along the y-axis only. The x-data must be of the form
-	[x0,x0,x0...x1,x1,x1...,xn,xn,xn...xn] with each value xi repeaded the same number of times.
-	Otherwiese unexpected behaviour follows.
+	interpolation along the y-axis only.
+
+	The points for each x-value are interpolated separately, and need not be in any order; different x-values may
+	have different numbers of points and different y-values. All the x-values which share the same y-values are
+	interpolated at once.
+
+	processes: Number of processes among which to split the interpolation, for very wide meshes.
 
 	Returns a tuple of:
 		the mesh
@@ -96,6 +170,8 @@ def triples_to_mesh_y(x, y, z, max_mesh=[-1,-1]):
 		the y bounds
 		the z bounds
 	"""
+
+	x, y, z = asarray(x, dtype=float), asarray(y, dtype=float), asarray(z, dtype=float)
 	x_values, y_values = sort(unique(x)), sort(unique(y))
 
 	display_len_x = len(x_values)
@@ -104,21 +180,70 @@ def triples_to_mesh_y(x, y, z, max_mesh=[-1,-1]):
 	else:
 		display_len_y = len(y_values)
 
-	x_space = x_values
 	y_space = linspace(y_values[0], y_values[-1], display_len_y)
-	xperiod = float(len(x)) / len(x_values)
 
-	target_z = zeros([display_len_x, display_len_y])
+	# Group the points by x-value, in increasing order of y.
+	order = lexsort((y, x))
+	x, y_sorted, z_sorted = x[order], y[order], z[order]
+	starts = searchsorted(x, x_values)
+	ends = append(starts[1:], len(x))
+
+	# Columns which share the same y-values, as (y-values, column indices, z-values).
+	groups = []
+
+	block_len = len(x) // len(x_values)
+	if all(ends - starts == block_len):
+		blocks = y_sorted.reshape(len(x_values), block_len)
+
+		if (blocks == blocks[0]).all() and all(diff(blocks[0]) > 0):
+			# A rectangular sweep: everything can be done at once.
+			groups.append((blocks[0], arange(len(x_values)), z_sorted.reshape(len(x_values), block_len).T))
+
+	if not groups:
+		columns = {}
 
-	for i, xi in enumerate(x_space):
-		yrange = arange(i*xperiod, (i+1)*xperiod-1).tolist()
-		fy = interp1d (y[yrange], z[yrange], kind='cubic', bounds_error=False)
-		tempy = fy(y_space)
-		target_z[i] = tempy
+		for i, (start, end) in enumerate(zip(starts, ends)):
+			# Repeated y-values are only used once.
+			column_y, first = unique(y_sorted[start:end], return_index=True)
+			key = column_y.tostring()
+
+			try:
+				indices, column_z = columns[key][1:]
+			except KeyError:
+				indices, column_z = [], []
+				columns[key] = (column_y, indices, column_z)
+				groups.append(columns[key])
+
+			indices.append(i)
+			column_z.append(z_sorted[start:end][first])
+
+		groups = [(column_y, asarray(indices), column_stack(column_z)) for column_y, indices, column_z in groups]
+
+	# Split the work into (y-values, z-values, new y-values) tasks.
+	tasks, task_indices = [], []
+	for column_y, indices, column_z in groups:
+		if processes is not None and processes > 1:
+			chunk = -(-len(indices) // processes)
+		else:
+			chunk = len(indices)
+
+		for i in xrange(0, len(indices), chunk):
+			tasks.append((column_y, column_z[:, i:i + chunk], y_space))
+			task_indices.append(indices[i:i + chunk])
+
+	if processes is not None and processes > 1 and len(tasks) > 1:
+		pool = Pool(processes)
+		try:
+			results = pool.map(_resample_columns, tasks)
+		finally:
+			pool.close()
+			pool.join()
+	else:
+		results = map(_resample_columns, tasks)
 
-	target_z = target_z.T
-	if(x[0] - x[-1])>0:
-		target_z = fliplr(target_z)	
+	target_z = empty((display_len_y, display_len_x))
+	for indices, result in zip(task_indices, results):
+		target_z[:, indices] = result
 
 	return (target_z, (x_values[0], x_values[-1]), (y_values[0], y_values[-1]),
 			(min(z), max(z)))
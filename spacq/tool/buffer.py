@@ -0,0 +1,255 @@
+import logging
+log = logging.getLogger(__name__)
+
+import numpy
+
+"""
+Fixed-size storage for live data, so that long-running displays take constant memory and time.
+"""
+
+
+class RingBuffer(object):
+	"""
+	A preallocated array of rows, in which new rows overwrite the oldest ones once it is full.
+	"""
+
+	def __init__(self, capacity, shape=(), dtype=float):
+		"""
+		capacity: The most rows kept.
+		shape: The shape of each row; scalars by default.
+		"""
+
+		if capacity < 1:
+			raise ValueError('Capacity must be positive: {0}'.format(capacity))
+
+		self.data = numpy.empty((capacity,) + tuple(shape), dtype=dtype)
+
+		# Position of the oldest row.
+		self.start = 0
+		self.size = 0
+
+	@property
+	def capacity(self):
+		return len(self.data)
+
+	@property
+	def shape(self):
+		return self.data.shape[1:]
+
+	def __len__(self):
+		return self.size
+
+	def clear(self):
+		self.start = 0
+		self.size = 0
+
+	def append(self, row):
+		self.extend([row])
+
+	def extend(self, rows):
+		"""
+		Add rows, oldest first.
+		"""
+
+		rows = numpy.asarray(rows, dtype=self.data.dtype)
+		if rows.shape[1:] != self.shape:
+			raise ValueError('Rows of shape {0} do not fit a buffer of shape {1}'.format(rows.shape[1:], self.shape))
+
+		# Only the newest rows can fit.
+		if len(rows) > self.capacity:
+			rows = rows[-self.capacity:]
+
+		end = (self.start + self.size) % self.capacity
+
+		# Write in at most 2 pieces, wrapping around.
+		first = min(len(rows), self.capacity - end)
+		self.data[end:end + first] = rows[:first]
+		self.data[:len(rows) - first] = rows[first:]
+
+		overflow = max(self.size + len(rows) - self.capacity, 0)
+		self.start = (self.start + overflow) % self.capacity
+		self.size = min(self.size + len(rows), self.capacity)
+
+	def get(self):
+		"""
+		A copy of the rows, oldest first.
+		"""
+
+		end = self.start + self.size
+
+		if end <= self.capacity:
+			return self.data[self.start:end].copy()
+		else:
+			return numpy.concatenate((self.data[self.start:], self.data[:end - self.capacity]))
+
+	@property
+	def last(self):
+		"""
+		The newest row.
+		"""
+
+		if self.size == 0:
+			raise IndexError('Empty buffer.')
+
+		return self.data[(self.start + self.size - 1) % self.capacity]
+
+	def resize(self, capacity):
+		"""
+		Change the capacity, keeping as many of the newest rows as fit.
+		"""
+
+		rows = self.get()
+
+		self.data = numpy.empty((capacity,) + self.shape, dtype=self.data.dtype)
+		self.clear()
+		self.extend(rows)
+
+
+class EnvelopeHistory(object):
+	"""
+	The minimum and maximum of values in consecutive time buckets, over an unlimited span of time.
+
+	Once all the buckets are used, neighbouring buckets are merged in pairs, so that each bucket covers twice as
+	much time. The memory used stays fixed, and the resolution halves each time the span doubles.
+	"""
+
+	def __init__(self, num_buckets=1000, bucket_width=1.0):
+		"""
+		num_buckets: The number of buckets kept; rounded up to be even.
+		bucket_width: The initial span of each bucket, in s.
+		"""
+
+		num_buckets += num_buckets % 2
+
+		self.initial_width = bucket_width
+
+		self.mins = numpy.empty(num_buckets)
+		self.maxs = numpy.empty(num_buckets)
+
+		self.clear()
+
+	def clear(self):
+		self.mins.fill(numpy.inf)
+		self.maxs.fill(-numpy.inf)
+
+		self.width = self.initial_width
+		# Start time of the first bucket.
+		self.origin = None
+		# Number of buckets in use.
+		self.used = 0
+
+	def _merge(self):
+		half = len(self.mins) // 2
+
+		self.mins[:half] = numpy.fmin(self.mins[0::2], self.mins[1::2])
+		self.maxs[:half] = numpy.fmax(self.maxs[0::2], self.maxs[1::2])
+		self.mins[half:] = numpy.inf
+		self.maxs[half:] = -numpy.inf
+
+		self.width *= 2
+		self.used = (self.used + 1) // 2
+
+	def add(self, times, values):
+		"""
+		Add values, along with the times (in s) at which they were taken, in increasing order of time.
+		"""
+
+		times = numpy.asarray(times, dtype=float)
+		values = numpy.asarray(values, dtype=float)
+
+		keep = ~numpy.isnan(values)
+		times, values = times[keep], values[keep]
+
+		if not len(values):
+			return
+
+		if self.origin is None:
+			self.origin = times[0]
+
+		while (times[-1] - self.origin) / self.width >= len(self.mins):
+			self._merge()
+
+		# Anything out of order ends up at an edge.
+		buckets = numpy.clip(((times - self.origin) / self.width).astype(int), 0, len(self.mins) - 1)
+		buckets = numpy.maximum.accumulate(buckets)
+
+		indices, starts = numpy.unique(buckets, return_index=True)
+		self.mins[indices] = numpy.fmin(self.mins[indices], numpy.minimum.reduceat(values, starts))
+		self.maxs[indices] = numpy.fmax(self.maxs[indices], numpy.maximum.reduceat(values, starts))
+
+		self.used = max(self.used, indices[-1] + 1)
+
+	def envelope(self):
+		"""
+		The non-empty buckets, as a tuple of arrays:
+			the middle time of each bucket
+			the minimum in each bucket
+			the maximum in each bucket
+		"""
+
+		mins, maxs = self.mins[:self.used], self.maxs[:self.used]
+		filled = mins <= maxs
+
+		if self.origin is None:
+			times = numpy.array([])
+		else:
+			times = self.origin + (numpy.arange(self.used)[filled] + 0.5) * self.width
+
+		return times, mins[filled].copy(), maxs[filled].copy()
+
+	def trace(self, before=None):
+		"""
+		The envelope as a single line, which goes to the minimum and the maximum of each bucket in turn.
+
+		before: Only include buckets which end before this time.
+		"""
+
+		times, mins, maxs = self.envelope()
+
+		if before is not None:
+			keep = times + self.width / 2 <= before
+			times, mins, maxs = times[keep], mins[keep], maxs[keep]
+
+		return numpy.repeat(times, 2), numpy.column_stack((mins, maxs)).ravel()
+
+
+def decimate_rows(data, max_rows, max_columns):
+	"""
+	Shrink a 2D array for display.
+
+	Each row keeps the minimum and maximum of each group of columns, so that narrow peaks still show up, and groups
+	of rows are averaged. The last group of columns may be smaller than the others, so that no columns are lost. Any
+	rows which do not fit are dropped, starting with the first (oldest) ones.
+
+	Returns the shrunk array, with at most max_rows rows and max_columns columns.
+	"""
+
+	data = numpy.asarray(data, dtype=float)
+	num_rows, num_columns = data.shape
+
+	if num_rows > max_rows:
+		group = num_rows // max_rows
+		num_groups = max_rows
+
+		data = data[num_rows - num_groups * group:].reshape(num_groups, group, num_columns).mean(axis=1)
+
+	# Every group of columns becomes 2 columns.
+	if num_columns > max_columns and max_columns >= 2:
+		group = -(-num_columns // (max_columns // 2))
+		num_full = num_columns // group
+		num_groups = -(-num_columns // group)
+
+		grouped = data[:, :num_full * group].reshape(len(data), num_full, group)
+
+		result = numpy.empty((len(data), 2 * num_groups))
+		result[:, 0:2 * num_full:2] = grouped.min(axis=2)
+		result[:, 1:2 * num_full:2] = grouped.max(axis=2)
+
+		if num_groups > num_full:
+			# The leftover columns.
+			result[:, -2] = data[:, num_full * group:].min(axis=1)
+			result[:, -1] = data[:, num_full * group:].max(axis=1)
+
+		data = result
+
+	return data
@@ -0,0 +1,291 @@
+import logging
+log = logging.getLogger(__name__)
+
+from Queue import Queue
+from threading import Event, Lock, Thread
+from time import time
+
+"""
+Long-lived worker threads which serialize the calls made with each key.
+"""
+
+
+class FutureTimeout(Exception):
+	"""
+	The call did not finish in time.
+	"""
+
+	pass
+
+
+class FutureCancelled(Exception):
+	"""
+	The call was cancelled before it started.
+	"""
+
+	pass
+
+
+class Future(object):
+	"""
+	The eventual result of a call submitted to a worker.
+	"""
+
+	# Raised when waiting for the result times out.
+	timeout_exception = FutureTimeout
+	# Whether a call which has not yet started is cancelled when waiting for it times out.
+	cancel_on_timeout = False
+
+	def __init__(self):
+		self._done = Event()
+		self._result = None
+		self._exception = None
+
+		self._lock = Lock()
+		self._running = False
+
+	def set_running(self):
+		"""
+		Mark the call as started, unless it has been cancelled.
+
+		Returns whether the call should go ahead.
+		"""
+
+		with self._lock:
+			if self._done.is_set():
+				return False
+
+			self._running = True
+			return True
+
+	def set_result(self, result):
+		self._result = result
+		self._done.set()
+
+	def set_exception(self, e):
+		self._exception = e
+		self._done.set()
+
+	def cancel(self):
+		"""
+		Stop the call from being run, if it has not yet started.
+
+		Returns whether the call was cancelled.
+		"""
+
+		with self._lock:
+			if self._running or self._done.is_set():
+				return False
+
+			self.set_exception(FutureCancelled('Cancelled before starting.'))
+			return True
+
+	@property
+	def done(self):
+		return self._done.is_set()
+
+	def result(self, timeout=None):
+		"""
+		Wait for the call to finish, and either return its value or re-raise its exception.
+
+		If timeout (in seconds) is given and the call is not done by then, timeout_exception is raised. If
+		cancel_on_timeout is set, a call which is still queued is then cancelled; a call which has already started
+		cannot be stopped, and runs to completion before any later calls with the same key.
+		"""
+
+		if not self._done.wait(timeout):
+			if self.cancel_on_timeout:
+				self.cancel()
+
+			raise self.timeout_exception('Timed out after {0} s'.format(timeout))
+
+		if self._exception is not None:
+			raise self._exception
+
+		return self._result
+
+
+class StageTiming(object):
+	"""
+	Cumulative timing counters for a stage.
+	"""
+
+	def __init__(self):
+		# Number of times the stage was run.
+		self.count = 0
+		# Wall-clock time spent in the stage, in seconds.
+		self.total = 0.0
+		self.max = 0.0
+		# Number of calls submitted during the stage, and the time spent by workers in them.
+		self.calls = 0
+		self.busy = 0.0
+		# Time spent by calls waiting for their worker, which is busy with earlier calls to the same device.
+		self.wait = 0.0
+
+	def as_dict(self):
+		return {
+			'count': self.count,
+			'total': self.total,
+			'max': self.max,
+			'calls': self.calls,
+			'busy': self.busy,
+			'wait': self.wait,
+		}
+
+
+class _Timer(object):
+	"""
+	Context manager which adds the elapsed time to a stage.
+	"""
+
+	def __init__(self, executor, stage):
+		self.executor = executor
+		self.stage = stage
+
+	def __enter__(self):
+		self.start_time = time()
+
+	def __exit__(self, *args):
+		self.executor._record(self.stage, elapsed=time() - self.start_time)
+
+		return False
+
+
+class DeviceExecutor(object):
+	"""
+	A pool with one worker thread per key (typically per device), which lives until shut down.
+
+	Calls submitted with the same key are run in order on the same thread, so accesses to a device are serialized
+	just as they would be by the device lock, while different devices proceed in parallel.
+	"""
+
+	# The type of the futures returned by submit.
+	future_cls = Future
+
+	def __init__(self):
+		self.workers = {}
+		self.lock = Lock()
+
+		self._timings = {}
+
+		self.running = True
+
+	def _worker(self, queue):
+		while True:
+			item = queue.get()
+
+			if item is None:
+				return
+
+			stage, submit_time, future, f, args, kwargs = item
+
+			if not future.set_running():
+				continue
+
+			start_time = time()
+
+			try:
+				result = f(*args, **kwargs)
+			except Exception as e:
+				self._record(stage, busy=time() - start_time, wait=start_time - submit_time)
+				future.set_exception(e)
+			else:
+				self._record(stage, busy=time() - start_time, wait=start_time - submit_time)
+				future.set_result(result)
+
+	def _record(self, stage, elapsed=None, busy=None, wait=None):
+		with self.lock:
+			try:
+				timing = self._timings[stage]
+			except KeyError:
+				timing = self._timings[stage] = StageTiming()
+
+			if elapsed is not None:
+				timing.count += 1
+				timing.total += elapsed
+				timing.max = max(timing.max, elapsed)
+
+			if busy is not None:
+				timing.calls += 1
+				timing.busy += busy
+
+			if wait is not None:
+				timing.wait += wait
+
+	def submit(self, key, stage, f, *args, **kwargs):
+		"""
+		Run f(*args, **kwargs) on the worker for key, creating the worker if necessary.
+
+		Returns a Future.
+		"""
+
+		with self.lock:
+			if not self.running:
+				raise ValueError('Executor has been shut down.')
+
+			try:
+				queue = self.workers[key]
+			except KeyError:
+				log.debug('Creating worker for key: {0!r}'.format(key))
+
+				queue = self.workers[key] = Queue()
+
+				thr = Thread(target=self._worker, args=(queue,))
+				thr.daemon = True
+				thr.start()
+
+		future = self.future_cls()
+		queue.put((stage, time(), future, f, args, kwargs))
+
+		return future
+
+	def timed(self, stage):
+		"""
+		Context manager for timing a stage.
+		"""
+
+		return _Timer(self, stage)
+
+	@property
+	def timings(self):
+		"""
+		A snapshot of the timing counters for all stages.
+		"""
+
+		with self.lock:
+			return dict((stage, timing.as_dict()) for stage, timing in self._timings.items())
+
+	def shutdown(self):
+		"""
+		Stop all the workers once they have finished their queued calls.
+		"""
+
+		with self.lock:
+			self.running = False
+
+			for queue in self.workers.values():
+				queue.put(None)
+
+			self.workers = {}
+
+
+def wait_all(futures, reraise=True):
+	"""
+	Wait for all the futures, then re-raise the first exception, if any.
+
+	If reraise is False, exceptions are only logged, as they would be for a plain thread.
+	"""
+
+	exception = None
+
+	for future in futures:
+		try:
+			future.result()
+		except Exception as e:
+			if not reraise:
+				log.error('Caught exception in worker: {0!r}'.format(e))
+			elif exception is None:
+				exception = e
+
+	if exception is not None:
+		raise exception
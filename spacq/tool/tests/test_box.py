@@ -1,7 +1,8 @@
 from nose.tools import eq_
-from numpy import arange, linspace, repeat
+from numpy import arange, argsort, array, cos, linspace, nan, repeat, sin, sort, tile, unique
 from numpy.testing import assert_array_equal, assert_array_almost_equal
 from pubsub import pub
+from scipy.interpolate import interp1d
 from threading import RLock, Thread
 import time
 from unittest import main, TestCase
@@ -117,6 +118,122 @@ class TriplesToMeshTest(TestCase):
 		eq_(y_bounds, (0, 99))
 		eq_(z_bounds, (0, 99999))
 
+	def testSerpentine(self):
+		"""
+		Back-and-forth sweeps, and sweeps which are cut short, need no interpolation.
+		"""
+
+		x = [1, 2, 3, 3, 2, 1, 1, 2]
+		y = [5, 5, 5, 6, 6, 6, 7, 7]
+		z = [0, 1, 2, 5, 4, 3, 6, 7]
+
+		result, x_bounds, y_bounds, z_bounds = box.triples_to_mesh(x, y, z)
+
+		assert_array_equal(result, [[0, 1, 2], [3, 4, 5], [6, 7, nan]])
+		eq_(x_bounds, (1, 3))
+		eq_(y_bounds, (5, 7))
+		eq_(z_bounds, (0, 7))
+
+	def testMaxMesh(self):
+		"""
+		Large grids are thinned out.
+		"""
+
+		x = range(9) * 5
+		y = repeat(range(5), 9)
+		z = arange(45)
+
+		result, x_bounds, y_bounds, z_bounds = box.triples_to_mesh(x, y, z, [5, 3])
+
+		assert_array_equal(result, z.reshape(5, 9)[::2, ::2])
+		eq_(x_bounds, (0, 8))
+		eq_(y_bounds, (0, 4))
+
+	def testMask(self):
+		"""
+		Points far from the data are masked out.
+		"""
+
+		x = [0, 0.1, 1, 0.9, 0.5]
+		y = [0, 0.1, 1, 1, 0.45]
+
+		tx, ty = linspace(0, 1, 6), linspace(0, 1, 4)
+		mask = box.get_mask(x, y, tx, ty)
+
+		d2 = 0.2 ** 2 + (1 / 3.) ** 2
+		expected = [[1 if min((xi - tx[i]) ** 2 + (yi - ty[j]) ** 2 for xi, yi in zip(x, y)) < d2 else nan
+				for i in xrange(len(tx))] for j in xrange(len(ty))]
+
+		assert_array_equal(mask, expected)
+
+
+class TriplesToMeshYTest(TestCase):
+	def reference(self, x, y, z, y_space):
+		"""
+		Interpolate each x-value on its own.
+		"""
+
+		x, y, z = array(x), array(y), array(z)
+
+		result = []
+		for xi in sort(unique(x)):
+			column_y, column_z = y[x == xi], z[x == xi]
+			order = argsort(column_y)
+
+			result.append(interp1d(column_y[order], column_z[order], kind='cubic', bounds_error=False)(y_space))
+
+		return array(result).T
+
+	def testRectangular(self):
+		"""
+		Every x-value has the same y-values.
+		"""
+
+		# Swept downwards along x.
+		x = repeat([3, 2, 1, 0], 6)
+		y = [0, 1, 2, 4, 5, 6] * 4
+		z = sin(arange(24) / 5.)
+
+		result, x_bounds, y_bounds, z_bounds = box.triples_to_mesh_y(x, y, z)
+
+		eq_(result.shape, (6, 4))
+		assert_array_almost_equal(result, self.reference(x, y, z, linspace(0, 6, 6)))
+		eq_(x_bounds, (0, 3))
+		eq_(y_bounds, (0, 6))
+
+		result, _, _, _ = box.triples_to_mesh_y(x, y, z, [-1, 4])
+		assert_array_almost_equal(result, self.reference(x, y, z, linspace(0, 6, 4)))
+
+	def testRagged(self):
+		"""
+		Different x-values have different y-values.
+		"""
+
+		x = [0] * 5 + [1] * 6 + [2] * 4
+		y = [0, 1, 2, 3, 4] + [5, 4, 3, 2, 1, 0] + [0.5, 1.5, 2.5, 3.5]
+		z = cos(arange(15) / 3.)
+
+		result, x_bounds, y_bounds, z_bounds = box.triples_to_mesh_y(x, y, z, [-1, 7])
+
+		eq_(result.shape, (7, 3))
+		assert_array_almost_equal(result, self.reference(x, y, z, linspace(0, 5, 7)))
+		eq_(x_bounds, (0, 2))
+		eq_(y_bounds, (0, 5))
+
+	def testProcesses(self):
+		"""
+		The same result from several processes.
+		"""
+
+		x = repeat(arange(50), 8)
+		y = tile(arange(8), 50)
+		z = sin(x) * cos(y)
+
+		expected, _, _, _ = box.triples_to_mesh_y(x, y, z, [-1, 20])
+		result, _, _, _ = box.triples_to_mesh_y(x, y, z, [-1, 20], processes=3)
+
+		assert_array_equal(result, expected)
+
 
 class EnumTest(TestCase):
 	def testEmpty(self):
@@ -0,0 +1,147 @@
+from nose.tools import assert_raises, eq_
+from numpy import arange
+from numpy.testing import assert_array_equal
+from unittest import main, TestCase
+
+from .. import buffer
+
+
+class RingBufferTest(TestCase):
+	def testWrap(self):
+		"""
+		The oldest values are overwritten.
+		"""
+
+		buf = buffer.RingBuffer(5)
+		eq_(len(buf), 0)
+		assert_raises(IndexError, lambda: buf.last)
+
+		buf.extend([1, 2, 3])
+		assert_array_equal(buf.get(), [1, 2, 3])
+
+		buf.extend([4, 5, 6, 7])
+		assert_array_equal(buf.get(), [3, 4, 5, 6, 7])
+		eq_(buf.last, 7)
+
+		buf.append(8)
+		assert_array_equal(buf.get(), [4, 5, 6, 7, 8])
+
+		# More than fits at once.
+		buf.extend(arange(20))
+		assert_array_equal(buf.get(), [15, 16, 17, 18, 19])
+		eq_(len(buf), 5)
+
+	def testRows(self):
+		"""
+		Rows of any shape.
+		"""
+
+		buf = buffer.RingBuffer(2, shape=(3,))
+
+		buf.extend([[1, 2, 3], [4, 5, 6], [7, 8, 9]])
+		assert_array_equal(buf.get(), [[4, 5, 6], [7, 8, 9]])
+		assert_array_equal(buf.last, [7, 8, 9])
+
+		assert_raises(ValueError, buf.append, [1, 2])
+
+	def testResize(self):
+		"""
+		The newest values are kept.
+		"""
+
+		buf = buffer.RingBuffer(4)
+		buf.extend(arange(6))
+
+		buf.resize(3)
+		assert_array_equal(buf.get(), [3, 4, 5])
+
+		buf.resize(5)
+		buf.extend([6, 7])
+		assert_array_equal(buf.get(), [3, 4, 5, 6, 7])
+
+
+class EnvelopeHistoryTest(TestCase):
+	def testEnvelope(self):
+		"""
+		Values are summarized in buckets.
+		"""
+
+		history = buffer.EnvelopeHistory(num_buckets=4, bucket_width=1.0)
+
+		history.add([10.0, 10.5, 11.2, 13.9], [1.0, -1.0, 5.0, 2.0])
+		times, mins, maxs = history.envelope()
+		assert_array_equal(times, [10.5, 11.5, 13.5])
+		assert_array_equal(mins, [-1.0, 5.0, 2.0])
+		assert_array_equal(maxs, [1.0, 5.0, 2.0])
+
+		# Past the end, so the buckets double.
+		history.add([14.5, 17.0], [3.0, float('nan')])
+		eq_(history.width, 2.0)
+		times, mins, maxs = history.envelope()
+		assert_array_equal(times, [11.0, 13.0, 15.0])
+		assert_array_equal(mins, [-1.0, 2.0, 3.0])
+		assert_array_equal(maxs, [5.0, 2.0, 3.0])
+
+		times, values = history.trace(before=14.0)
+		assert_array_equal(times, [11.0, 11.0, 13.0, 13.0])
+		assert_array_equal(values, [-1.0, 5.0, 2.0, 2.0])
+
+	def testLongRun(self):
+		"""
+		The number of buckets stays fixed.
+		"""
+
+		history = buffer.EnvelopeHistory(num_buckets=100, bucket_width=0.1)
+
+		for day in xrange(10):
+			times = day * 86400.0 + arange(0, 86400, 10.0)
+			history.add(times, times % 1000)
+
+		times, mins, maxs = history.envelope()
+		assert len(times) <= 100
+		eq_(mins.min(), 0.0)
+		eq_(maxs.max(), 990.0)
+
+
+class DecimateRowsTest(TestCase):
+	def testSmall(self):
+		"""
+		Nothing changes when everything fits.
+		"""
+
+		data = arange(12).reshape(3, 4)
+		assert_array_equal(buffer.decimate_rows(data, 3, 4), data)
+
+	def testDecimate(self):
+		"""
+		Rows are averaged, and columns keep their extremes.
+		"""
+
+		data = arange(5 * 8, dtype=float).reshape(5, 8)
+		data[4, 1] = 100.0
+
+		result = buffer.decimate_rows(data, 2, 4)
+		eq_(result.shape, (2, 4))
+
+		# The first row is dropped; then pairs of rows are averaged.
+		assert_array_equal(result[0], [12.0, 15.0, 16.0, 19.0])
+		assert_array_equal(result[1], [28.0, 62.5, 32.0, 35.0])
+
+	def testDecimateRemainder(self):
+		"""
+		Columns which do not make up a whole group are kept in a smaller group.
+		"""
+
+		data = arange(2 * 10, dtype=float).reshape(2, 10)
+		data[0, 9] = -5.0
+
+		# Groups of 3 columns, the last of which has only 1.
+		result = buffer.decimate_rows(data, 2, 8)
+		eq_(result.shape, (2, 8))
+
+		assert_array_equal(result[0], [0.0, 2.0, 3.0, 5.0, 6.0, 8.0, -5.0, -5.0])
+		assert_array_equal(result[1], [10.0, 12.0, 13.0, 15.0, 16.0, 18.0, 19.0, 19.0])
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,108 @@
+from nose.tools import assert_raises, eq_
+from threading import current_thread
+from time import sleep
+from unittest import main, TestCase
+
+from .. import executor
+
+
+class DeviceExecutorTest(TestCase):
+	def testSameKey(self):
+		"""
+		Calls with the same key are run in order on the same thread.
+		"""
+
+		e = executor.DeviceExecutor()
+
+		calls = []
+
+		def f(i):
+			sleep(0.01)
+			calls.append((i, current_thread().name))
+
+		futures = [e.submit('dev', 'write', f, i) for i in xrange(5)]
+		executor.wait_all(futures)
+
+		eq_([i for i, _ in calls], range(5))
+		eq_(len(set(name for _, name in calls)), 1)
+
+		# Later calls wait for the earlier ones.
+		assert e.timings['write']['wait'] >= 0.09, e.timings
+
+		e.shutdown()
+
+	def testDifferentKeys(self):
+		"""
+		Calls with different keys are run in parallel.
+		"""
+
+		e = executor.DeviceExecutor()
+
+		futures = [e.submit(i, 'read', sleep, 0.2) for i in xrange(5)]
+
+		with e.timed('read'):
+			executor.wait_all(futures)
+
+		timings = e.timings['read']
+		eq_(timings['count'], 1)
+		eq_(timings['calls'], 5)
+		assert timings['total'] < 0.5, timings
+		assert timings['busy'] >= 1.0, timings
+		assert timings['wait'] < 0.1, timings
+
+		e.shutdown()
+
+	def testResults(self):
+		"""
+		Values and exceptions make their way back.
+		"""
+
+		e = executor.DeviceExecutor()
+
+		def fail():
+			raise ValueError('oops')
+
+		eq_(e.submit('dev', 'read', lambda: 5).result(), 5)
+		assert_raises(ValueError, e.submit('dev', 'read', fail).result)
+		assert_raises(ValueError, executor.wait_all, [e.submit('dev', 'read', fail)])
+		executor.wait_all([e.submit('dev', 'read', fail)], reraise=False)
+
+		e.shutdown()
+
+		assert_raises(ValueError, e.submit, 'dev', 'read', lambda: 5)
+
+	def testCancel(self):
+		"""
+		Queued calls can be cancelled, but running ones cannot.
+		"""
+
+		class CancellingFuture(executor.Future):
+			cancel_on_timeout = True
+
+		e = executor.DeviceExecutor()
+		e.future_cls = CancellingFuture
+
+		calls = []
+
+		def f(i):
+			sleep(0.2)
+			calls.append(i)
+
+			return i
+
+		futures = [e.submit('dev', 'write', f, i) for i in xrange(3)]
+		sleep(0.05)
+
+		assert_raises(executor.FutureTimeout, futures[1].result, timeout=0.05)
+		assert not futures[0].cancel()
+
+		eq_(futures[0].result(), 0)
+		assert_raises(executor.FutureCancelled, futures[1].result)
+		eq_(futures[2].result(), 2)
+		eq_(calls, [0, 2])
+
+		e.shutdown()
+
+
+if __name__ == '__main__':
+	main()